@@ -1,89 +1,254 @@
-from flask import Flask, request, jsonify, render_template, send_file
-from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_cors import CORS
-from dotenv import load_dotenv
-from werkzeug.utils import secure_filename
 import os
 from datetime import timedelta
-from utils import process_excel, generate_pdf  # Импортируем функции из utils.py
-from routes import register_routes
-
-# Загрузка переменных окружения
-load_dotenv()
-
-app = Flask(__name__)
-
-# Конфигурация приложения
-app.config.update(
-    # База данных
-    SQLALCHEMY_DATABASE_URI=os.getenv('DATABASE_URL'),
-    SQLALCHEMY_TRACK_MODIFICATIONS=False,
-    
-    # Безопасность
-    SECRET_KEY=os.getenv('SECRET_KEY'),
-    JWT_SECRET_KEY=os.getenv('JWT_SECRET_KEY'),
-    JWT_ACCESS_TOKEN_EXPIRES=timedelta(hours=1),
-    
-    # Файловая система
-    UPLOAD_FOLDER=os.getenv('UPLOAD_FOLDER', 'uploads'),
-    TEMPLATE_FOLDER=os.getenv('TEMPLATE_FOLDER', 'templates'),
-    OUTPUT_FOLDER=os.getenv('OUTPUT_FOLDER', 'output'),
-    MAX_CONTENT_LENGTH=int(os.getenv('MAX_CONTENT_LENGTH', 16777216)),
-    ALLOWED_EXTENSIONS={'xlsx', 'xls'}
-)
-
-# Инициализация расширений
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-CORS(app)  # Включаем CORS для всех маршрутов
-
-# Создание необходимых директорий
-for folder in ['UPLOAD_FOLDER', 'TEMPLATE_FOLDER', 'OUTPUT_FOLDER']:
-    os.makedirs(app.config[folder], exist_ok=True)
-
-# Импорт моделей и маршрутов
-from models import User, ProposalHistory
-from routes import register_routes
-
-# Регистрация маршрутов
-register_routes(app)
-
-# Обработчик ошибок
-@app.errorhandler(404)
-def not_found_error(error):
-    return jsonify({'error': 'Not found'}), 404
-
-@app.errorhandler(500)
-def internal_error(error):
-    db.session.rollback()  # Откатываем сессию в случае ошибки
-    return jsonify({'error': 'Internal server error'}), 500
-
-# Проверка работоспособности API
-@app.route('/health')
-def health_check():
-    return jsonify({
-        'status': 'healthy',
-        'database': check_database_connection()
-    })
-
-def check_database_connection():
+from pathlib import Path
+
+import click
+from dotenv import load_dotenv
+from flask import Flask, jsonify
+from flask.cli import FlaskGroup
+from flask_cors import CORS
+from sqlalchemy import text
+
+from .batch import init_batch
+from .extensions import db
+from .jobs import init_job_queue
+from .logging_config import init_logging
+from .middleware.auth import init_auth_cache
+from .object_storage import init_object_storage
+from .output_storage import init_output_storage
+from .passwords import init_password_hasher
+from .pdf_converter import init_pdf_converter
+from .progress import init_progress
+from .result_cache import init_result_cache
+from .retry_logic import init_upload_tracker
+from .routes import register_routes
+from .tracing import init_tracing
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / 'migrations'
+
+
+def create_app(config=None):
+    """
+    Фабрика приложения
+
+    Тяжелые зависимости (pandas, openpyxl, python-docx, LibreOffice)
+    подгружаются при первом использовании, а не здесь, поэтому запуск
+    воркера, CLI-команды или миграции не платит за весь конвейер.
+
+    Модуль использует относительные импорты пакета backend, поэтому
+    запускается не как скрипт, а через flask CLI (FLASK_APP из .env) или
+    WSGI-сервер (backend.wsgi):
+
+        FLASK_APP=backend.app:create_app flask db upgrade
+        FLASK_APP=backend.app:create_app flask run
+
+    Args:
+        config (Optional[Dict]): Значения, перекрывающие конфигурацию из окружения
+
+    Returns:
+        Flask: Настроенное приложение
+    """
+    # Загрузка переменных окружения
+    load_dotenv()
+
+    app = Flask(__name__)
+
+    # Конфигурация приложения
+    app.config.update(
+        # База данных
+        SQLALCHEMY_DATABASE_URI=os.getenv('DATABASE_URL'),
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+
+        # Безопасность
+        SECRET_KEY=os.getenv('SECRET_KEY'),
+        JWT_SECRET_KEY=os.getenv('JWT_SECRET_KEY'),
+        JWT_ACCESS_TOKEN_EXPIRES=timedelta(hours=1),
+        # Кэш проверенных токенов: сколько секунд запрос обходится без обращения к БД
+        AUTH_CACHE_TTL=int(os.getenv('AUTH_CACHE_TTL', 60)),
+        AUTH_CACHE_MAX_SIZE=int(os.getenv('AUTH_CACHE_MAX_SIZE', 10000)),
+        # Хэширование паролей: алгоритм и стоимость; при смене хэши обновляются при входе
+        PASSWORD_HASH_ALGORITHM=os.getenv('PASSWORD_HASH_ALGORITHM', 'pbkdf2:sha256'),
+        PASSWORD_HASH_ITERATIONS=int(os.getenv('PASSWORD_HASH_ITERATIONS', 260000)),
+        # Сколько проверок паролей идет одновременно и сколько секунд ждать свободного слота
+        PASSWORD_HASH_WORKERS=int(os.getenv('PASSWORD_HASH_WORKERS', 2)),
+        PASSWORD_HASH_WAIT_TIMEOUT=float(os.getenv('PASSWORD_HASH_WAIT_TIMEOUT', 5)),
+
+        # Файловая система
+        UPLOAD_FOLDER=os.getenv('UPLOAD_FOLDER', 'uploads'),
+        TEMPLATE_FOLDER=os.getenv('TEMPLATE_FOLDER', 'templates'),
+        OUTPUT_FOLDER=os.getenv('OUTPUT_FOLDER', 'output'),
+        # Рабочие папки запросов и заданий (по одной на запрос); лучше на той же
+        # файловой системе, что и UPLOAD_FOLDER/OUTPUT_FOLDER - тогда перенос в них атомарен
+        WORK_FOLDER=os.getenv('WORK_FOLDER', 'work'),
+        # Жизненный цикл документов: уровни подпапок, срок хранения и пережатие (дни, 0 - выключено).
+        # Срок хранения по умолчанию выключен: документы удаляются только по явной настройке
+        OUTPUT_SHARD_DEPTH=int(os.getenv('OUTPUT_SHARD_DEPTH', 2)),
+        OUTPUT_RETENTION_DAYS=int(os.getenv('OUTPUT_RETENTION_DAYS', 0)),
+        OUTPUT_COLD_AFTER_DAYS=int(os.getenv('OUTPUT_COLD_AFTER_DAYS', 7)),
+        # Удалять файлы без записи в истории (например, общая папка с другим окружением - нельзя)
+        OUTPUT_REMOVE_ORPHANS=os.getenv('OUTPUT_REMOVE_ORPHANS', 'false').lower() in ('1', 'true', 'yes'),
+        # Период фонового обслуживания в веб-процессе, секунды (0 - только командой flask sweep-outputs)
+        OUTPUT_SWEEP_INTERVAL=int(os.getenv('OUTPUT_SWEEP_INTERVAL', 0)),
+        # Создавать удаленный по сроку документ заново при скачивании
+        OUTPUT_REGENERATE=os.getenv('OUTPUT_REGENERATE', 'true').lower() in ('1', 'true', 'yes'),
+
+        # Хранилище загрузок и документов: 'local' (папки выше) или 's3' (S3-совместимый сервис,
+        # папки остаются для временных файлов)
+        STORAGE_BACKEND=os.getenv('STORAGE_BACKEND', 'local'),
+        S3_BUCKET=os.getenv('S3_BUCKET', 'logistics-cp'),
+        S3_PREFIX=os.getenv('S3_PREFIX', ''),
+        # Адрес MinIO или другого совместимого сервера; пусто - AWS S3
+        S3_ENDPOINT_URL=os.getenv('S3_ENDPOINT_URL', ''),
+        S3_REGION=os.getenv('S3_REGION', ''),
+        S3_ACCESS_KEY_ID=os.getenv('S3_ACCESS_KEY_ID', ''),
+        S3_SECRET_ACCESS_KEY=os.getenv('S3_SECRET_ACCESS_KEY', ''),
+        # 'path' для MinIO без DNS-имен бакетов
+        S3_ADDRESSING_STYLE=os.getenv('S3_ADDRESSING_STYLE', 'auto'),
+        S3_MAX_POOL_CONNECTIONS=int(os.getenv('S3_MAX_POOL_CONNECTIONS', 10)),
+        # Сколько секунд действует подписанная ссылка при DOWNLOAD_OFFLOAD=presigned
+        S3_PRESIGN_EXPIRES=int(os.getenv('S3_PRESIGN_EXPIRES', 300)),
+        MAX_CONTENT_LENGTH=int(os.getenv('MAX_CONTENT_LENGTH', 16777216)),
+        ALLOWED_EXTENSIONS={'xlsx', 'xls'},
+
+        # Конфигурация извлечения данных из Excel
+        EXTRACTION_CONFIG=os.getenv('EXTRACTION_CONFIG', 'config.json'),
+
+        # Движок генерации для отдельных шаблонов: "template.docx:ooxml,other.docx:docx"
+        TEMPLATE_ENGINES=dict(
+            item.split(':', 1) for item in os.getenv('TEMPLATE_ENGINES', '').split(',') if ':' in item
+        ),
+
+        # PDF-версия предложений через пул процессов LibreOffice (нужен soffice). Долгоживущие
+        # процессы требуют модуль uno из системного пакета python3-uno (в virtualenv его нет:
+        # --system-site-packages); без него каждый документ - отдельный запуск soffice --convert-to
+        PDF_OUTPUT_ENABLED=os.getenv('PDF_OUTPUT_ENABLED', 'false').lower() in ('1', 'true', 'yes'),
+        PDF_CONVERTER_SOFFICE=os.getenv('PDF_CONVERTER_SOFFICE', 'soffice'),
+        PDF_CONVERTER_WORKERS=int(os.getenv('PDF_CONVERTER_WORKERS', 2)),
+        PDF_CONVERTER_PROFILE_DIR=os.getenv('PDF_CONVERTER_PROFILE_DIR', 'pdf_profiles'),
+        # Секунд на один документ, ожидания свободного конвертера и документов до перезапуска процесса
+        PDF_CONVERTER_TIMEOUT=float(os.getenv('PDF_CONVERTER_TIMEOUT', 60)),
+        PDF_CONVERTER_QUEUE_TIMEOUT=float(os.getenv('PDF_CONVERTER_QUEUE_TIMEOUT', 120)),
+        PDF_CONVERTER_MAX_JOBS=int(os.getenv('PDF_CONVERTER_MAX_JOBS', 200)),
+
+        # Пакетная генерация: пакет обрабатывается внутри HTTP-запроса, поэтому его размер
+        # ограничен так, чтобы ответ укладывался в таймаут прокси и воркера WSGI-сервера
+        BATCH_MAX_ITEMS=int(os.getenv('BATCH_MAX_ITEMS', 50)),
+        # Процессов пула пакетной обработки; 0 - по числу ядер
+        BATCH_MAX_WORKERS=int(os.getenv('BATCH_MAX_WORKERS', 0)),
+
+        # Очередь заданий: 'local' (пул потоков в процессе) или 'celery' (Redis-совместимый брокер)
+        JOB_QUEUE_BACKEND=os.getenv('JOB_QUEUE_BACKEND', 'local'),
+        JOB_QUEUE_WORKERS=int(os.getenv('JOB_QUEUE_WORKERS', 4)),
+        CELERY_BROKER_URL=os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0'),
+
+        # Прогресс загрузок и заданий: 'memory' (один процесс) или 'redis' (общий для воркеров)
+        PROGRESS_BACKEND=os.getenv('PROGRESS_BACKEND', 'memory'),
+        PROGRESS_REDIS_URL=os.getenv('PROGRESS_REDIS_URL', os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')),
+        PROGRESS_TTL=int(os.getenv('PROGRESS_TTL', 3600)),
+        PROGRESS_MIN_INTERVAL=float(os.getenv('PROGRESS_MIN_INTERVAL', 0.5)),
+        PROGRESS_STREAM_TIMEOUT=int(os.getenv('PROGRESS_STREAM_TIMEOUT', 600)),
+
+        # Трекер загрузок: 'memory', 'sqlite' (общий файл для воркеров узла) или 'redis'
+        UPLOAD_TRACKER_BACKEND=os.getenv('UPLOAD_TRACKER_BACKEND', 'memory'),
+        UPLOAD_TRACKER_TTL=int(os.getenv('UPLOAD_TRACKER_TTL', 3600)),
+        UPLOAD_TRACKER_MAX_SIZE=int(os.getenv('UPLOAD_TRACKER_MAX_SIZE', 10000)),
+        UPLOAD_TRACKER_SQLITE_PATH=os.getenv('UPLOAD_TRACKER_SQLITE_PATH', 'upload_status.sqlite3'),
+        UPLOAD_TRACKER_REDIS_URL=os.getenv('UPLOAD_TRACKER_REDIS_URL', os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')),
+
+        # Кэш готовых предложений по содержимому загрузки, конфигурации и шаблону
+        RESULT_CACHE_ENABLED=os.getenv('RESULT_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+        RESULT_CACHE_FOLDER=os.getenv('RESULT_CACHE_FOLDER', 'cache'),
+        RESULT_CACHE_MAX_BYTES=int(os.getenv('RESULT_CACHE_MAX_BYTES', 512 * 1024 * 1024)),
+
+        # Отдача документов: '' (приложение), 'x-accel' (nginx), 'x-sendfile' (Apache, lighttpd)
+        # или 'presigned' (подписанная ссылка S3)
+        DOWNLOAD_OFFLOAD=os.getenv('DOWNLOAD_OFFLOAD', ''),
+        # Внутренний location nginx, указывающий на OUTPUT_FOLDER
+        DOWNLOAD_ACCEL_PREFIX=os.getenv('DOWNLOAD_ACCEL_PREFIX', '/protected/output/'),
+
+        # Хранение извлеченных данных: 'inline' (колонка data) или 'compressed' (таблица proposal_payload)
+        PROPOSAL_DATA_STORAGE=os.getenv('PROPOSAL_DATA_STORAGE', 'inline'),
+
+        # Замеры стадий обработки и эндпоинт /metrics для Prometheus
+        TRACING_ENABLED=os.getenv('TRACING_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+        METRICS_ENABLED=os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+
+        # Журнал приложения
+        LOG_FOLDER=os.getenv('LOG_FOLDER', 'logs'),
+        LOG_LEVEL=os.getenv('LOG_LEVEL', 'INFO')
+    )
+    if config:
+        app.config.update(config)
+
+    init_logging(app)
+
+    # Инициализация расширений
+    db.init_app(app)
+    CORS(app)  # Включаем CORS для всех маршрутов
+    _init_migrations(app)
+
+    # Создание необходимых директорий
+    for folder in ['UPLOAD_FOLDER', 'TEMPLATE_FOLDER', 'OUTPUT_FOLDER', 'WORK_FOLDER']:
+        os.makedirs(app.config[folder], exist_ok=True)
+
+    # Регистрация маршрутов
+    register_routes(app)
+
+    # Очередь заданий на создание предложений и канал прогресса
+    init_job_queue(app)
+    init_progress(app)
+    init_upload_tracker(app)
+    init_result_cache(app)
+    init_tracing(app)
+    init_auth_cache(app)
+    init_password_hasher(app)
+    init_pdf_converter(app)
+    init_batch(app)
+    init_object_storage(app)
+    init_output_storage(app)
+
+    _register_handlers(app)
+    return app
+
+
+def _init_migrations(app):
+    """
+    Подключает Flask-Migrate только для команд flask CLI
+
+    Alembic нужен лишь командам flask db: веб-процессы его не импортируют.
+    """
+    context = click.get_current_context(silent=True)
+    if context is None or not isinstance(context.find_root().command, FlaskGroup):
+        return
+    from flask_migrate import Migrate
+    Migrate(app, db, directory=str(MIGRATIONS_DIR))
+
+
+def _register_handlers(app):
+    # Обработчик ошибок
+    @app.errorhandler(404)
+    def not_found_error(error):
+        return jsonify({'error': 'Not found'}), 404
+
+    @app.errorhandler(500)
+    def internal_error(error):
+        db.session.rollback()  # Откатываем сессию в случае ошибки
+        return jsonify({'error': 'Internal server error'}), 500
+
+    # Проверка работоспособности API
+    @app.route('/health')
+    def health_check():
+        return jsonify({
+            'status': 'healthy',
+            'database': check_database_connection(app)
+        })
+
+
+def check_database_connection(app):
     try:
-        db.session.execute('SELECT 1')
+        db.session.execute(text('SELECT 1'))
         return True
     except Exception as e:
         app.logger.error(f"Database connection error: {str(e)}")
         return False
 
-if __name__ == '__main__':
-    # Создаем таблицы БД (только для разработки)
-    with app.app_context():
-        db.create_all()
-    
-    # Запускаем приложение
-    debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
-    app.run(
-        host=os.getenv('FLASK_HOST', '0.0.0.0'),
-        port=int(os.getenv('FLASK_PORT', 5000)),
-        debug=debug_mode
-    )
\ No newline at end of file
@@ -0,0 +1,198 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from werkzeug.utils import secure_filename
+
+from .excel_reader import ExtractionPlan
+from .uploads import spool_upload
+from .utils import generate_word, process_excel
+from .word_templates import ENGINE_DOCX
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xls')
+
+
+@dataclass
+class BatchItem:
+    """Один элемент пакетной генерации"""
+    index: int
+    name: str
+    output_path: str
+    template_path: str
+    engine: str = ENGINE_DOCX
+    excel_path: Optional[str] = None  # Режим "файл на клиента"
+    plan: Optional[ExtractionPlan] = None
+    data: Optional[Dict[str, Any]] = None  # Режим "строка на клиента"
+
+
+@dataclass
+class BatchResult:
+    """Результат обработки элемента пакета"""
+    index: int
+    name: str
+    status: str
+    output_path: Optional[str] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    processing_time: float = 0.0
+
+
+def process_item(item: BatchItem) -> BatchResult:
+    """
+    Обрабатывает один элемент пакета: извлечение данных и генерация документа
+
+    Выполняется в процессе пула, поэтому не обращается к Flask и БД.
+    """
+    start_time = time.perf_counter()
+    try:
+        data = item.data
+        if data is None:
+            data = process_excel(item.excel_path, item.plan)
+            if not data:
+                raise ValueError('Ошибка при обработке Excel файла')
+
+        if not generate_word(data, item.template_path, item.output_path, engine=item.engine):
+            raise RuntimeError('Ошибка при создании документа')
+
+        return BatchResult(
+            index=item.index,
+            name=item.name,
+            status='completed',
+            output_path=item.output_path,
+            data=data,
+            processing_time=time.perf_counter() - start_time
+        )
+    except Exception as e:
+        logging.exception(f"Ошибка при обработке элемента пакета: {item.name}")
+        return BatchResult(
+            index=item.index,
+            name=item.name,
+            status='error',
+            data=data or {},
+            error=str(e),
+            processing_time=time.perf_counter() - start_time
+        )
+
+
+# Процессы пула запускаются методом spawn: fork копировал бы процесс веб-сервера
+# вместе с его потоками (очередь заданий, конвертер PDF, сборщик хранилища),
+# открытыми соединениями с БД и захваченными блокировками
+START_METHOD = 'spawn'
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+_max_workers = 0
+
+
+def make_executor(max_workers: int) -> ProcessPoolExecutor:
+    """Пул процессов пакетной обработки с методом запуска START_METHOD"""
+    return ProcessPoolExecutor(max_workers=max_workers,
+                               mp_context=multiprocessing.get_context(START_METHOD))
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Общий пул процессов пакетной обработки
+
+    Создается один раз, при первом пакете, и переиспользуется всеми
+    запросами процесса. Размер - BATCH_MAX_WORKERS или число ядер.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            max_workers = _max_workers or os.cpu_count() or 1
+            _executor = make_executor(max_workers)
+            logging.info(f"Пул пакетной обработки запущен: {max_workers} процессов")
+        return _executor
+
+
+def shutdown_executor():
+    """Останавливает общий пул; следующий пакет создаст его заново"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def init_batch(app):
+    """Настраивает размер пула по BATCH_MAX_WORKERS; сам пул запускается при первом пакете"""
+    global _max_workers
+    shutdown_executor()
+    _max_workers = app.config['BATCH_MAX_WORKERS']
+
+
+def run_batch(items: List[BatchItem], executor: Optional[ProcessPoolExecutor] = None) -> List[BatchResult]:
+    """
+    Распределяет элементы пакета по пулу процессов
+
+    Args:
+        items (List[BatchItem]): Элементы пакета
+        executor (Optional[ProcessPoolExecutor]): Пул; по умолчанию общий
+
+    Returns:
+        List[BatchResult]: Результаты в порядке элементов
+    """
+    if not items:
+        return []
+    executor = executor or get_executor()
+    return list(executor.map(process_item, items))
+
+
+def collect_workbooks(uploads, work_dir: Path, max_items: int) -> List[Tuple[Path, str]]:
+    """
+    Сохраняет загруженные книги во временную папку пакета
+
+    Zip-архивы распаковываются, из них берутся только Excel-файлы.
+
+    Returns:
+        List[Tuple[Path, str]]: Пары (путь к сохраненной книге, исходное имя)
+
+    Raises:
+        ValueError: Если файлов нет или их больше max_items
+    """
+    workbooks = []
+
+    def reserve(name: str) -> Path:
+        if len(workbooks) >= max_items:
+            raise ValueError(f"Слишком много файлов в пакете, максимум {max_items}")
+        path = work_dir / f"{len(workbooks):05d}_{secure_filename(name) or 'estimate.xlsx'}"
+        workbooks.append((path, name))
+        return path
+
+    for upload in uploads:
+        filename = upload.filename or ''
+        if filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(upload.stream) as archive:
+                for info in archive.infolist():
+                    # Берем только имя файла, пути внутри архива игнорируем
+                    name = Path(info.filename).name
+                    if info.is_dir() or not name.lower().endswith(EXCEL_EXTENSIONS):
+                        continue
+                    with archive.open(info) as source:
+                        spool_upload(source, reserve(name), size=info.file_size)
+        elif filename.lower().endswith(EXCEL_EXTENSIONS):
+            spool_upload(upload, reserve(filename))
+
+    if not workbooks:
+        raise ValueError('Не найдено ни одного Excel файла')
+    return workbooks
+
+
+def write_archive(results: List[BatchResult], archive) -> int:
+    """Упаковывает готовые документы в zip; возвращает число файлов"""
+    count = 0
+    # Документы .docx уже сжаты, повторное сжатие только тратит CPU
+    with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_STORED) as target:
+        for result in results:
+            if result.status == 'completed':
+                target.write(result.output_path, arcname=Path(result.output_path).name)
+                count += 1
+    return count
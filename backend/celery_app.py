@@ -0,0 +1,46 @@
+from typing import Optional
+
+from celery import Celery, Task
+
+from .jobs import run_proposal_job
+from .models import db
+from .utils import async_validate_excel_file
+
+# Celery-приложение; брокер задается в init_celery из конфигурации Flask.
+# Модуль импортируется только при JOB_QUEUE_BACKEND=celery и в воркере
+celery = Celery('logistics_cp')
+
+
+class AppContextTask(Task):
+    """Задача Celery, выполняемая внутри контекста Flask-приложения"""
+    abstract = True
+
+    def __call__(self, *args, **kwargs):
+        with self.app.flask_app.app_context():
+            try:
+                return super().__call__(*args, **kwargs)
+            finally:
+                db.session.remove()
+
+
+@celery.task(name='proposals.generate', base=AppContextTask, ignore_result=True)
+def generate_proposal(proposal_id: int, upload_key: str, template_path: str, engine: str,
+                      cache_key: Optional[str] = None) -> str:
+    """Celery-задача создания коммерческого предложения"""
+    return run_proposal_job(proposal_id, upload_key, template_path, engine, cache_key)
+
+
+# Асинхронная валидация больших смет (см. utils.async_validate_excel_file)
+validate_excel_file = celery.task(
+    name='excel.validate', base=AppContextTask, ignore_result=False
+)(async_validate_excel_file)
+
+
+def init_celery(app):
+    """Подключает Celery к приложению: брокер из CELERY_BROKER_URL"""
+    celery.conf.update(
+        broker_url=app.config['CELERY_BROKER_URL'],
+        task_ignore_result=True
+    )
+    celery.flask_app = app
+    return celery
@@ -0,0 +1,345 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple, Union
+
+# pandas и openpyxl импортируются при первом чтении книги, а не при старте приложения
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def parse_cell_address(cell_address: str) -> Tuple[int, int]:
+    """
+    Преобразует адрес ячейки вида "F22" в пару (строка, колонка)
+
+    Args:
+        cell_address (str): Адрес ячейки в формате Excel
+
+    Returns:
+        Tuple[int, int]: Номер строки и номер колонки (с единицы)
+
+    Raises:
+        ValueError: Если адрес ячейки некорректен
+    """
+    from openpyxl.utils.cell import column_index_from_string, coordinate_from_string
+    from openpyxl.utils.exceptions import CellCoordinatesException
+
+    try:
+        column_letter, row = coordinate_from_string(cell_address.strip().upper())
+    except CellCoordinatesException as e:
+        # Исключение openpyxl не наследует ValueError
+        raise ValueError(str(e)) from e
+    return row, column_index_from_string(column_letter)
+
+
+@dataclass(frozen=True)
+class SheetPlan:
+    """Разобранные адреса одного листа, отсортированные по (строка, колонка)"""
+    sheet_name: str
+    cells: Tuple[Tuple[str, str, int, int], ...]  # (ключ, адрес, строка, колонка)
+    min_row: int = 0
+    max_row: int = 0
+    min_col: int = 0
+    max_col: int = 0
+
+
+@dataclass(frozen=True)
+class ExtractionPlan:
+    """
+    Скомпилированный план извлечения данных из Excel
+
+    Строится один раз для конфигурации: адреса ячеек заранее разобраны
+    в пары (строка, колонка), сгруппированы по листам и отсортированы
+    по строкам, так что каждый лист читается одним упорядоченным проходом.
+    """
+    sheets: Tuple[SheetPlan, ...]
+    digest: str = ''
+
+    @classmethod
+    def compile(cls, config: List[Dict], digest: str = '') -> 'ExtractionPlan':
+        cells_by_sheet = defaultdict(list)
+        for sheet_config in config:
+            sheet_name = sheet_config["sheet_name"]
+            for key, cell_address in sheet_config["data_mapping"].items():
+                try:
+                    row, col = parse_cell_address(cell_address)
+                except ValueError:
+                    logging.error(f"Неверный адрес ячейки: {cell_address}")
+                    row, col = 0, 0
+                cells_by_sheet[sheet_name].append((key, cell_address, row, col))
+
+        sheets = []
+        for sheet_name, cells in cells_by_sheet.items():
+            cells.sort(key=lambda cell: (cell[2], cell[3]))
+            valid = [cell for cell in cells if cell[2] > 0]
+            if valid:
+                sheets.append(SheetPlan(
+                    sheet_name=sheet_name,
+                    cells=tuple(cells),
+                    min_row=valid[0][2],
+                    max_row=valid[-1][2],
+                    min_col=min(cell[3] for cell in valid),
+                    max_col=max(cell[3] for cell in valid)
+                ))
+            else:
+                sheets.append(SheetPlan(sheet_name=sheet_name, cells=tuple(cells)))
+        return cls(sheets=tuple(sheets), digest=digest)
+
+
+class ExtractionPlanCache:
+    """
+    Кэш скомпилированных планов по пути к файлу конфигурации
+
+    Запись проверяется по mtime и размеру файла; если они изменились,
+    содержимое перечитывается и сравнивается по SHA-256, и план
+    перекомпилируется только при реальном изменении конфигурации.
+    """
+    def __init__(self):
+        self._plans: Dict[str, Tuple[Tuple[int, int], ExtractionPlan]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, config_path: str) -> ExtractionPlan:
+        path = str(Path(config_path).resolve())
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._plans.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest = hashlib.sha256(raw).hexdigest()
+
+        if cached and cached[1].digest == digest:
+            plan = cached[1]
+        else:
+            plan = ExtractionPlan.compile(json.loads(raw.decode("utf-8")), digest)
+            logging.info(f"План извлечения скомпилирован: {config_path}")
+
+        with self._lock:
+            self._plans[path] = (signature, plan)
+        return plan
+
+    def clear(self):
+        with self._lock:
+            self._plans.clear()
+
+
+# Глобальный кэш планов извлечения
+extraction_plan_cache = ExtractionPlanCache()
+
+
+def get_extraction_plan(config_path: str) -> ExtractionPlan:
+    """Возвращает план извлечения для файла конфигурации из кэша"""
+    return extraction_plan_cache.get(config_path)
+
+
+def _scan_sheet(sheet, plan: SheetPlan) -> Dict[Tuple[int, int], Any]:
+    """
+    Читает лист одним проходом в пределах прямоугольника нужных ячеек
+
+    Чтение останавливается на максимальной строке из плана, поэтому
+    строки ниже неё не разбираются вовсе.
+    """
+    if not plan.max_row:
+        return {}
+
+    wanted = {(row, col) for _, _, row, col in plan.cells}
+    values = {}
+    rows = sheet.iter_rows(
+        min_row=plan.min_row, max_row=plan.max_row,
+        min_col=plan.min_col, max_col=plan.max_col,
+        values_only=True
+    )
+    for row_idx, row in enumerate(rows, start=plan.min_row):
+        for col_idx, value in enumerate(row, start=plan.min_col):
+            if (row_idx, col_idx) in wanted:
+                values[(row_idx, col_idx)] = value
+    return values
+
+
+def _open_workbook(file_path: str, data_only: bool = True):
+    """Открывает книгу openpyxl в режиме read-only"""
+    from openpyxl import load_workbook
+    return load_workbook(file_path, read_only=True, data_only=data_only)
+
+
+def extract_cells(file_path: str, config: Union[List[Dict], ExtractionPlan]) -> Dict[str, Any]:
+    """
+    Потоково извлекает значения ячеек из Excel-файла согласно конфигурации
+
+    Книга открывается в режиме read-only: разбираются только листы,
+    указанные в конфигурации, и только до последней нужной строки.
+    Результат совпадает с поиском через sheet[cell_address] в полностью
+    загруженной книге.
+
+    Args:
+        file_path (str): Путь к Excel-файлу
+        config (Union[List[Dict], ExtractionPlan]): Конфигурация листов
+            и адресов ячеек или уже скомпилированный план
+
+    Returns:
+        Dict[str, Any]: Словарь {ключ: значение ячейки}
+    """
+    if not Path(file_path).exists():
+        raise FileNotFoundError(f"Excel файл не найден: {file_path}")
+
+    plan = config if isinstance(config, ExtractionPlan) else ExtractionPlan.compile(config)
+
+    workbook = _open_workbook(file_path)
+    try:
+        data = {}
+        for sheet_plan in plan.sheets:
+            sheet_name = sheet_plan.sheet_name
+            if sheet_name not in workbook.sheetnames:
+                logging.warning(f"Лист '{sheet_name}' не найден")
+                continue
+
+            values = _scan_sheet(workbook[sheet_name], sheet_plan)
+            for key, cell_address, row, col in sheet_plan.cells:
+                value = values.get((row, col))
+                if value is None and row > 0:
+                    logging.warning(f"Пустая ячейка: {cell_address} на листе {sheet_name}")
+                data[key] = value
+        return data
+    finally:
+        workbook.close()
+
+
+def iter_client_rows(file_path: str, sheet_name: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Потоково читает лист, где каждая строка - данные для отдельного клиента
+
+    Первая строка листа содержит ключи данных (step_1, tax, ...),
+    последующие непустые строки возвращаются словарями {ключ: значение}.
+
+    Args:
+        file_path (str): Путь к Excel-файлу
+        sheet_name (Optional[str]): Имя листа; по умолчанию активный лист
+
+    Yields:
+        Dict[str, Any]: Данные одной строки
+    """
+    workbook = _open_workbook(file_path)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return
+        keys = [str(key).strip() if key is not None else None for key in header]
+
+        for row in rows:
+            if all(value is None for value in row):
+                continue
+            yield {key: value for key, value in zip(keys, row) if key}
+    finally:
+        workbook.close()
+
+
+def _frame_columns(header) -> List[str]:
+    # Пустые заголовки называем так же, как pandas.read_excel
+    return [
+        str(name).strip() if name is not None else f"Unnamed: {index}"
+        for index, name in enumerate(header)
+    ]
+
+
+def _data_rows(rows: Iterator[tuple], width: int) -> Iterator[Tuple[int, tuple]]:
+    """
+    Строки данных листа с номерами, выровненные по ширине заголовка
+
+    Пустые строки внутри данных read_excel сохраняет как NaN, поэтому серия
+    пустых строк выдается, только когда за ней нашлась непустая строка;
+    хвост из пустых строк отбрасывается.
+    """
+    blank_from = None
+    for position, row in enumerate(rows):
+        if all(value is None for value in row):
+            if blank_from is None:
+                blank_from = position
+            continue
+        if blank_from is not None:
+            for blank_position in range(blank_from, position):
+                yield blank_position, (None,) * width
+            blank_from = None
+        # Строки read-only листа бывают короче или длиннее заголовка
+        yield position, tuple(row[:width]) + (None,) * (width - len(row))
+
+
+def iter_frame_chunks(file_path: str, chunk_size: int = 1000,
+                      sheet_name: Optional[str] = None) -> Iterator['pd.DataFrame']:
+    """
+    Потоково читает лист порциями DataFrame фиксированного размера
+
+    Первая строка листа - заголовки колонок. Индекс порции - номер строки
+    данных с нуля, как у pd.read_excel, поэтому номера строк в ошибках
+    валидации не зависят от размера порции. Как и read_excel, пустые строки
+    внутри данных выдаются строками из None, а пустые строки в конце листа
+    отбрасываются. В памяти одновременно находится не больше chunk_size строк.
+
+    Файлы .xls openpyxl не читает: они загружаются целиком и режутся на порции.
+
+    Args:
+        file_path (str): Путь к Excel-файлу
+        chunk_size (int): Число строк в порции
+        sheet_name (Optional[str]): Имя листа; по умолчанию первый лист
+
+    Yields:
+        pd.DataFrame: Очередная порция строк
+    """
+    import pandas as pd
+
+    if str(file_path).lower().endswith('.xls'):
+        df = pd.read_excel(file_path, sheet_name=sheet_name or 0)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+        return
+
+    workbook = _open_workbook(file_path)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return
+        columns = _frame_columns(header)
+        width = len(columns)
+
+        records, index = [], []
+        for position, record in _data_rows(rows, width):
+            records.append(record)
+            index.append(position)
+            if len(records) >= chunk_size:
+                yield pd.DataFrame.from_records(records, columns=columns, index=index)
+                records, index = [], []
+
+        if records:
+            yield pd.DataFrame.from_records(records, columns=columns, index=index)
+    finally:
+        workbook.close()
+
+
+def estimate_data_rows(file_path: str, sheet_name: Optional[str] = None) -> Optional[int]:
+    """
+    Оценивает число строк данных по размерам листа без чтения ячеек
+
+    Returns:
+        Optional[int]: Число строк без заголовка или None, если размер листа неизвестен
+    """
+    if str(file_path).lower().endswith('.xls'):
+        return None
+    workbook = _open_workbook(file_path, data_only=False)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        max_row = sheet.max_row
+        return max(max_row - 1, 0) if max_row else None
+    finally:
+        workbook.close()
@@ -0,0 +1,139 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# Виды проверок колонок
+RULE_POSITIVE = 'positive'  # Число больше нуля
+RULE_REQUIRED = 'required'  # Непустое значение
+
+# Сколько номеров строк выводить в сообщении об ошибке
+MAX_REPORTED_ROWS = int(os.getenv('VALIDATION_MAX_REPORTED_ROWS', 20))
+
+
+@dataclass(frozen=True)
+class ColumnRule:
+    """
+    Декларативное правило проверки колонки
+
+    Attributes:
+        column (str): Имя колонки; отсутствующие колонки пропускаются
+        kind (str): Вид проверки (RULE_POSITIVE или RULE_REQUIRED)
+        message (str): Начало сообщения, к нему добавляется список строк
+    """
+    column: str
+    kind: str
+    message: str
+
+
+# Правила смет по умолчанию; порядок определяет порядок сообщений
+DEFAULT_RULES: Tuple[ColumnRule, ...] = (
+    ColumnRule('price', RULE_POSITIVE, 'Неверные цены в строках'),
+    ColumnRule('quantity', RULE_POSITIVE, 'Неверное количество в строках'),
+    ColumnRule('name', RULE_REQUIRED, 'Пустые наименования в строках'),
+)
+
+
+def _positive_mask(column: pd.Series) -> pd.Series:
+    """Маска корректных значений: число больше нуля"""
+    numeric = pd.to_numeric(column, errors='coerce')
+    if column.dtype == object:
+        # Числа, сохраненные в Excel как текст, считаются ошибкой, как и раньше
+        numeric = numeric.mask(column.map(type).eq(str))
+    # NaN в сравнении дает False, поэтому пустые ячейки тоже ошибочны
+    return numeric.gt(0)
+
+
+def _required_mask(column: pd.Series) -> pd.Series:
+    """Маска корректных значений: не пусто и не пустая строка"""
+    return column.notna() & column.ne('')
+
+
+RULE_MASKS = {
+    RULE_POSITIVE: _positive_mask,
+    RULE_REQUIRED: _required_mask,
+}
+
+
+def find_invalid_rows(df: pd.DataFrame,
+                      rules: Iterable[ColumnRule] = DEFAULT_RULES) -> List[Tuple[ColumnRule, pd.Index]]:
+    """
+    Находит строки, нарушающие правила, векторными операциями по колонкам
+
+    Returns:
+        List[Tuple[ColumnRule, pd.Index]]: Нарушенные правила и индексы строк
+    """
+    violations = []
+    for rule in rules:
+        if rule.column not in df.columns:
+            continue
+        valid = RULE_MASKS[rule.kind](df[rule.column])
+        if not valid.all():
+            violations.append((rule, df.index[~valid.to_numpy()]))
+    return violations
+
+
+def format_rows(rows: Sequence, total: Optional[int] = None,
+                max_reported: int = MAX_REPORTED_ROWS) -> str:
+    """Список строк для сообщения; лишние строки сворачиваются в счетчик"""
+    total = len(rows) if total is None else total
+    shown = list(rows[:max_reported])
+    if total > len(shown):
+        return f"{shown} и еще {total - len(shown)}"
+    return str(shown)
+
+
+class ValidationAccumulator:
+    """
+    Собирает нарушения правил по частям DataFrame
+
+    Для каждого правила хранится не больше max_reported номеров строк и
+    общий счетчик, поэтому память не растет с размером файла, а итоговые
+    сообщения совпадают с проверкой всего файла целиком.
+    """
+    def __init__(self, rules: Iterable[ColumnRule] = DEFAULT_RULES,
+                 max_reported: int = MAX_REPORTED_ROWS):
+        self.rules = tuple(rules)
+        self.max_reported = max_reported
+        self.total_rows = 0
+        self._rows: Dict[ColumnRule, List] = {}
+        self._counts: Dict[ColumnRule, int] = {}
+
+    def add(self, df: pd.DataFrame):
+        """Проверяет очередную часть данных"""
+        self.total_rows += len(df)
+        for rule, rows in find_invalid_rows(df, self.rules):
+            reported = self._rows.setdefault(rule, [])
+            if len(reported) < self.max_reported:
+                reported.extend(rows[:self.max_reported - len(reported)].tolist())
+            self._counts[rule] = self._counts.get(rule, 0) + len(rows)
+
+    def result(self) -> Dict[str, object]:
+        """Итог проверки: is_valid и список сообщений errors"""
+        errors = [
+            f"{rule.message}: {format_rows(self._rows[rule], self._counts[rule], self.max_reported)}"
+            for rule in self.rules if rule in self._counts
+        ]
+        return {
+            'is_valid': len(errors) == 0,
+            'errors': errors
+        }
+
+
+def validate_frame(df: pd.DataFrame, rules: Iterable[ColumnRule] = DEFAULT_RULES,
+                   max_reported: int = MAX_REPORTED_ROWS) -> Dict[str, object]:
+    """
+    Проверяет DataFrame по правилам колонок
+
+    Args:
+        df (pd.DataFrame): Данные сметы
+        rules (Iterable[ColumnRule]): Правила проверки
+        max_reported (int): Сколько номеров строк выводить в каждом сообщении
+
+    Returns:
+        Dict[str, object]: is_valid и список сообщений errors
+    """
+    accumulator = ValidationAccumulator(rules, max_reported)
+    accumulator.add(df)
+    return accumulator.result()
@@ -0,0 +1,5 @@
+from flask_sqlalchemy import SQLAlchemy
+
+# Расширения создаются без приложения и подключаются к нему в create_app,
+# поэтому модели можно импортировать без сборки всего приложения
+db = SQLAlchemy()
@@ -0,0 +1,250 @@
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from typing import Optional
+
+from flask import current_app
+
+from .excel_reader import get_extraction_plan
+from .models import db, ProposalHistory, unit_of_work
+from .object_storage import object_storage
+from .output_storage import output_storage
+from .progress import report_progress
+from .result_cache import result_cache
+from .tracing import Trace, start_trace
+from .uploads import work_dir
+from .utils import generate_pdf, generate_word, process_excel
+from .word_templates import ENGINE_DOCX
+
+# Бэкенды очереди заданий
+QUEUE_LOCAL = 'local'
+QUEUE_CELERY = 'celery'
+
+
+def proposal_channel(proposal_id: int) -> str:
+    """Имя канала прогресса для задания"""
+    return f"proposal-{proposal_id}"
+
+
+def run_proposal_job(proposal_id: int, upload_key: str, template_path: str, engine: str,
+                     cache_key: Optional[str] = None) -> str:
+    """
+    Выполняет задание на создание коммерческого предложения
+
+    Публикует стадии в канал прогресса proposal-<id>; в ProposalHistory
+    итоговый статус completed/error пишется одним commit вместе с данными.
+    Загрузка берется из object_storage.uploads по ключу upload_key и
+    удаляется по завершении. Документ пишется в собственную рабочую папку
+    задания и переносится в хранилище документов готовым. В кэш результатов
+    (ключ cache_key) он кладется только после успешного commit, а при ошибке
+    commit удаляется из хранилища.
+
+    Returns:
+        str: Итоговый статус задания
+    """
+    start_time = time.time()
+    channel = proposal_channel(proposal_id)
+    proposal = ProposalHistory.query.get(proposal_id)
+    if proposal is None:
+        logging.error(f"Задание {proposal_id} не найдено")
+        object_storage.uploads.delete(upload_key)
+        report_progress(channel, ProposalHistory.STATUS_ERROR, error='Задание не найдено')
+        return ProposalHistory.STATUS_ERROR
+
+    with work_dir(current_app.config['WORK_FOLDER'], f"job_{proposal_id}") as job_dir, \
+            start_trace('job', template=Path(template_path).name) as trace:
+        uncommitted_output, cache_source = None, None
+        try:
+            # Статус processing живет только в хранилище прогресса: в БД задание
+            # пишется один раз, итоговым commit
+            report_progress(channel, ProposalHistory.STATUS_PROCESSING, stage='extract', progress=0.0)
+
+            # Берем скомпилированный план извлечения и обрабатываем файл
+            with trace.stage('load_config'):
+                plan = get_extraction_plan(current_app.config['EXTRACTION_CONFIG'])
+            # Для S3 книга скачивается в рабочую папку задания на время разбора
+            with object_storage.uploads.local_copy(upload_key, job_dir) as excel_path:
+                data = process_excel(str(excel_path), plan)
+            if not data:
+                logging.error(f"Задание {proposal_id}: ошибка при обработке Excel файла")
+                _finish(proposal, ProposalHistory.STATUS_ERROR, trace)
+                report_progress(channel, proposal.status, stage='extract',
+                                error='Ошибка при обработке Excel файла')
+                return proposal.status
+
+            proposal.set_payload(data)
+            report_progress(channel, ProposalHistory.STATUS_PROCESSING, stage='render', progress=50.0)
+
+            # Уникальное имя выходного файла в подпапке шарда; документ пишется
+            # в рабочую папку задания и переносится в хранилище готовым
+            output_filename = output_storage.relative_path(output_storage.new_name(f"proposal_{proposal.id}"))
+            output_path = job_dir / PurePosixPath(output_filename).name
+
+            if not generate_word(data, template_path, str(output_path), engine=engine):
+                logging.error(f"Задание {proposal_id}: ошибка при создании документа")
+                _finish(proposal, ProposalHistory.STATUS_ERROR, trace)
+                report_progress(channel, proposal.status, stage='render',
+                                error='Ошибка при создании документа')
+                return proposal.status
+
+            if current_app.config['PDF_OUTPUT_ENABLED']:
+                # PDF-версия не обязательна: при ошибке ее создаст скачивание
+                report_progress(channel, ProposalHistory.STATUS_PROCESSING, stage='pdf', progress=80.0)
+                pdf_path = output_path.with_suffix('.pdf')
+                if generate_pdf(str(output_path), str(pdf_path)):
+                    output_storage.store(output_storage.pdf_path(output_filename), pdf_path)
+
+            if cache_key:
+                # Документ переносится в хранилище, а в кэш попадает только после
+                # commit, поэтому в рабочей папке для кэша остается ссылка на него
+                cache_source = job_dir / f"cache_{output_path.name}"
+                _link_or_copy(output_path, cache_source)
+
+            proposal.output_size = output_path.stat().st_size
+            with trace.stage('store_output'):
+                output_storage.store(output_filename, output_path)
+            uncommitted_output = output_filename
+            proposal.file_path = output_filename
+            proposal.processing_time = time.time() - start_time
+            _finish(proposal, ProposalHistory.STATUS_COMPLETED, trace)
+            uncommitted_output = None
+
+            if cache_source is not None:
+                with trace.stage('cache_store'):
+                    result_cache.put(cache_key, cache_source, data)
+            report_progress(channel, proposal.status, stage='render', progress=100.0,
+                            file_url=f'/api/download/{output_filename}')
+            return proposal.status
+
+        except Exception as e:
+            logging.exception(f"Ошибка при выполнении задания {proposal_id}")
+            db.session.rollback()
+            if uncommitted_output:
+                # Без commit документ никому не принадлежит
+                output_storage.remove(uncommitted_output)
+            with unit_of_work():
+                proposal.update_status(ProposalHistory.STATUS_ERROR, commit=False)
+            report_progress(channel, proposal.status, error=str(e))
+            return proposal.status
+
+        finally:
+            # Удаляем загрузку; рабочая папка с остатками удаляется при выходе из with
+            object_storage.uploads.delete(upload_key)
+
+
+def regenerate_output(proposal: ProposalHistory) -> bool:
+    """
+    Создает заново документ, удаленный по сроку хранения, из сохраненных данных
+
+    Используется текущий шаблон; документ пишется в рабочую папку запроса и
+    переносится в хранилище готовым, поэтому одновременные скачивания не
+    видят недописанный файл, а параллельные пересоздания не мешают друг
+    другу. Отметка file_expired_at снимается, а updated_at обновляется, и
+    срок хранения отсчитывается заново.
+
+    Returns:
+        bool: True, если документ создан
+    """
+    if not current_app.config['OUTPUT_REGENERATE'] or not proposal.is_completed:
+        return False
+    data = proposal.get_payload()
+    if not data:
+        return False
+
+    template_path = Path(current_app.config['TEMPLATE_FOLDER']) / "template.docx"
+    engine = current_app.config['TEMPLATE_ENGINES'].get(template_path.name, ENGINE_DOCX)
+    with work_dir(current_app.config['WORK_FOLDER'], f"regenerate_{proposal.id}") as directory:
+        temp_path = directory / PurePosixPath(proposal.file_path).name
+        if not generate_word(data, str(template_path), str(temp_path), engine=engine):
+            return False
+        output_size = temp_path.stat().st_size
+        output_storage.store(proposal.file_path, temp_path)
+
+    with unit_of_work():
+        proposal.file_expired_at = None
+        proposal.output_size = output_size
+        proposal.updated_at = datetime.utcnow()
+    logging.info(f"Документ предложения {proposal.id} создан заново: {proposal.file_path}")
+    return True
+
+
+def _link_or_copy(source: Path, target: Path):
+    """Жесткая ссылка на файл; если файловая система их не поддерживает - копия"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _finish(proposal: ProposalHistory, status: str, trace: Trace):
+    """Сохраняет итоговый статус, данные, выходной файл и замеры стадий одним commit"""
+    with trace.stage('db_commit'), unit_of_work():
+        # Итоговый commit сам в разбивку не попадает, только в гистограммы
+        proposal.stage_timings = dict(proposal.stage_timings or {}, **trace.snapshot())
+        proposal.update_status(status, commit=False)
+
+
+class LocalJobQueue:
+    """
+    Очередь заданий внутри процесса на пуле потоков
+
+    Используется для локального запуска без брокера: запрос возвращается
+    сразу, а задание выполняется в фоновом потоке.
+    """
+    def __init__(self, app, max_workers: int = 4):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='proposal-job')
+
+    def enqueue(self, proposal_id: int, upload_key: str, template_path: str, engine: str,
+                cache_key: Optional[str] = None):
+        self.executor.submit(self._run, proposal_id, upload_key, template_path, engine, cache_key)
+
+    def _run(self, *args):
+        with self.app.app_context():
+            try:
+                run_proposal_job(*args)
+            except Exception:
+                logging.exception("Ошибка в фоновом задании")
+            finally:
+                db.session.remove()
+
+
+class CeleryJobQueue:
+    """
+    Очередь заданий через брокер Celery (Redis или совместимый сервер)
+
+    Celery импортируется только здесь (см. celery_app): с локальной
+    очередью веб-процесс его не загружает.
+    """
+    def enqueue(self, proposal_id: int, upload_key: str, template_path: str, engine: str,
+                cache_key: Optional[str] = None):
+        from .celery_app import generate_proposal
+        generate_proposal.delay(proposal_id, upload_key, template_path, engine, cache_key)
+
+
+def init_job_queue(app):
+    """
+    Настраивает очередь заданий по JOB_QUEUE_BACKEND ('local' или 'celery')
+
+    Для Celery с локальным хранилищем (STORAGE_BACKEND=local) воркеры должны
+    видеть ту же папку UPLOAD_FOLDER, что и веб-процессы; с s3 общая папка
+    не нужна.
+    """
+    if app.config['JOB_QUEUE_BACKEND'] == QUEUE_CELERY:
+        from .celery_app import init_celery
+        init_celery(app)
+        queue = CeleryJobQueue()
+    else:
+        queue = LocalJobQueue(app, max_workers=app.config['JOB_QUEUE_WORKERS'])
+
+    app.extensions['job_queue'] = queue
+    return queue
+
+
+def get_job_queue():
+    """Возвращает очередь заданий текущего приложения"""
+    return current_app.extensions['job_queue']
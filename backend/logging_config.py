@@ -0,0 +1,26 @@
+import logging
+from datetime import datetime
+from pathlib import Path
+
+
+def init_logging(app):
+    """
+    Настраивает журнал приложения: файл с датой в LOG_FOLDER и консоль
+
+    Вызывается из create_app, а не при импорте модулей: CLI-команды,
+    миграции и воркеры, которым журнал в файл не нужен, его не создают.
+    Повторный вызов (несколько приложений в одном процессе) ничего не
+    меняет: basicConfig не трогает уже настроенный корневой логгер.
+    """
+    log_dir = Path(app.config['LOG_FOLDER'])
+    log_dir.mkdir(parents=True, exist_ok=True)
+    log_file = log_dir / f"app_{datetime.now().strftime('%Y%m%d')}.log"
+
+    logging.basicConfig(
+        level=app.config['LOG_LEVEL'],
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler(log_file, encoding='utf-8'),
+            logging.StreamHandler()  # Также выводим в консоль
+        ]
+    )
@@ -0,0 +1,175 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from typing import Dict, Optional, Set, Tuple
+
+import jwt
+from flask import current_app, jsonify, request
+from sqlalchemy import event, inspect
+
+from ..models import User
+
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """
+    Снимок пользователя, прошедшего проверку токена
+
+    Маршруты используют только id, username и role, поэтому в кэше
+    хранится неизменяемый снимок, а не ORM-объект, привязанный к сессии.
+    """
+    id: int
+    username: str
+    role: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user: User) -> 'AuthenticatedUser':
+        return cls(id=user.id, username=user.username, role=user.role, is_active=user.is_active)
+
+
+class TokenCache:
+    """
+    Кэш проверенных токенов с TTL и ограничением размера
+
+    Запись живет не дольше ttl и не дольше срока действия токена. Ключ -
+    SHA-256 токена, поэтому сами токены в памяти не копятся. Индекс
+    user_id -> ключи позволяет сбросить все токены пользователя при смене
+    роли или блокировке. Сброс действует в пределах процесса; в других
+    процессах запись доживает не дольше ttl.
+    """
+    def __init__(self, ttl: int = 60, max_size: int = 10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: 'OrderedDict[str, Tuple[AuthenticatedUser, float]]' = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[AuthenticatedUser]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, key: str, user: AuthenticatedUser, token_exp: Optional[float] = None):
+        if self.ttl <= 0:
+            return
+        ttl = self.ttl
+        if token_exp is not None:
+            ttl = min(ttl, token_exp - time.time())
+            if ttl <= 0:
+                return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (user, time.monotonic() + ttl)
+            self._by_user.setdefault(user.id, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        """Сбрасывает все закэшированные токены пользователя"""
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_user.clear()
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_user.get(entry[0].id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[entry[0].id]
+
+
+# Глобальный кэш токенов; параметры задаются в init_auth_cache
+token_cache = TokenCache()
+
+
+def _auth_error(message: str):
+    return jsonify({'error': message}), 401
+
+
+def _bearer_token() -> Optional[str]:
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    return token.strip()
+
+
+def token_required(f):
+    """
+    Декоратор маршрутов: проверяет JWT и передает пользователя первым аргументом
+
+    Повторные запросы с тем же токеном обслуживаются из token_cache без
+    обращения к БД; при промахе подпись проверяется и пользователь
+    загружается из таблицы user.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = _bearer_token()
+        if not token:
+            return _auth_error('Необходима авторизация')
+
+        key = TokenCache.key(token)
+        current_user = token_cache.get(key)
+        if current_user is None:
+            try:
+                payload = jwt.decode(token, current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+            except jwt.ExpiredSignatureError:
+                return _auth_error('Срок действия токена истек')
+            except jwt.InvalidTokenError:
+                return _auth_error('Недействительный токен')
+
+            user = User.query.get(payload.get('user_id'))
+            if user is None or not user.is_active:
+                return _auth_error('Пользователь не найден или заблокирован')
+
+            current_user = AuthenticatedUser.from_user(user)
+            token_cache.put(key, current_user, payload.get('exp'))
+
+        return f(current_user, *args, **kwargs)
+
+    return decorated
+
+
+@event.listens_for(User, 'after_update')
+def _invalidate_on_change(mapper, connection, target):
+    """Смена роли, блокировка, смена пароля или имени сбрасывает кэш токенов пользователя"""
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes()
+           for name in ('role', 'is_active', 'password', 'username')):
+        token_cache.invalidate_user(target.id)
+
+
+@event.listens_for(User, 'after_delete')
+def _invalidate_on_delete(mapper, connection, target):
+    token_cache.invalidate_user(target.id)
+
+
+def init_auth_cache(app):
+    """Настраивает кэш токенов по AUTH_CACHE_TTL (0 - выключен) и AUTH_CACHE_MAX_SIZE"""
+    token_cache.ttl = app.config['AUTH_CACHE_TTL']
+    token_cache.max_size = app.config['AUTH_CACHE_MAX_SIZE']
+    token_cache.clear()
+    return token_cache
@@ -0,0 +1,19 @@
+"""add proposal stage timings
+
+Revision ID: 3f9a2c7d1e54
+Revises: 5b1e7d0c9a42
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '3f9a2c7d1e54'
+down_revision = '5b1e7d0c9a42'
+
+
+def upgrade():
+    op.add_column('proposal_history', sa.Column('stage_timings', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('proposal_history', 'stage_timings')
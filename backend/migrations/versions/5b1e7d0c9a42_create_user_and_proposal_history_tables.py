@@ -0,0 +1,60 @@
+"""create user and proposal history tables
+
+Revision ID: 5b1e7d0c9a42
+Revises:
+Create Date: 2023-10-01
+
+Исходная схема: таблицы user и proposal_history. Базу, созданную раньше
+через db.create_all(), нужно отметить этой ревизией перед обновлением:
+
+    FLASK_APP=backend.app:create_app flask db stamp 5b1e7d0c9a42
+    FLASK_APP=backend.app:create_app flask db upgrade
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '5b1e7d0c9a42'
+down_revision = None
+
+
+def upgrade():
+    op.create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(length=80), nullable=False),
+        sa.Column('password', sa.String(length=255), nullable=False),
+        sa.Column('email', sa.String(length=120), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_login', sa.DateTime(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('role', sa.String(length=20), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('username'),
+        sa.UniqueConstraint('email')
+    )
+    op.create_table('proposal_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('original_filename', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('data', sa.JSON(), nullable=True),
+        sa.Column('file_path', sa.String(length=500), nullable=True),
+        sa.Column('file_size', sa.Integer(), nullable=True),
+        sa.Column('mime_type', sa.String(length=100), nullable=True),
+        sa.Column('processing_time', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_proposal_user', 'proposal_history', ['user_id'])
+    op.create_index('idx_proposal_created', 'proposal_history', ['created_at'])
+    op.create_index('idx_proposal_status', 'proposal_history', ['status'])
+
+
+def downgrade():
+    op.drop_index('idx_proposal_status', table_name='proposal_history')
+    op.drop_index('idx_proposal_created', table_name='proposal_history')
+    op.drop_index('idx_proposal_user', table_name='proposal_history')
+    op.drop_table('proposal_history')
+    op.drop_table('user')
@@ -0,0 +1,27 @@
+"""proposal keyset pagination index
+
+Revision ID: 7b2e9d4c1a06
+Revises: 3f9a2c7d1e54
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '7b2e9d4c1a06'
+down_revision = '3f9a2c7d1e54'
+
+
+def upgrade():
+    # Порядок колонок совпадает с ORDER BY created_at DESC, id DESC в списке предложений
+    op.create_index(
+        'idx_proposal_user_created',
+        'proposal_history',
+        ['user_id', sa.text('created_at DESC'), sa.text('id DESC')]
+    )
+    # Префикс user_id составного индекса заменяет одноколоночный индекс
+    op.drop_index('idx_proposal_user', table_name='proposal_history')
+
+
+def downgrade():
+    op.create_index('idx_proposal_user', 'proposal_history', ['user_id'])
+    op.drop_index('idx_proposal_user_created', table_name='proposal_history')
@@ -0,0 +1,19 @@
+"""add proposal file_expired_at
+
+Revision ID: a4c7e2b9d310
+Revises: e19b4d6f0c82
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'a4c7e2b9d310'
+down_revision = 'e19b4d6f0c82'
+
+
+def upgrade():
+    op.add_column('proposal_history', sa.Column('file_expired_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('proposal_history', 'file_expired_at')
@@ -0,0 +1,25 @@
+"""add proposal payload table
+
+Revision ID: c5d81f3a9b27
+Revises: 7b2e9d4c1a06
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'c5d81f3a9b27'
+down_revision = '7b2e9d4c1a06'
+
+
+def upgrade():
+    op.create_table('proposal_payload',
+        sa.Column('proposal_id', sa.Integer(), nullable=False),
+        sa.Column('content', sa.LargeBinary(), nullable=False),
+        sa.Column('raw_size', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['proposal_id'], ['proposal_history.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('proposal_id')
+    )
+
+
+def downgrade():
+    op.drop_table('proposal_payload')
@@ -0,0 +1,30 @@
+"""add proposal output_size
+
+Revision ID: d83a6f1c2e47
+Revises: a4c7e2b9d310
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'd83a6f1c2e47'
+down_revision = 'a4c7e2b9d310'
+
+
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+def upgrade():
+    # file_size остается размером загруженной сметы, размер документа - отдельно
+    op.add_column('proposal_history', sa.Column('output_size', sa.Integer(), nullable=True))
+    # Пакетные записи хранили в file_size и mime_type размер и тип документа
+    op.execute(
+        sa.text(
+            "UPDATE proposal_history SET output_size = file_size, file_size = NULL, mime_type = NULL "
+            "WHERE mime_type = :mime_type"
+        ).bindparams(mime_type=DOCX_MIME_TYPE)
+    )
+
+
+def downgrade():
+    op.drop_column('proposal_history', 'output_size')
@@ -0,0 +1,18 @@
+"""add proposal file path index
+
+Revision ID: e19b4d6f0c82
+Revises: c5d81f3a9b27
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = 'e19b4d6f0c82'
+down_revision = 'c5d81f3a9b27'
+
+
+def upgrade():
+    op.create_index('idx_proposal_file_path', 'proposal_history', ['file_path'])
+
+
+def downgrade():
+    op.drop_index('idx_proposal_file_path', table_name='proposal_history')
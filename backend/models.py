@@ -1,10 +1,14 @@
-from app import db
+from .extensions import db
 from datetime import datetime, timedelta
 import jwt
 from flask import current_app
-from werkzeug.security import generate_password_hash, check_password_hash
+import json
+import zlib
+from contextlib import contextmanager
 from sqlalchemy.ext.hybrid import hybrid_property
-from sqlalchemy import event
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import deferred
+from .passwords import password_hasher
 
 class User(db.Model):
     """Модель пользователя системы"""
@@ -18,12 +22,20 @@ class User(db.Model):
     role = db.Column(db.String(20), default='user')  # Роль пользователя
 
     def set_password(self, password):
-        """Установка хэшированного пароля"""
-        self.password = generate_password_hash(password, method='pbkdf2:sha256')
+        """Установка хэшированного пароля по текущей политике (PASSWORD_HASH_*)"""
+        self.password = password_hasher.hash(password)
 
     def check_password(self, password):
-        """Проверка пароля"""
-        return check_password_hash(self.password, password)
+        """
+        Проверка пароля в ограниченном пуле
+
+        Если хэш получен по устаревшей политике, он прозрачно заменяется
+        новым; сохранение - вместе с остальными изменениями при входе.
+        """
+        valid, new_hash = password_hasher.verify_and_update(self.password, password)
+        if new_hash:
+            self.password = new_hash
+        return valid
 
     def generate_token(self):
         """Генерация JWT токена"""
@@ -50,6 +62,10 @@ class User(db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
+# Способы хранения извлеченных данных предложения
+STORAGE_INLINE = 'inline'
+STORAGE_COMPRESSED = 'compressed'
+
 class ProposalHistory(db.Model):
     """Модель для хранения истории коммерческих предложений"""
     id = db.Column(db.Integer, primary_key=True)
@@ -59,17 +75,25 @@ class ProposalHistory(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     status = db.Column(db.String(50), default='created')
-    data = db.Column(db.JSON)
-    file_path = db.Column(db.String(500))
-    file_size = db.Column(db.Integer)  # Размер файла в байтах
-    mime_type = db.Column(db.String(100))  # MIME-тип файла
+    # Полные извлеченные данные нужны только в детальном просмотре: колонка
+    # не загружается в списках и при скачивании (см. get_payload)
+    data = deferred(db.Column(db.JSON), group='payload')
+    file_path = db.Column(db.String(500))  # Путь относительно OUTPUT_FOLDER
+    file_expired_at = db.Column(db.DateTime)  # Когда документ удален по сроку хранения
+    file_size = db.Column(db.Integer)  # Размер загруженной сметы в байтах
+    mime_type = db.Column(db.String(100))  # MIME-тип загруженной сметы
+    output_size = db.Column(db.Integer)  # Размер созданного документа в байтах
     processing_time = db.Column(db.Float)  # Время обработки в секундах
+    stage_timings = db.Column(db.JSON)  # Длительность стадий обработки в секундах
 
     # Связи
     user = db.relationship(
         'User',
         backref=db.backref('proposals', lazy='dynamic', cascade='all, delete-orphan')
     )
+    payload_row = db.relationship(
+        'ProposalPayload', uselist=False, cascade='all, delete-orphan'
+    )
 
     # Статусы предложения
     STATUS_CREATED = 'created'
@@ -90,7 +114,12 @@ class ProposalHistory(db.Model):
         self.status = self.STATUS_CREATED
 
     def update_status(self, new_status, commit=True):
-        """Обновление статуса предложения"""
+        """
+        Обновление статуса предложения
+
+        Внутри unit_of_work() передавайте commit=False: переход статуса
+        сохранится вместе с остальными изменениями одним commit.
+        """
         if new_status not in [self.STATUS_CREATED, self.STATUS_PROCESSING, 
                             self.STATUS_COMPLETED, self.STATUS_ERROR]:
             raise ValueError(f"Invalid status: {new_status}")
@@ -105,8 +134,61 @@ class ProposalHistory(db.Model):
                 db.session.rollback()
                 raise e
 
-    def to_dict(self):
-        """Преобразование в словарь для API"""
+    def set_payload(self, data):
+        """
+        Сохраняет извлеченные данные
+
+        При PROPOSAL_DATA_STORAGE=compressed данные сжимаются в отдельную
+        таблицу proposal_payload, а колонка data остается пустой. Значения,
+        которых нет в JSON (даты из ячеек Excel), в обоих случаях
+        сохраняются строками.
+        """
+        if current_app.config.get('PROPOSAL_DATA_STORAGE') == STORAGE_COMPRESSED:
+            self.data = None
+            self.payload_row = ProposalPayload.from_data(data)
+        else:
+            self.data = json_compatible(data)
+            self.payload_row = None
+
+    def get_payload(self):
+        """Извлеченные данные независимо от способа хранения"""
+        if self.payload_row is not None:
+            return self.payload_row.to_data()
+        return self.data or {}
+
+    @classmethod
+    def keyset_page(cls, user_id, after=None, limit=10):
+        """
+        Страница предложений пользователя по ключу (created_at, id), новые первыми
+
+        В отличие от OFFSET стоимость не растет с номером страницы: запрос
+        начинает чтение индекса idx_proposal_user_created сразу с ключа after.
+
+        Args:
+            user_id: Владелец предложений
+            after (Optional[Tuple[datetime, int]]): Ключ последней записи предыдущей страницы
+            limit (int): Размер страницы
+
+        Returns:
+            Tuple[List[ProposalHistory], bool]: Записи и признак наличия следующей страницы
+        """
+        query = cls.query.filter(cls.user_id == user_id)
+        if after is not None:
+            created_at, proposal_id = after
+            query = query.filter(or_(
+                cls.created_at < created_at,
+                and_(cls.created_at == created_at, cls.id < proposal_id)
+            ))
+        items = query.order_by(cls.created_at.desc(), cls.id.desc()).limit(limit + 1).all()
+        return items[:limit], len(items) > limit
+
+    def to_dict(self, username=None):
+        """
+        Преобразование в словарь для API
+
+        В списках передавайте username владельца, чтобы не загружать
+        связь user отдельным запросом на каждую строку.
+        """
         return {
             'id': self.id,
             'filename': self.original_filename,
@@ -114,18 +196,47 @@ class ProposalHistory(db.Model):
             'updated_at': self.updated_at.isoformat(),
             'status': self.status,
             'file_path': self.file_path,
+            'file_expired': self.file_expired_at is not None,
             'file_size': self.file_size,
+            'output_size': self.output_size,
             'processing_time': self.processing_time,
-            'user': self.user.username
+            'stage_timings': self.stage_timings or {},
+            'user': username if username is not None else self.user.username
         }
 
     def __repr__(self):
         return f'<ProposalHistory {self.filename}>'
 
+def json_compatible(data):
+    """Данные для колонки JSON: даты и прочие значения вне JSON - строками, как в ProposalPayload"""
+    return json.loads(json.dumps(data, ensure_ascii=False, default=str))
+
+
+class ProposalPayload(db.Model):
+    """Сжатые извлеченные данные предложения, вынесенные из основной таблицы"""
+    __tablename__ = 'proposal_payload'
+
+    proposal_id = db.Column(
+        db.Integer, db.ForeignKey('proposal_history.id', ondelete='CASCADE'), primary_key=True
+    )
+    content = db.Column(db.LargeBinary, nullable=False)  # JSON, сжатый zlib
+    raw_size = db.Column(db.Integer)  # Размер JSON до сжатия в байтах
+
+    @classmethod
+    def from_data(cls, data):
+        raw = json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+        return cls(content=zlib.compress(raw, 6), raw_size=len(raw))
+
+    def to_data(self):
+        return json.loads(zlib.decompress(self.content).decode('utf-8'))
+
 # Индексы для оптимизации запросов
-db.Index('idx_proposal_user', ProposalHistory.user_id)
+# Составной индекс под постраничный вывод по ключу; заменяет idx_proposal_user
+db.Index('idx_proposal_user_created', ProposalHistory.user_id,
+         ProposalHistory.created_at.desc(), ProposalHistory.id.desc())
 db.Index('idx_proposal_created', ProposalHistory.created_at)
 db.Index('idx_proposal_status', ProposalHistory.status)
+db.Index('idx_proposal_file_path', ProposalHistory.file_path)
 
 # События SQLAlchemy
 @event.listens_for(User, 'before_insert')
@@ -134,7 +245,21 @@ def set_default_role(mapper, connection, target):
     if not target.role:
         target.role = 'user'
 
-@event.listens_for(ProposalHistory, 'before_update')
-def update_timestamp(mapper, connection, target):
-    """Обновление временной метки при изменении записи"""
-    target.updated_at = datetime.utcnow()
\ No newline at end of file
+# updated_at обновляется через onupdate колонки, отдельный before_update не нужен
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Единица работы: все изменения внутри блока сохраняются одним commit
+
+    Промежуточные состояния (стадии, проценты) в БД не пишутся, они идут
+    в хранилище прогресса (см. progress.report_progress). При ошибке
+    транзакция откатывается.
+    """
+    try:
+        yield db.session
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
\ No newline at end of file
@@ -0,0 +1,343 @@
+import errno
+import mimetypes
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from typing import Iterator, NamedTuple, Optional
+
+# Бэкенды хранилища файлов
+STORAGE_LOCAL = 'local'
+STORAGE_S3 = 's3'
+
+# Порция потокового чтения объектов
+CHUNK_SIZE = 256 * 1024
+
+# Части multipart-загрузки в S3: файлы меньше порога уходят одним запросом
+MULTIPART_THRESHOLD = 8 * 1024 * 1024
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class StoredObject(NamedTuple):
+    """Метаданные сохраненного объекта"""
+    key: str
+    size: int
+    modified: float  # Время изменения, unix time
+    etag: str
+
+
+def _temp_name(key: str) -> str:
+    # Точка в начале: брошенные временные файлы удаляет обслуживание хранилища.
+    # Расширение сохраняется - по нему LibreOffice и python-docx определяют формат
+    name = PurePosixPath(key)
+    return f".{name.stem}.{uuid.uuid4().hex}{name.suffix}"
+
+
+class LocalObjectStore:
+    """
+    Хранилище на локальном диске (или общей папке NFS)
+
+    Ключ - путь относительно корня через '/'. Сохранение - атомарный
+    os.replace из рабочей папки (uploads.work_dir) на той же файловой
+    системе; с другой файловой системы файл копируется рядом с целевым.
+    """
+    # Объекты доступны по пути: работают X-Accel-Redirect, X-Sendfile и пережатие
+    local = True
+
+    def __init__(self, root):
+        # Абсолютный корень: send_from_directory иначе считает путь от app.root_path
+        self.root = Path(root).resolve()
+
+    def path(self, key: str) -> Path:
+        parts = PurePosixPath(key).parts
+        # Ключ из запроса не должен выводить за пределы корня
+        if not parts or PurePosixPath(key).is_absolute() or '..' in parts:
+            raise ValueError(f"Некорректный ключ хранилища: {key}")
+        return self.root.joinpath(*parts)
+
+    def store_file(self, key: str, source_path) -> None:
+        """Переносит готовый локальный файл в хранилище под ключом key"""
+        target = self.path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.replace(source_path, target)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Другая файловая система: копируем рядом с целевым и подменяем атомарно
+            temp_path = target.with_name(_temp_name(key))
+            try:
+                shutil.copyfile(source_path, temp_path)
+                os.replace(temp_path, target)
+            finally:
+                temp_path.unlink(missing_ok=True)
+            Path(source_path).unlink(missing_ok=True)
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        try:
+            stat = self.path(key).stat()
+        except FileNotFoundError:
+            return None
+        return StoredObject(key, stat.st_size, stat.st_mtime, f"{stat.st_size}:{stat.st_mtime_ns}")
+
+    def iter_chunks(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Байты объекта [start, end) порциями по CHUNK_SIZE; файл открывается сразу"""
+        f = open(self.path(key), 'rb')
+
+        def chunks():
+            with f:
+                f.seek(start)
+                remaining = None if end is None else end - start
+                while remaining is None or remaining > 0:
+                    chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        break
+                    if remaining is not None:
+                        remaining -= len(chunk)
+                    yield chunk
+        return chunks()
+
+    @contextmanager
+    def local_copy(self, key: str, directory=None) -> Iterator[Path]:
+        """Путь к объекту на диске; для локального хранилища копия не нужна"""
+        path = self.path(key)
+        if not path.exists():
+            raise FileNotFoundError(path)
+        yield path
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+    def list(self) -> Iterator[StoredObject]:
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = Path(directory) / filename
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                key = path.relative_to(self.root).as_posix()
+                yield StoredObject(key, stat.st_size, stat.st_mtime, f"{stat.st_size}:{stat.st_mtime_ns}")
+
+    def presigned_url(self, key: str, filename: str, mime_type: str) -> Optional[str]:
+        """Локальный диск не выдает подписанных ссылок"""
+        return None
+
+
+class S3Connection:
+    """
+    Общий клиент S3 с пулом соединений
+
+    Клиент boto3 потокобезопасен и держит пул HTTP-соединений на
+    max_pool_connections, поэтому один клиент обслуживает все потоки
+    процесса. boto3 импортируется и клиент создается при первом обращении:
+    запуск приложения за него не платит, а воркеры Celery создают свой
+    клиент уже после fork.
+    """
+    def __init__(self, endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 max_pool_connections: int = 10, addressing_style: str = 'auto'):
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.max_pool_connections = max_pool_connections
+        self.addressing_style = addressing_style
+        self._client = None
+        self._transfer_config = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import boto3
+                    from boto3.s3.transfer import TransferConfig
+                    from botocore.config import Config
+
+                    self._transfer_config = TransferConfig(
+                        multipart_threshold=MULTIPART_THRESHOLD,
+                        multipart_chunksize=MULTIPART_CHUNK_SIZE,
+                        # Части одного файла не должны занимать весь пул соединений
+                        max_concurrency=max(1, min(4, self.max_pool_connections // 2))
+                    )
+                    self._client = boto3.session.Session().client(
+                        's3',
+                        endpoint_url=self.endpoint_url or None,
+                        region_name=self.region or None,
+                        aws_access_key_id=self.access_key or None,
+                        aws_secret_access_key=self.secret_key or None,
+                        config=Config(
+                            max_pool_connections=self.max_pool_connections,
+                            retries={'max_attempts': 3, 'mode': 'standard'},
+                            s3={'addressing_style': self.addressing_style}
+                        )
+                    )
+        return self._client
+
+    @property
+    def transfer_config(self):
+        # Настройки передачи создаются вместе с клиентом (boto3 импортируется там)
+        if self._transfer_config is None:
+            _ = self.client
+        return self._transfer_config
+
+
+class S3ObjectStore:
+    """
+    Хранилище в S3-совместимом сервисе (AWS S3, MinIO, Ceph RGW)
+
+    Объекты лежат в bucket под префиксом prefix. Запись и чтение идут
+    порциями: файлы больше MULTIPART_THRESHOLD загружаются частями, а
+    скачивание отдается клиенту потоком из тела ответа S3 без загрузки
+    в память. Локально остаются только временные файлы в scratch_dir.
+    """
+    local = False
+
+    def __init__(self, connection: S3Connection, bucket: str, prefix: str = '',
+                 scratch_dir=None, presign_expires: int = 300):
+        self.connection = connection
+        self.bucket = bucket
+        self.prefix = prefix
+        self.scratch_dir = Path(scratch_dir or 'tmp')
+        self.presign_expires = presign_expires
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def _temp_path(self, key: str) -> Path:
+        self.scratch_dir.mkdir(parents=True, exist_ok=True)
+        return self.scratch_dir / _temp_name(key)
+
+    def store_file(self, key: str, source_path) -> None:
+        """Загружает локальный файл в S3 (частями для больших файлов) и удаляет его"""
+        mime_type = mimetypes.guess_type(key)[0] or 'application/octet-stream'
+        self.connection.client.upload_file(
+            str(source_path), self.bucket, self._key(key),
+            ExtraArgs={'ContentType': mime_type},
+            Config=self.connection.transfer_config
+        )
+        Path(source_path).unlink(missing_ok=True)
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = self.connection.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+        return StoredObject(key, response['ContentLength'], response['LastModified'].timestamp(),
+                            response['ETag'].strip('"'))
+
+    def iter_chunks(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Байты объекта [start, end) порциями по CHUNK_SIZE
+
+        Запрос GET выполняется сразу, поэтому ошибка доступа возникает до
+        начала ответа клиенту, а не посреди потока.
+        """
+        params = {'Bucket': self.bucket, 'Key': self._key(key)}
+        if start or end is not None:
+            params['Range'] = f"bytes={start}-{'' if end is None else end - 1}"
+        body = self.connection.client.get_object(**params)['Body']
+
+        def chunks():
+            try:
+                yield from body.iter_chunks(CHUNK_SIZE)
+            finally:
+                body.close()
+        return chunks()
+
+    @contextmanager
+    def local_copy(self, key: str, directory=None) -> Iterator[Path]:
+        """
+        Скачивает объект во временный файл (частями, параллельно) на время блока
+
+        Args:
+            directory: Папка для копии (рабочая папка задания), по умолчанию scratch_dir
+        """
+        path = Path(directory) / _temp_name(key) if directory else self._temp_path(key)
+        try:
+            self.connection.client.download_file(
+                self.bucket, self._key(key), str(path), Config=self.connection.transfer_config
+            )
+            yield path
+        finally:
+            path.unlink(missing_ok=True)
+
+    def delete(self, key: str) -> None:
+        self.connection.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def list(self) -> Iterator[StoredObject]:
+        paginator = self.connection.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                yield StoredObject(item['Key'][len(self.prefix):], item['Size'],
+                                   item['LastModified'].timestamp(), item['ETag'].strip('"'))
+
+    def presigned_url(self, key: str, filename: str, mime_type: str) -> Optional[str]:
+        """Подписанная ссылка на скачивание: байты отдает S3, а не приложение"""
+        return self.connection.client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.bucket,
+                'Key': self._key(key),
+                'ResponseContentDisposition': f'attachment; filename="{filename}"',
+                'ResponseContentType': mime_type
+            },
+            ExpiresIn=self.presign_expires
+        )
+
+
+class ObjectStorage:
+    """
+    Хранилища загрузок и готовых документов выбранного бэкенда
+
+    Маршруты и задания работают только с ключами: с бэкендом s3 узлы
+    приложения и воркеры не хранят состояния, и им не нужна общая папка.
+    """
+    def __init__(self):
+        self.uploads = LocalObjectStore('uploads')
+        self.outputs = LocalObjectStore('output')
+
+
+# Глобальные хранилища; бэкенд выбирается в init_object_storage
+object_storage = ObjectStorage()
+
+
+def init_object_storage(app):
+    """
+    Настраивает хранилища по STORAGE_BACKEND ('local' или 's3')
+
+    Для local загрузки и документы лежат в UPLOAD_FOLDER и OUTPUT_FOLDER.
+    Для s3 они хранятся в S3_BUCKET под префиксами S3_PREFIX + 'uploads/'
+    и 'output/', а эти папки служат только для временных файлов; оба
+    хранилища делят один клиент и пул соединений.
+    """
+    if app.config['STORAGE_BACKEND'] == STORAGE_S3:
+        connection = S3Connection(
+            endpoint_url=app.config['S3_ENDPOINT_URL'],
+            region=app.config['S3_REGION'],
+            access_key=app.config['S3_ACCESS_KEY_ID'],
+            secret_key=app.config['S3_SECRET_ACCESS_KEY'],
+            max_pool_connections=app.config['S3_MAX_POOL_CONNECTIONS'],
+            addressing_style=app.config['S3_ADDRESSING_STYLE']
+        )
+        prefix = app.config['S3_PREFIX']
+        object_storage.uploads = S3ObjectStore(
+            connection, app.config['S3_BUCKET'], f"{prefix}uploads/",
+            scratch_dir=app.config['UPLOAD_FOLDER'], presign_expires=app.config['S3_PRESIGN_EXPIRES']
+        )
+        object_storage.outputs = S3ObjectStore(
+            connection, app.config['S3_BUCKET'], f"{prefix}output/",
+            scratch_dir=app.config['OUTPUT_FOLDER'], presign_expires=app.config['S3_PRESIGN_EXPIRES']
+        )
+    else:
+        object_storage.uploads = LocalObjectStore(app.config['UPLOAD_FOLDER'])
+        object_storage.outputs = LocalObjectStore(app.config['OUTPUT_FOLDER'])
+    return object_storage
@@ -0,0 +1,153 @@
+import codecs
+import logging
+import re
+import shutil
+import zipfile
+from typing import Any, Dict, Optional
+
+from .word_templates import PLACEHOLDER_RE, format_value
+
+# Часть пакета, в которой выполняется подстановка
+DOCUMENT_PART = 'word/document.xml'
+CHUNK_SIZE = 64 * 1024
+
+_BOOKMARK_RE = re.compile(r'<w:bookmarkStart\b[^>]*?\bw:name="([^"]*)"[^>]*>')
+_TEXT_RE = re.compile(r'(<w:t(?:\s[^>]*)?>)([^<]*)')
+_RUN_BREAKS_RE = re.compile(r'(\t|\n|\r)')
+
+# Оформление числовых значений, как в движке на python-docx (Arial, 11 pt)
+_NUMERIC_RPR = '<w:rPr><w:rFonts w:ascii="Arial" w:hAnsi="Arial"/><w:sz w:val="22"/></w:rPr>'
+
+
+def _escape(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _run_xml(value: Any) -> str:
+    """Формирует разметку w:r так же, как это делает python-docx для run.text"""
+    parts = ['<w:r>']
+    if isinstance(value, (int, float)):
+        parts.append(_NUMERIC_RPR)
+    for piece in _RUN_BREAKS_RE.split(format_value(value)):
+        if piece == '\t':
+            parts.append('<w:tab/>')
+        elif piece in ('\n', '\r'):
+            parts.append('<w:br/>')
+        elif piece:
+            space = ' xml:space="preserve"' if piece != piece.strip() else ''
+            parts.append(f'<w:t{space}>{_escape(piece)}</w:t>')
+    parts.append('</w:r>')
+    return ''.join(parts)
+
+
+class DocumentXmlRewriter:
+    """
+    Потоковая подстановка значений в word/document.xml
+
+    Текст подается порциями; каждая порция обрезается перед последним
+    символом '<', а остаток переносится в следующую порцию. Так теги не
+    разрываются, а незакрытый текстовый узел <w:t> (его текст всегда
+    заканчивается перед '<') целиком ждет следующей порции вместе с
+    плейсхолдерами внутри.
+    """
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        self._pending = ''
+        self._filled_bookmarks = set()
+
+    def feed(self, chunk: str) -> str:
+        buffer = self._pending + chunk
+        cut = max(buffer.rfind('<'), 0)
+        self._pending = buffer[cut:]
+        return self._rewrite(buffer[:cut])
+
+    def close(self) -> str:
+        tail, self._pending = self._pending, ''
+        return self._rewrite(tail)
+
+    def _substitute_placeholder(self, match) -> str:
+        name = match.group(1)
+        if name in self.data:
+            return _escape(format_value(self.data[name]))
+        return match.group(0)
+
+    def _substitute_text(self, match) -> str:
+        text = PLACEHOLDER_RE.sub(self._substitute_placeholder, match.group(2))
+        return match.group(1) + text
+
+    def _insert_bookmark(self, match) -> str:
+        name = match.group(1)
+        # Как и в движке python-docx, заполняется только первая закладка с именем
+        if name in self._filled_bookmarks:
+            return match.group(0)
+        self._filled_bookmarks.add(name)
+        if name not in self.data:
+            return match.group(0)
+        return match.group(0) + _run_xml(self.data[name])
+
+    def _rewrite(self, text: str) -> str:
+        if '{{' in text:
+            text = _TEXT_RE.sub(self._substitute_text, text)
+        if 'w:bookmarkStart' in text:
+            text = _BOOKMARK_RE.sub(self._insert_bookmark, text)
+        return text
+
+
+def _copy_member(source: zipfile.ZipFile, target: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """Копирует запись архива потоком с тем же методом сжатия, именем и атрибутами"""
+    copied = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    copied.compress_type = info.compress_type
+    copied.external_attr = info.external_attr
+    copied.comment = info.comment
+    # Размер заранее известен: по нему ZipFile.open решает, нужен ли ZIP64
+    copied.file_size = info.file_size
+    with source.open(info) as reader, target.open(copied, 'w') as writer:
+        shutil.copyfileobj(reader, writer, CHUNK_SIZE)
+
+
+def _rewrite_document(source: zipfile.ZipFile, target: zipfile.ZipFile,
+                      info: zipfile.ZipInfo, data: Dict[str, Any]):
+    """Распаковывает, переписывает и сжимает document.xml потоком"""
+    rewritten = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    rewritten.compress_type = zipfile.ZIP_DEFLATED
+    rewritten.external_attr = info.external_attr
+
+    rewriter = DocumentXmlRewriter(data)
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with source.open(info) as reader, target.open(rewritten, 'w') as writer:
+        while True:
+            chunk = reader.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(rewriter.feed(decoder.decode(chunk)).encode('utf-8'))
+        tail = rewriter.feed(decoder.decode(b'', final=True)) + rewriter.close()
+        writer.write(tail.encode('utf-8'))
+
+
+def render_docx(data: Dict[str, Any], template_path: str, output_path: str) -> Optional[str]:
+    """
+    Генерирует Word-документ прямой подстановкой в OOXML
+
+    Шаблон обрабатывается как zip-архив: word/document.xml переписывается
+    потоком (закладки и плейсхолдеры {{name}}), остальные записи
+    копируются потоком с прежним методом сжатия. Результат по содержимому совпадает с
+    движком на python-docx.
+
+    Args:
+        data (Dict[str, Any]): Данные для вставки в документ
+        template_path (str): Путь к шаблону Word
+        output_path (str): Путь для сохранения результата
+
+    Returns:
+        Optional[str]: Путь к созданному файлу
+    """
+    with zipfile.ZipFile(template_path) as source, \
+            zipfile.ZipFile(output_path, 'w') as target:
+        for info in source.infolist():
+            if info.filename == DOCUMENT_PART:
+                _rewrite_document(source, target, info, data)
+            else:
+                _copy_member(source, target, info)
+
+    logging.info(f"Документ собран напрямую из OOXML: {output_path}")
+    return output_path
@@ -0,0 +1,370 @@
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path, PurePosixPath
+from typing import Dict, Optional
+
+import click
+
+from .models import ProposalHistory, db, unit_of_work
+from .object_storage import StoredObject, object_storage
+from .uploads import remove_stale_work_dirs
+
+# Комментарий архива, которым помечаются документы, пережатые в холодном хранении
+COLD_MARKER = b'logistics-cp:cold'
+
+# Временные файлы записи старше этого возраста считаются брошенными; столько же
+# должен пролежать документ без записи в истории, чтобы считаться осиротевшим
+STALE_TEMP_SECONDS = 24 * 3600
+
+# Файл блокировки, по которому обслуживание выполняет только один процесс
+LOCK_FILENAME = '.sweep.lock'
+
+# Сколько предложений помечать устаревшими за один commit
+SWEEP_BATCH_SIZE = 500
+
+
+class OutputStorage:
+    """
+    Хранилище готовых документов (object_storage.outputs)
+
+    Файлы раскладываются по подпапкам из первых символов SHA-1 имени
+    (ab/cd/proposal_1_....docx), чтобы в одной папке не скапливались сотни
+    тысяч файлов. В ProposalHistory.file_path хранится ключ с подпапками
+    (путь относительно OUTPUT_FOLDER для локального бэкенда); старые
+    записи с плоским именем продолжают работать.
+
+    Жизненный цикл файла:
+        - через cold_after_days дней документ пережимается с максимальным
+          сжатием (остается корректным .docx, отдается как есть); только
+          для локального диска - в S3 для этого есть классы хранения;
+        - через retention_days дней предложение получает отметку
+          file_expired_at, и его файл удаляется; документ можно создать
+          заново из сохраненных данных (jobs.regenerate_output).
+    Нулевые значения выключают соответствующий шаг. Файлы без записи в
+    истории удаляются только при remove_orphans.
+    """
+    def __init__(self, shard_depth: int = 2, retention_days: int = 0, cold_after_days: int = 7,
+                 remove_orphans: bool = False, work_folder=None):
+        self.shard_depth = shard_depth
+        self.retention_days = retention_days
+        self.cold_after_days = cold_after_days
+        self.remove_orphans = remove_orphans
+        # Рабочие папки запросов (uploads.work_dir), брошенные после сбоя, чистятся вместе с документами
+        self.work_folder = work_folder
+
+    @property
+    def backend(self):
+        return object_storage.outputs
+
+    @staticmethod
+    def new_name(prefix: str, suffix: str = '.docx') -> str:
+        """
+        Имя нового документа без коллизий между потоками и процессами
+
+        Время оставлено для читаемости имени скачанного файла, уникальность
+        дает случайная часть.
+        """
+        return f"{prefix}_{time.strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:12]}{suffix}"
+
+    def relative_path(self, filename: str) -> str:
+        """Путь файла относительно корня с подпапками шардирования"""
+        digest = hashlib.sha1(filename.encode('utf-8')).hexdigest()
+        shards = [digest[index * 2:index * 2 + 2] for index in range(self.shard_depth)]
+        return str(PurePosixPath(*shards, filename))
+
+    @staticmethod
+    def pdf_path(relative_path: str) -> str:
+        """Ключ PDF-версии документа"""
+        return str(PurePosixPath(relative_path).with_suffix('.pdf'))
+
+    def store(self, relative_path: str, path) -> None:
+        """Переносит записанный документ в хранилище (для local - атомарным переименованием)"""
+        self.backend.store_file(relative_path, path)
+
+    def stat(self, relative_path: str) -> Optional[StoredObject]:
+        return self.backend.stat(relative_path)
+
+    def remove(self, relative_path: str):
+        """Удаляет документ вместе с его PDF-версией"""
+        self.backend.delete(relative_path)
+        self.backend.delete(self.pdf_path(relative_path))
+
+    @staticmethod
+    def recompress(path: Path) -> bool:
+        """
+        Перепаковывает .docx с максимальным сжатием deflate
+
+        Архив помечается комментарием COLD_MARKER, поэтому повторные проходы
+        его пропускают. Время изменения сохраняется: по нему считается
+        возраст файла.
+
+        Returns:
+            bool: True, если файл был перепакован
+        """
+        stat = path.stat()
+        temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with zipfile.ZipFile(path) as source:
+                if source.comment == COLD_MARKER:
+                    return False
+                with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=9) as target:
+                    target.comment = COLD_MARKER
+                    for info in source.infolist():
+                        member = zipfile.ZipInfo(info.filename, info.date_time)
+                        member.external_attr = info.external_attr
+                        member.compress_type = zipfile.ZIP_DEFLATED
+                        target.writestr(member, source.read(info), compresslevel=9)
+            recompressed = temp_path.stat().st_size < stat.st_size
+            if not recompressed:
+                # Выигрыша нет: берем исходные байты, но помечаем архив обработанным.
+                # Правка идет в копии, файл подменяется атомарно, как и при пережатии
+                shutil.copyfile(path, temp_path)
+                with zipfile.ZipFile(temp_path, 'a') as archive:
+                    archive.comment = COLD_MARKER
+            os.utime(temp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            os.replace(temp_path, path)
+            return recompressed
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    def expire_proposals(self, now: Optional[datetime] = None) -> int:
+        """
+        Удаляет документы предложений старше retention_days и помечает их устаревшими
+
+        Выполняется в контексте приложения; отбор идет по индексу
+        idx_proposal_created порциями по SWEEP_BATCH_SIZE.
+        """
+        if not self.retention_days:
+            return 0
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+        expired = 0
+        while True:
+            proposals = (
+                ProposalHistory.query
+                .filter(ProposalHistory.created_at < cutoff,
+                        # Пересозданные документы живут срок хранения заново
+                        ProposalHistory.updated_at < cutoff,
+                        ProposalHistory.file_path.isnot(None),
+                        ProposalHistory.file_expired_at.is_(None))
+                .order_by(ProposalHistory.created_at)
+                .limit(SWEEP_BATCH_SIZE)
+                .all()
+            )
+            if not proposals:
+                return expired
+            expired_at = datetime.utcnow()
+            with unit_of_work():
+                for proposal in proposals:
+                    self.remove(proposal.file_path)
+                    proposal.file_expired_at = expired_at
+            expired += len(proposals)
+
+    def sweep_files(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Проход по файлам: пережатие холодных, удаление устаревших и брошенных временных
+
+        Документ удаляется по записи в истории, а не по возрасту файла: только
+        если expire_proposals уже пометил предложение устаревшим (файл,
+        который не удалось удалить тогда). Файлы без записи (например, после
+        сбоя) удаляются старше STALE_TEMP_SECONDS и только при remove_orphans.
+        Выполняется в контексте приложения.
+        """
+        now = now or time.time()
+        cold_after = self.cold_after_days * 86400 if self.cold_after_days else None
+        stats = {'recompressed': 0, 'removed': 0, 'orphans_removed': 0, 'temp_removed': 0}
+
+        batch = []
+        for stored in self.backend.list():
+            name = PurePosixPath(stored.key).name
+            if name == LOCK_FILENAME:
+                continue
+            if name.startswith('.'):
+                if now - stored.modified > STALE_TEMP_SECONDS:
+                    self._sweep_file(stored, lambda: self.backend.delete(stored.key), stats, 'temp_removed')
+                continue
+            batch.append(stored)
+            if len(batch) >= SWEEP_BATCH_SIZE:
+                self._sweep_batch(batch, now, cold_after, stats)
+                batch = []
+        if batch:
+            self._sweep_batch(batch, now, cold_after, stats)
+        return stats
+
+    def _sweep_batch(self, batch, now: float, cold_after: Optional[float], stats: Dict[str, int]):
+        # PDF-версия принадлежит предложению своего .docx
+        owners = {stored.key: self._document_key(stored.key) for stored in batch}
+        rows = dict(
+            db.session.query(ProposalHistory.file_path, ProposalHistory.file_expired_at)
+            .filter(ProposalHistory.file_path.in_(set(owners.values())))
+            .all()
+        )
+        db.session.rollback()
+
+        backend = self.backend
+        for stored in batch:
+            owner = owners[stored.key]
+            age = now - stored.modified
+            if owner not in rows:
+                if self.remove_orphans and age > STALE_TEMP_SECONDS:
+                    self._sweep_file(stored, lambda: backend.delete(stored.key), stats, 'orphans_removed')
+            elif rows[owner] is not None:
+                # Пересозданный после отметки документ новее ее и остается
+                expired_at = rows[owner].replace(tzinfo=timezone.utc).timestamp()
+                if stored.modified < expired_at:
+                    self._sweep_file(stored, lambda: backend.delete(stored.key), stats, 'removed')
+            elif (cold_after is not None and age > cold_after and backend.local
+                  and stored.key.endswith('.docx')):
+                self._sweep_file(stored, lambda: self.recompress(backend.path(stored.key)),
+                                 stats, 'recompressed')
+
+    @staticmethod
+    def _sweep_file(stored: StoredObject, action, stats: Dict[str, int], counter: str):
+        try:
+            if action() is not False:
+                stats[counter] += 1
+        except Exception:
+            logging.exception(f"Ошибка обслуживания файла {stored.key}")
+
+    @classmethod
+    def _document_key(cls, key: str) -> str:
+        if key.endswith('.pdf'):
+            return str(PurePosixPath(key).with_suffix('.docx'))
+        return key
+
+    def _lock_path(self) -> Path:
+        # Для S3 блокировка действует в пределах узла: повторное удаление
+        # с другого узла безвредно
+        if self.backend.local:
+            return self.backend.root / LOCK_FILENAME
+        return Path(tempfile.gettempdir()) / f"logistics_cp{LOCK_FILENAME}"
+
+    def sweep(self, min_interval: float = 0) -> Optional[Dict[str, int]]:
+        """
+        Полный проход обслуживания; в контексте приложения
+
+        Между процессами проход защищен файловой блокировкой: если другой
+        воркер уже чистит хранилище, проход пропускается (возвращается None).
+        В файле блокировки хранится время последнего прохода: фоновые потоки
+        всех воркеров передают min_interval, и дерево обходит только первый
+        из них за период, а не каждый.
+        """
+        lock_path = self._lock_path()
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, 'a+') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            try:
+                lock.seek(0)
+                try:
+                    last_sweep = float(lock.read() or 0)
+                except ValueError:
+                    last_sweep = 0
+                if min_interval and time.time() - last_sweep < min_interval:
+                    return None
+                started = time.perf_counter()
+                stats = {
+                    'expired': self.expire_proposals(),
+                    'work_removed': (remove_stale_work_dirs(self.work_folder, STALE_TEMP_SECONDS)
+                                     if self.work_folder else 0)
+                }
+                stats.update(self.sweep_files())
+                lock.seek(0)
+                lock.truncate()
+                lock.write(str(time.time()))
+                lock.flush()
+                logging.info(f"Обслуживание хранилища документов за {time.perf_counter() - started:.1f} с: {stats}")
+                return stats
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class OutputSweeper:
+    """Фоновый поток, периодически запускающий OutputStorage.sweep"""
+    def __init__(self, app, storage: OutputStorage, interval: float):
+        self.app = app
+        self.storage = storage
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='output-sweeper', daemon=True)
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Запускает поток; повторные вызовы ничего не делают"""
+        with self._lock:
+            if not self._thread.is_alive() and not self._stop_event.is_set():
+                self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    self.storage.sweep(min_interval=self.interval)
+                except Exception:
+                    logging.exception("Ошибка обслуживания хранилища документов")
+                finally:
+                    db.session.remove()
+
+
+# Глобальное хранилище документов; настраивается в init_output_storage
+output_storage = OutputStorage()
+
+
+def init_output_storage(app):
+    """
+    Настраивает хранилище по OUTPUT_* из конфигурации; бэкенд задает init_object_storage
+
+    Обслуживание здесь не запускается: create_app вызывают и CLI-команды,
+    и воркеры Celery, и тесты. Его запускает команда flask sweep-outputs
+    (по расписанию) или веб-процесс через start_output_sweeper.
+    """
+    output_storage.shard_depth = app.config['OUTPUT_SHARD_DEPTH']
+    output_storage.retention_days = app.config['OUTPUT_RETENTION_DAYS']
+    output_storage.cold_after_days = app.config['OUTPUT_COLD_AFTER_DAYS']
+    output_storage.remove_orphans = app.config['OUTPUT_REMOVE_ORPHANS']
+    output_storage.work_folder = Path(app.config['WORK_FOLDER'])
+
+    @app.cli.command('sweep-outputs')
+    @click.option('--remove-orphans', is_flag=True,
+                  help='Удалить и документы без записи в истории предложений')
+    def sweep_outputs_command(remove_orphans):
+        """Удаляет устаревшие документы и пережимает холодные"""
+        if remove_orphans:
+            output_storage.remove_orphans = True
+        stats = output_storage.sweep()
+        click.echo(stats if stats is not None else 'Обслуживание уже выполняется другим процессом')
+
+    return output_storage
+
+
+def start_output_sweeper(app) -> Optional[OutputSweeper]:
+    """
+    Фоновое обслуживание веб-процесса при OUTPUT_SWEEP_INTERVAL > 0
+
+    Поток запускается на первом HTTP-запросе: воркер Celery импортирует ту
+    же точку входа (backend.wsgi), но запросов не обслуживает, а с
+    gunicorn --preload поток создается в воркере, а не в мастере до fork.
+    """
+    if app.config['OUTPUT_SWEEP_INTERVAL'] <= 0:
+        return None
+    sweeper = OutputSweeper(app, output_storage, app.config['OUTPUT_SWEEP_INTERVAL'])
+    app.extensions['output_sweeper'] = sweeper
+
+    @app.before_request
+    def _start_output_sweeper():
+        sweeper.start()
+
+    return sweeper
@@ -0,0 +1,121 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Optional
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Все слоты проверки паролей заняты дольше допустимого ожидания"""
+    pass
+
+
+def hash_method(algorithm: str, iterations: Optional[int] = None) -> str:
+    """Строка метода werkzeug: 'pbkdf2:sha256' + ':<итерации>' для PBKDF2"""
+    if iterations and algorithm.startswith('pbkdf2'):
+        return f"{algorithm}:{iterations}"
+    return algorithm
+
+
+def stored_method(password_hash: str) -> str:
+    """Метод, которым получен сохраненный хэш (часть до первого '$')"""
+    return password_hash.split('$', 1)[0] if password_hash else ''
+
+
+class PasswordHasher:
+    """
+    Политика хэширования паролей и ограниченный пул для проверки
+
+    PBKDF2 из hashlib отпускает GIL, поэтому проверки в пуле идут
+    параллельно, но их одновременно не больше max_workers: всплеск входов
+    утром не занимает все ядра, и остальные запросы продолжают
+    обслуживаться. Если свободного слота нет дольше wait_timeout секунд,
+    проверка отклоняется с PasswordHasherBusy вместо бесконечной очереди.
+    """
+    def __init__(self, algorithm: str = 'pbkdf2:sha256', iterations: int = 260000,
+                 max_workers: int = 2, wait_timeout: float = 5.0):
+        self.method = hash_method(algorithm, iterations)
+        self.wait_timeout = wait_timeout
+        self._dummy_hash: Optional[str] = None
+        self._configure_pool(max_workers)
+
+    def _configure_pool(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hash')
+        # Ограничиваем и очередь: не больше двух ожидающих на слот
+        self._slots = threading.BoundedSemaphore(max_workers * 3)
+
+    def configure(self, algorithm: str, iterations: int, max_workers: int, wait_timeout: float):
+        self.method = hash_method(algorithm, iterations)
+        self.wait_timeout = wait_timeout
+        self._dummy_hash = None
+        if max_workers != self.max_workers:
+            old_executor = self._executor
+            self._configure_pool(max_workers)
+            old_executor.shutdown(wait=False)
+
+    def hash(self, password: str) -> str:
+        """Хэш пароля по текущей политике"""
+        return generate_password_hash(password, method=self.method)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """True, если хэш получен не текущим методом (алгоритм или стоимость изменились)"""
+        return stored_method(password_hash) != self.method
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise PasswordHasherBusy('Сервер занят проверкой паролей, повторите попытку')
+        try:
+            return self._executor.submit(func, *args).result(timeout=self.wait_timeout * 2)
+        except FutureTimeoutError:
+            raise PasswordHasherBusy('Проверка пароля заняла слишком много времени')
+        finally:
+            self._slots.release()
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """Проверяет пароль в пуле"""
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def verify_dummy(self, password: str) -> bool:
+        """
+        Проверка с той же стоимостью для несуществующего пользователя
+
+        Время ответа не выдает, зарегистрирован ли логин.
+        """
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash('dummy-password')
+        self.verify(self._dummy_hash, password)
+        return False
+
+    def verify_and_update(self, password_hash: str, password: str):
+        """
+        Проверяет пароль и при смене политики возвращает новый хэш
+
+        Returns:
+            Tuple[bool, Optional[str]]: Результат проверки и новый хэш или None
+        """
+        if not self.verify(password_hash, password):
+            return False, None
+        if self.needs_rehash(password_hash):
+            logging.info(f"Пароль перехэширован: {stored_method(password_hash)} -> {self.method}")
+            return True, self._run(self.hash, password)
+        return True, None
+
+
+# Глобальная политика паролей; параметры задаются в init_password_hasher
+password_hasher = PasswordHasher()
+
+
+def init_password_hasher(app):
+    """Настраивает политику по PASSWORD_HASH_* из конфигурации"""
+    password_hasher.configure(
+        algorithm=app.config['PASSWORD_HASH_ALGORITHM'],
+        iterations=app.config['PASSWORD_HASH_ITERATIONS'],
+        max_workers=app.config['PASSWORD_HASH_WORKERS'],
+        wait_timeout=app.config['PASSWORD_HASH_WAIT_TIMEOUT']
+    )
+    return password_hasher
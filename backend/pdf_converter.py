@@ -0,0 +1,354 @@
+import logging
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+# Фильтр экспорта Writer в PDF
+PDF_EXPORT_FILTER = 'writer_pdf_Export'
+
+
+class PdfConversionError(Exception):
+    """Ошибка преобразования документа в PDF"""
+    pass
+
+
+def _uno_available() -> bool:
+    """Импортируется ли Python-мост LibreOffice (системный пакет python3-uno)"""
+    try:
+        import uno  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ConverterWorker:
+    """
+    Долгоживущий headless-процесс LibreOffice, управляемый через UNO
+
+    У каждого воркера свой профиль (-env:UserInstallation) и свой именованный
+    канал UNO: офис с уже занятым профилем передал бы работу чужому
+    процессу, поэтому воркеры разных веб-процессов на узле не пересекаются.
+    Запуск офиса стоит секунды, поэтому процесс переиспользуется для многих
+    документов и перезапускается только после max_jobs преобразований,
+    тайм-аута или падения.
+
+    Модуль uno есть только у системного Python с пакетом python3-uno
+    (в virtualenv - при --system-site-packages); без него пул использует
+    CliConverterWorker.
+
+    Воркером пользуется один поток-владелец; из другого потока (сторож
+    тайм-аута) допустим только kill().
+    """
+    def __init__(self, index: int, soffice: str, profile_root: Path,
+                 max_jobs: int = 200, start_timeout: float = 30.0):
+        self.index = index
+        self.soffice = soffice
+        self.profile_dir = profile_root / f"{os.getpid()}-{index}"
+        self.pipe_name = f"logistics_cp_pdf_{os.getpid()}_{index}"
+        self.max_jobs = max_jobs
+        self.start_timeout = start_timeout
+        self.jobs_done = 0
+        # Процесс убит сторожем тайм-аута; сбрасывается при запуске
+        self.killed = False
+        self._process: Optional[subprocess.Popen] = None
+        self._desktop = None
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self) -> bool:
+        process = self._process
+        return process is not None and process.poll() is None
+
+    def _popen(self, args: List[str]) -> subprocess.Popen:
+        """Запускает процесс офиса с профилем воркера"""
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        process = subprocess.Popen(
+            [
+                self.soffice, '--headless', '--invisible', '--nologo', '--norestore',
+                '--nodefault', '--nolockcheck',
+                f"-env:UserInstallation={self.profile_dir.resolve().as_uri()}",
+                *args
+            ],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        with self._lock:
+            self._process = process
+            self.killed = False
+        return process
+
+    def start(self):
+        """Запускает офис и дожидается подключения по UNO"""
+        import uno  # Python-мост LibreOffice (пакет python3-uno), нужен только для PDF
+
+        process = self._popen([f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"])
+
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.bridge.UnoUrlResolver', local_context
+        )
+        deadline = time.monotonic() + self.start_timeout
+        while True:
+            try:
+                context = resolver.resolve(
+                    f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"
+                )
+                break
+            except Exception:
+                if not self.alive or time.monotonic() > deadline:
+                    self.stop()
+                    raise PdfConversionError(f"Конвертер {self.index} не запустился")
+                time.sleep(0.2)
+
+        self._desktop = context.ServiceManager.createInstanceWithContext(
+            'com.sun.star.frame.Desktop', context
+        )
+        self.jobs_done = 0
+        logging.info(f"Конвертер PDF {self.index} запущен (pid {process.pid})")
+
+    def kill(self):
+        """
+        Убивает процесс офиса; вызывается сторожем тайм-аута из другого потока
+
+        Только сигнал процессу: ссылки на процесс и UNO очищает поток-владелец
+        в stop(), поэтому он не увидит их исчезающими посреди вызова.
+        """
+        with self._lock:
+            process = self._process
+            if process is None or process.poll() is not None:
+                return
+            self.killed = True
+            process.kill()
+
+    def stop(self):
+        """Завершает процесс офиса; профиль остается для быстрого перезапуска"""
+        with self._lock:
+            process, self._process = self._process, None
+            self._desktop = None
+        if process is None:
+            return
+        if process.poll() is None:
+            process.kill()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            logging.error(f"Конвертер PDF {self.index} не завершился")
+
+    def convert(self, source_path: Path, target_path: Path):
+        """Открывает документ скрыто и экспортирует его в PDF"""
+        import uno
+        from com.sun.star.beans import PropertyValue
+
+        def prop(name, value):
+            item = PropertyValue()
+            item.Name, item.Value = name, value
+            return item
+
+        document = self._desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(str(source_path.resolve())), '_blank', 0,
+            (prop('Hidden', True), prop('ReadOnly', True))
+        )
+        if document is None:
+            raise PdfConversionError(f"Не удалось открыть документ: {source_path.name}")
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(str(target_path.resolve())),
+                (prop('FilterName', PDF_EXPORT_FILTER),)
+            )
+        finally:
+            document.close(True)
+        self.jobs_done += 1
+
+    @property
+    def worn_out(self) -> bool:
+        return self.jobs_done >= self.max_jobs
+
+
+class CliConverterWorker(ConverterWorker):
+    """
+    Преобразование отдельным запуском soffice --headless --convert-to pdf
+
+    Используется, когда модуль uno не импортируется (обычный virtualenv без
+    python3-uno). Каждый документ стоит запуска офиса, зато нужен только
+    исполняемый файл LibreOffice. Профиль у каждого воркера свой, поэтому
+    параллельные запуски не мешают друг другу; kill() сторожа прерывает
+    текущий запуск.
+    """
+    @property
+    def alive(self) -> bool:
+        # Постоянного процесса нет: воркер всегда готов к работе
+        return True
+
+    def start(self):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self.jobs_done = 0
+
+    def convert(self, source_path: Path, target_path: Path):
+        """Запускает офис на один документ и переносит результат в target_path"""
+        out_dir = Path(tempfile.mkdtemp(prefix='.pdf_', dir=target_path.parent))
+        try:
+            process = self._popen([
+                '--convert-to', 'pdf', '--outdir', str(out_dir), str(source_path.resolve())
+            ])
+            returncode = process.wait()
+            with self._lock:
+                self._process = None
+            if self.killed:
+                raise PdfConversionError(f"Процесс преобразования {source_path.name} прерван")
+            result = out_dir / f"{source_path.stem}.pdf"
+            if returncode != 0 or not result.exists():
+                raise PdfConversionError(
+                    f"soffice --convert-to завершился с кодом {returncode}: {source_path.name}"
+                )
+            os.replace(result, target_path)
+        finally:
+            shutil.rmtree(out_dir, ignore_errors=True)
+        self.jobs_done += 1
+
+
+class PdfConverterPool:
+    """
+    Пул прогретых конвертеров LibreOffice с очередью запросов
+
+    Свободные воркеры лежат в очереди: запрос берет воркер, ждет не дольше
+    queue_timeout секунд и возвращает его после преобразования. На каждое
+    преобразование отводится job_timeout секунд; зависший процесс
+    убивается, и воркер перезапускается при следующем использовании, как и
+    после max_jobs документов (офис постепенно накапливает память).
+
+    Нужен LibreOffice (PDF_CONVERTER_SOFFICE). С модулем uno воркеры -
+    долгоживущие процессы (ConverterWorker), без него каждый документ
+    преобразуется отдельным запуском soffice (CliConverterWorker).
+    """
+    def __init__(self, workers: int = 2, soffice: str = 'soffice', profile_root=None,
+                 job_timeout: float = 60.0, queue_timeout: float = 120.0, max_jobs: int = 200):
+        self.size = workers
+        self.soffice = soffice
+        self.profile_root = Path(profile_root or Path(tempfile.gettempdir()) / 'logistics_cp_pdf')
+        self.job_timeout = job_timeout
+        self.queue_timeout = queue_timeout
+        self.max_jobs = max_jobs
+        self._workers: List[ConverterWorker] = []
+        self._idle: 'queue.Queue[ConverterWorker]' = queue.Queue()
+        self._lock = threading.Lock()
+        self.conversions = 0
+        self.restarts = 0
+
+    def _ensure_workers(self):
+        with self._lock:
+            if self._workers:
+                return
+            if shutil.which(self.soffice) is None:
+                raise PdfConversionError(f"Не найден исполняемый файл LibreOffice: {self.soffice}")
+            if _uno_available():
+                worker_class = ConverterWorker
+            else:
+                worker_class = CliConverterWorker
+                logging.warning("Модуль uno (python3-uno) недоступен: PDF создается "
+                                "отдельным запуском soffice --convert-to для каждого документа")
+            for index in range(self.size):
+                worker = worker_class(index, self.soffice, self.profile_root, self.max_jobs)
+                self._workers.append(worker)
+                self._idle.put(worker)
+
+    def warm_up(self):
+        """Запускает все процессы заранее, чтобы первые запросы не ждали старта офиса"""
+        self._ensure_workers()
+        for _ in range(self.size):
+            worker = self._idle.get()
+            try:
+                if not worker.alive:
+                    worker.start()
+            except Exception:
+                logging.exception(f"Не удалось прогреть конвертер PDF {worker.index}")
+            finally:
+                self._idle.put(worker)
+
+    def convert(self, source_path, target_path) -> Path:
+        """
+        Преобразует документ в PDF на свободном воркере
+
+        PDF сначала пишется во временный файл рядом с целевым и затем
+        переименовывается, поэтому недописанный файл не отдается клиенту.
+        """
+        source_path, target_path = Path(source_path), Path(target_path)
+        self._ensure_workers()
+        try:
+            worker = self._idle.get(timeout=self.queue_timeout)
+        except queue.Empty:
+            raise PdfConversionError('Все конвертеры PDF заняты, повторите попытку позже')
+
+        temp_path = target_path.with_name(f".{target_path.stem}.{os.getpid()}.{threading.get_ident()}.pdf")
+        # Сторож только убивает зависший процесс: вызов UNO прервется с ошибкой,
+        # а очистку и перезапуск воркера выполняет этот поток
+        watchdog = threading.Timer(self.job_timeout, worker.kill)
+        try:
+            if not worker.alive or worker.worn_out:
+                if worker.jobs_done:
+                    self.restarts += 1
+                worker.stop()
+                worker.start()
+            watchdog.start()
+            worker.convert(source_path, temp_path)
+            watchdog.cancel()
+            os.replace(temp_path, target_path)
+            self.conversions += 1
+            return target_path
+        except Exception as e:
+            watchdog.cancel()
+            timed_out = worker.killed
+            worker.stop()
+            if timed_out:
+                raise PdfConversionError(
+                    f"Преобразование {source_path.name} превысило {self.job_timeout} с"
+                ) from e
+            if isinstance(e, PdfConversionError):
+                raise
+            raise PdfConversionError(f"Ошибка преобразования {source_path.name}: {e}") from e
+        finally:
+            watchdog.cancel()
+            temp_path.unlink(missing_ok=True)
+            self._idle.put(worker)
+
+    def shutdown(self):
+        with self._lock:
+            for worker in self._workers:
+                worker.stop()
+                shutil.rmtree(worker.profile_dir, ignore_errors=True)
+            self._workers = []
+            self._idle = queue.Queue()
+
+
+# Глобальный пул конвертеров; настраивается в init_pdf_converter
+pdf_converter = PdfConverterPool()
+
+
+def init_pdf_converter(app):
+    """
+    Настраивает пул по PDF_* из конфигурации
+
+    При PDF_OUTPUT_ENABLED процессы офиса запускаются в фоне сразу, а не
+    при первом документе.
+    """
+    pdf_converter.shutdown()
+    pdf_converter.size = app.config['PDF_CONVERTER_WORKERS']
+    pdf_converter.soffice = app.config['PDF_CONVERTER_SOFFICE']
+    pdf_converter.profile_root = Path(app.config['PDF_CONVERTER_PROFILE_DIR'])
+    pdf_converter.job_timeout = app.config['PDF_CONVERTER_TIMEOUT']
+    pdf_converter.queue_timeout = app.config['PDF_CONVERTER_QUEUE_TIMEOUT']
+    pdf_converter.max_jobs = app.config['PDF_CONVERTER_MAX_JOBS']
+    if app.config['PDF_OUTPUT_ENABLED']:
+        threading.Thread(target=_warm_up, name='pdf-warm-up', daemon=True).start()
+    return pdf_converter
+
+
+def _warm_up():
+    try:
+        pdf_converter.warm_up()
+    except PdfConversionError as e:
+        logging.error(f"Конвертер PDF недоступен: {e}")
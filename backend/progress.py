@@ -0,0 +1,233 @@
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, Optional
+
+# Статусы, после которых поток событий закрывается
+FINAL_STATUSES = {'completed', 'failed', 'error', 'cancelled'}
+
+
+class MemoryProgressBroker:
+    """
+    Хранилище прогресса в памяти процесса
+
+    Подходит для одного процесса: подписчики ждут обновлений на
+    threading.Condition без опроса.
+    """
+    def __init__(self, ttl: int = 3600):
+        self.ttl = ttl
+        self._events: Dict[str, Dict[str, Any]] = {}
+        self._condition = threading.Condition()
+        self._next_eviction = 0.0
+
+    def publish(self, channel_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
+        with self._condition:
+            previous = self._events.get(channel_id)
+            event = dict(event, version=(previous['version'] + 1) if previous else 1,
+                         timestamp=time.time())
+            self._events[channel_id] = event
+            self._evict_expired()
+            self._condition.notify_all()
+        return event
+
+    def latest(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        with self._condition:
+            return self._events.get(channel_id)
+
+    def wait(self, channel_id: str, after_version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        """Ждет события новее after_version не дольше timeout секунд"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                event = self._events.get(channel_id)
+                if event and event['version'] > after_version:
+                    return event
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def _evict_expired(self):
+        # Чистим не чаще раза в минуту, чтобы publish оставался дешевым
+        now = time.time()
+        if now < self._next_eviction:
+            return
+        self._next_eviction = now + 60
+        expired_before = now - self.ttl
+        for channel_id in [key for key, event in self._events.items()
+                           if event['timestamp'] < expired_before]:
+            del self._events[channel_id]
+
+
+class RedisProgressBroker:
+    """
+    Хранилище прогресса в Redis (или совместимом сервере)
+
+    Последнее событие канала хранится в ключе с TTL, а подписчики
+    получают уведомления через pub/sub, поэтому поток может обслуживать
+    любой воркер.
+    """
+    def __init__(self, url: str, ttl: int = 3600, prefix: str = 'progress:'):
+        import redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def _key(self, channel_id: str) -> str:
+        return f"{self.prefix}{channel_id}"
+
+    def publish(self, channel_id: str, event: Dict[str, Any]) -> Dict[str, Any]:
+        key = self._key(channel_id)
+        pipe = self._redis.pipeline()
+        pipe.incr(f"{key}:version")
+        pipe.expire(f"{key}:version", self.ttl)
+        version = pipe.execute()[0]
+
+        event = dict(event, version=version, timestamp=time.time())
+        payload = json.dumps(event, ensure_ascii=False, default=str)
+        pipe = self._redis.pipeline()
+        pipe.set(key, payload, ex=self.ttl)
+        pipe.publish(f"{key}:events", payload)
+        pipe.execute()
+        return event
+
+    def latest(self, channel_id: str) -> Optional[Dict[str, Any]]:
+        payload = self._redis.get(self._key(channel_id))
+        return json.loads(payload) if payload else None
+
+    def wait(self, channel_id: str, after_version: int, timeout: float) -> Optional[Dict[str, Any]]:
+        key = self._key(channel_id)
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(f"{key}:events")
+            # Событие могло прийти до подписки
+            event = self.latest(channel_id)
+            if event and event['version'] > after_version:
+                return event
+
+            deadline = time.monotonic() + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                message = pubsub.get_message(timeout=remaining)
+                if message and message['type'] == 'message':
+                    event = json.loads(message['data'])
+                    if event['version'] > after_version:
+                        return event
+        finally:
+            pubsub.close()
+
+
+class ProgressReporter:
+    """
+    Публикация прогресса с прореживанием
+
+    Промежуточные обновления одного канала публикуются не чаще, чем раз
+    в min_interval секунд и только при изменении прогресса на min_step
+    процентов; смена стадии или статуса публикуется сразу. Так загрузка
+    10 MB порциями по 8 KB дает десятки событий, а не тысячи.
+    """
+    def __init__(self, broker, min_interval: float = 0.5, min_step: float = 1.0):
+        self.broker = broker
+        self.min_interval = min_interval
+        self.min_step = min_step
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def report(self, channel_id: str, status: str, stage: Optional[str] = None,
+               progress: Optional[float] = None, **extra) -> bool:
+        """
+        Публикует состояние канала, если оно не прорежено
+
+        Returns:
+            bool: True, если событие было опубликовано
+        """
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(channel_id)
+            important = (
+                last is None
+                or status != last['status']
+                or stage != last['stage']
+                or status in FINAL_STATUSES
+            )
+            if not important:
+                too_soon = now - last['at'] < self.min_interval
+                too_small = progress is None or abs(progress - (last['progress'] or 0)) < self.min_step
+                if too_soon or too_small:
+                    return False
+
+            if status in FINAL_STATUSES:
+                self._last.pop(channel_id, None)
+            else:
+                self._last[channel_id] = {
+                    'status': status, 'stage': stage, 'progress': progress, 'at': now
+                }
+
+        event = {'status': status, 'stage': stage, 'progress': progress}
+        event.update(extra)
+        try:
+            self.broker.publish(channel_id, event)
+        except Exception:
+            logging.exception(f"Не удалось опубликовать прогресс канала {channel_id}")
+            return False
+        return True
+
+
+# Глобальный репортер прогресса; бэкенд заменяется в init_progress
+progress_reporter = ProgressReporter(MemoryProgressBroker())
+
+
+def report_progress(channel_id: str, status: str, stage: Optional[str] = None,
+                    progress: Optional[float] = None, **extra) -> bool:
+    """Публикует прогресс в общий канал с прореживанием"""
+    return progress_reporter.report(channel_id, status, stage=stage, progress=progress, **extra)
+
+
+def latest_progress(channel_id: str) -> Optional[Dict[str, Any]]:
+    """Последнее опубликованное событие канала или None"""
+    try:
+        return progress_reporter.broker.latest(channel_id)
+    except Exception:
+        logging.exception(f"Не удалось прочитать прогресс канала {channel_id}")
+        return None
+
+
+def init_progress(app):
+    """Выбирает хранилище прогресса по PROGRESS_BACKEND ('memory' или 'redis')"""
+    ttl = app.config['PROGRESS_TTL']
+    if app.config['PROGRESS_BACKEND'] == 'redis':
+        progress_reporter.broker = RedisProgressBroker(app.config['PROGRESS_REDIS_URL'], ttl=ttl)
+    else:
+        progress_reporter.broker = MemoryProgressBroker(ttl=ttl)
+    progress_reporter.min_interval = app.config['PROGRESS_MIN_INTERVAL']
+    return progress_reporter
+
+
+def iter_progress_events(channel_id: str, last_version: int = 0,
+                         heartbeat: float = 15.0, max_duration: float = 600.0) -> Iterator[str]:
+    """
+    Генерирует поток Server-Sent Events для канала
+
+    Поток закрывается после финального статуса или по истечении max_duration;
+    в паузах отправляются комментарии-heartbeat, чтобы прокси не рвали соединение.
+    """
+    broker = progress_reporter.broker
+    deadline = time.monotonic() + max_duration
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        event = broker.wait(channel_id, last_version, timeout=min(heartbeat, remaining))
+        if event is None:
+            yield ": heartbeat\n\n"
+            continue
+
+        last_version = event['version']
+        payload = json.dumps(event, ensure_ascii=False, default=str)
+        yield f"id: {last_version}\nevent: progress\ndata: {payload}\n\n"
+        if event.get('status') in FINAL_STATUSES:
+            return
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Не реже чем раз в столько секунд оценка размера кэша сверяется с диском
+SIZE_RESCAN_INTERVAL = 300
+
+
+def file_digest(path) -> str:
+    """SHA-256 содержимого файла, читаемого порциями"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(HASH_CHUNK_SIZE), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class FileDigestCache:
+    """
+    Кэш SHA-256 файлов (шаблонов) по пути
+
+    Хэш пересчитывается только при изменении mtime или размера файла.
+    """
+    def __init__(self):
+        self._digests: Dict[str, Tuple[Tuple[float, int], str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path) -> str:
+        path = str(path)
+        stat = os.stat(path)
+        signature = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            cached = self._digests.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = file_digest(path)
+        with self._lock:
+            self._digests[path] = (signature, digest)
+        return digest
+
+
+template_digests = FileDigestCache()
+
+
+def result_cache_key(upload_digest: str, config_digest: str, template_digest: str, engine: str) -> str:
+    """Ключ кэша: содержимое загрузки + конфигурация извлечения + шаблон + движок"""
+    raw = '\n'.join((upload_digest, config_digest, template_digest, engine))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    Адресуемый по содержимому дисковый кэш готовых предложений
+
+    Запись - пара файлов <key>.docx и <key>.json (извлеченные данные) в
+    подпапке по первым двум символам ключа. Запись атомарна (через
+    временный файл и os.replace), поэтому кэш можно разделять между
+    процессами и воркерами на одном диске. Давность использования - это
+    mtime файла .json, он обновляется при попадании (документ может быть
+    жесткой ссылкой на выходной файл, его mtime общий); при превышении
+    max_bytes удаляются самые давно использованные записи.
+
+    Размер кэша процесс оценивает сам: полный обход диска дает точное
+    значение, каждая запись его увеличивает. Обход с вытеснением
+    запускается, только когда оценка превышает max_bytes или устарела
+    (SIZE_RESCAN_INTERVAL), поэтому записи других процессов учитываются
+    не позже следующей сверки.
+
+    Счетчики попаданий и промахов ведутся в памяти процесса.
+    """
+    def __init__(self, root, max_bytes: int = 512 * 1024 * 1024, enabled: bool = True):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # Оценка размера кэша в байтах и время последнего обхода (None - обхода не было)
+        self._size = 0
+        self._scanned_at: Optional[float] = None
+
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        shard = self.root / key[:2]
+        return shard / f"{key}.docx", shard / f"{key}.json"
+
+    def _count(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[Tuple[Path, Dict[str, Any]]]:
+        """
+        Ищет готовый результат
+
+        Returns:
+            Optional[Tuple[Path, Dict[str, Any]]]: Путь к документу в кэше и
+                извлеченные данные или None при промахе
+        """
+        if not self.enabled:
+            return None
+        document_path, data_path = self._paths(key)
+        try:
+            with open(data_path, encoding='utf-8') as f:
+                data = json.load(f)
+            if not document_path.exists():
+                raise FileNotFoundError(document_path)
+            now = time.time()
+            os.utime(data_path, (now, now))
+        except (OSError, ValueError):
+            self._count(hit=False)
+            return None
+        self._count(hit=True)
+        return document_path, data
+
+    def put(self, key: str, document_path, data: Dict[str, Any]) -> bool:
+        """Кладет документ и данные в кэш; ошибки записи не прерывают обработку"""
+        if not self.enabled:
+            return False
+        target_document, target_data = self._paths(key)
+        try:
+            target_document.parent.mkdir(parents=True, exist_ok=True)
+            self._atomic_copy(Path(document_path), target_document)
+            with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=target_data.parent,
+                                             suffix='.tmp', delete=False) as f:
+                json.dump(data, f, ensure_ascii=False, default=str)
+            os.replace(f.name, target_data)
+            added = target_document.stat().st_size + target_data.stat().st_size
+        except OSError:
+            logging.exception(f"Не удалось записать результат в кэш: {key}")
+            return False
+        with self._lock:
+            # Перезапись существующей записи завышает оценку - это лишь ускоряет сверку
+            self._size += added
+            stale = self._scanned_at is None or time.monotonic() - self._scanned_at > SIZE_RESCAN_INTERVAL
+            over = self._size > self.max_bytes
+        if stale or over:
+            self.evict()
+        return True
+
+    @staticmethod
+    def _atomic_copy(source: Path, target: Path):
+        temp_path = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            # Жесткая ссылка не копирует данные; между разделами - обычная копия
+            try:
+                os.link(source, temp_path)
+            except OSError:
+                shutil.copyfile(source, temp_path)
+            os.replace(temp_path, target)
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    def copy_to(self, document_path: Path, output_path) -> None:
+        """Создает выходной файл из документа в кэше"""
+        self._atomic_copy(document_path, Path(output_path))
+
+    def evict(self) -> int:
+        """Обходит кэш и удаляет давно использованные записи, пока он больше max_bytes"""
+        entries = {}
+        total = 0
+        for path in self.root.glob('*/*'):
+            if path.suffix not in ('.docx', '.json'):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            size, used = entries.get(path.stem, (0, 0.0))
+            if path.suffix == '.json':
+                used = stat.st_mtime
+            entries[path.stem] = (size + stat.st_size, used)
+            total += stat.st_size
+
+        removed = 0
+        for key, (size, _) in sorted(entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            for path in self._paths(key):
+                path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+
+        with self._lock:
+            self._size = total
+            self._scanned_at = time.monotonic()
+        if removed:
+            with self._lock:
+                self.evictions += removed
+            logging.info(f"Из кэша результатов удалено записей: {removed}")
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики для мониторинга"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'max_bytes': self.max_bytes
+            }
+
+
+# Глобальный кэш результатов; настраивается в init_result_cache
+result_cache = ResultCache('cache', enabled=False)
+
+
+def init_result_cache(app):
+    """Настраивает кэш результатов по RESULT_CACHE_* из конфигурации"""
+    result_cache.root = Path(app.config['RESULT_CACHE_FOLDER'])
+    result_cache.max_bytes = app.config['RESULT_CACHE_MAX_BYTES']
+    result_cache.enabled = app.config['RESULT_CACHE_ENABLED']
+    # Новая папка - оценку размера нужно сверить с диском заново
+    result_cache._size, result_cache._scanned_at = 0, None
+    if result_cache.enabled:
+        result_cache.root.mkdir(parents=True, exist_ok=True)
+    return result_cache
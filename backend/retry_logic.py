@@ -1,12 +1,21 @@
 import os
+import json
+import re
+import sqlite3
+import tempfile
 import time
-from typing import Dict, Optional, Tuple, Callable
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Type, Callable
 from functools import wraps
 import logging
 from concurrent.futures import ThreadPoolExecutor
 import threading
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, replace
 from datetime import datetime
+from .error_handler import FileError, ValidationError
+from .progress import report_progress
+from .uploads import check_upload_size, get_upload_size
 
 @dataclass
 class UploadStatus:
@@ -21,51 +30,277 @@ class UploadStatus:
     error: Optional[str] = None
     progress: float = 0.0
 
+def _status_to_json(status: UploadStatus) -> str:
+    payload = asdict(status)
+    payload['started_at'] = status.started_at.isoformat()
+    return json.dumps(payload, ensure_ascii=False)
+
+def _status_from_json(payload) -> UploadStatus:
+    data = json.loads(payload)
+    data['started_at'] = datetime.fromisoformat(data['started_at'])
+    return UploadStatus(**data)
+
+class MemoryTrackerBackend:
+    """
+    Хранилище статусов в памяти процесса с TTL и ограничением размера
+
+    Ключи распределены по нескольким сегментам со своими блокировками,
+    чтобы параллельные загрузки не конкурировали за одну блокировку.
+    Внутри сегмента записи упорядочены по времени последнего изменения,
+    поэтому устаревшие и лишние записи вытесняются с начала за O(1).
+    """
+    def __init__(self, ttl: int = 3600, max_size: int = 10000, stripes: int = 16):
+        self.ttl = ttl
+        self._max_per_stripe = max(1, max_size // stripes)
+        self._stripes = [(OrderedDict(), threading.Lock()) for _ in range(stripes)]
+
+    def _stripe(self, upload_id: str):
+        return self._stripes[hash(upload_id) % len(self._stripes)]
+
+    def _store(self, uploads: OrderedDict, status: UploadStatus):
+        now = time.monotonic()
+        uploads[status.id] = (status, now + self.ttl)
+        uploads.move_to_end(status.id)
+        while uploads:
+            _, (_, expires_at) = next(iter(uploads.items()))
+            if len(uploads) <= self._max_per_stripe and expires_at > now:
+                break
+            uploads.popitem(last=False)
+
+    def get(self, upload_id: str) -> Optional[UploadStatus]:
+        uploads, lock = self._stripe(upload_id)
+        with lock:
+            entry = uploads.get(upload_id)
+            if entry is None:
+                return None
+            status, expires_at = entry
+            if expires_at <= time.monotonic():
+                del uploads[upload_id]
+                return None
+            return replace(status)
+
+    def save(self, status: UploadStatus):
+        uploads, lock = self._stripe(status.id)
+        with lock:
+            self._store(uploads, replace(status))
+
+    def update(self, upload_id: str, mutate: Callable[[UploadStatus], None]) -> Optional[UploadStatus]:
+        uploads, lock = self._stripe(upload_id)
+        with lock:
+            entry = uploads.get(upload_id)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            status = entry[0]
+            mutate(status)
+            self._store(uploads, status)
+            return replace(status)
+
+class SqliteTrackerBackend:
+    """
+    Общее для процессов узла хранилище статусов на SQLite (WAL)
+
+    Локальная замена Redis: все воркеры gunicorn читают один файл,
+    поиск по первичному ключу, устаревшие записи удаляются по TTL.
+    """
+    def __init__(self, path: str, ttl: int = 3600, purge_interval: int = 60):
+        self.path = path
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS upload_status ("
+                "id TEXT PRIMARY KEY, payload TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS idx_upload_status_expires ON upload_status (expires_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _write(self, connection: sqlite3.Connection, status: UploadStatus):
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO upload_status (id, payload, expires_at) VALUES (?, ?, ?)",
+            (status.id, _status_to_json(status), now + self.ttl)
+        )
+        if now >= self._next_purge:
+            self._next_purge = now + self.purge_interval
+            connection.execute("DELETE FROM upload_status WHERE expires_at <= ?", (now,))
+
+    def get(self, upload_id: str) -> Optional[UploadStatus]:
+        row = self._connect().execute(
+            "SELECT payload FROM upload_status WHERE id = ? AND expires_at > ?",
+            (upload_id, time.time())
+        ).fetchone()
+        return _status_from_json(row[0]) if row else None
+
+    def save(self, status: UploadStatus):
+        self._write(self._connect(), status)
+
+    def update(self, upload_id: str, mutate: Callable[[UploadStatus], None]) -> Optional[UploadStatus]:
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            status = self.get(upload_id)
+            if status is not None:
+                mutate(status)
+                self._write(connection, status)
+            connection.execute("COMMIT")
+            return status
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+class RedisTrackerBackend:
+    """Общее хранилище статусов в Redis (или совместимом сервере) с TTL на ключах"""
+    def __init__(self, url: str, ttl: int = 3600, prefix: str = 'upload:'):
+        import redis
+
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, upload_id: str) -> Optional[UploadStatus]:
+        payload = self._redis.get(f"{self.prefix}{upload_id}")
+        return _status_from_json(payload) if payload else None
+
+    def save(self, status: UploadStatus):
+        self._redis.set(f"{self.prefix}{status.id}", _status_to_json(status), ex=self.ttl)
+
+    def update(self, upload_id: str, mutate: Callable[[UploadStatus], None]) -> Optional[UploadStatus]:
+        key = f"{self.prefix}{upload_id}"
+        result = []
+
+        def transaction(pipe):
+            payload = pipe.get(key)
+            if not payload:
+                return
+            status = _status_from_json(payload)
+            mutate(status)
+            pipe.multi()
+            pipe.set(key, _status_to_json(status), ex=self.ttl)
+            result.append(status)
+
+        self._redis.transaction(transaction, key)
+        return result[-1] if result else None
+
 class UploadTracker:
-    """Менеджер отслеживания загрузок"""
-    def __init__(self):
-        self._uploads: Dict[str, UploadStatus] = {}
+    """
+    Менеджер отслеживания загрузок
+
+    Хранение делегируется подключаемому бэкенду (память, SQLite, Redis).
+    Промежуточный прогресс сохраняется только при изменении хотя бы
+    на min_progress_step процентов, чтобы общий бэкенд не получал
+    запись на каждый чанк.
+    """
+    def __init__(self, backend=None, min_progress_step: float = 1.0):
+        self.backend = backend or MemoryTrackerBackend()
+        self.min_progress_step = min_progress_step
+        # Последний сохраненный прогресс и размер загрузок этого процесса
+        self._saved_progress: Dict[str, Tuple[float, int]] = {}
         self._lock = threading.Lock()
         
     def create_upload(self, upload_id: str, filename: str, total_size: int) -> UploadStatus:
+        # Повторная попытка начинает загрузку заново, но сохраняет счетчик попыток
+        previous = self.backend.get(upload_id)
         status = UploadStatus(
             id=upload_id,
             filename=filename,
             started_at=datetime.now(),
-            total_size=total_size
+            total_size=total_size,
+            retry_count=previous.retry_count if previous else 0
         )
+        self.backend.save(status)
         with self._lock:
-            self._uploads[upload_id] = status
+            self._saved_progress[upload_id] = (0.0, total_size)
         return status
 
     def update_progress(self, upload_id: str, processed_size: int):
         with self._lock:
-            if upload_id in self._uploads:
-                status = self._uploads[upload_id]
-                status.processed_size = processed_size
-                status.progress = (processed_size / status.total_size) * 100
+            saved = self._saved_progress.get(upload_id)
+        if saved is not None:
+            saved_progress, total_size = saved
+            progress = (processed_size / total_size) * 100 if total_size else 100.0
+            if progress < 100.0 and progress - saved_progress < self.min_progress_step:
+                return
+
+        def mutate(status: UploadStatus):
+            status.processed_size = processed_size
+            status.progress = (processed_size / status.total_size) * 100 if status.total_size else 100.0
+
+        status = self.backend.update(upload_id, mutate)
+        if status is not None:
+            with self._lock:
+                self._saved_progress[upload_id] = (status.progress, status.total_size)
 
     def set_status(self, upload_id: str, status: str, error: Optional[str] = None):
-        with self._lock:
-            if upload_id in self._uploads:
-                self._uploads[upload_id].status = status
-                if error:
-                    self._uploads[upload_id].error = error
+        def mutate(upload: UploadStatus):
+            upload.status = status
+            if error:
+                upload.error = error
+
+        self.backend.update(upload_id, mutate)
+        if status in ('completed', 'failed', 'cancelled'):
+            with self._lock:
+                self._saved_progress.pop(upload_id, None)
 
     def increment_retry(self, upload_id: str):
-        with self._lock:
-            if upload_id in self._uploads:
-                self._uploads[upload_id].retry_count += 1
+        def mutate(status: UploadStatus):
+            status.retry_count += 1
+
+        self.backend.update(upload_id, mutate)
 
     def get_status(self, upload_id: str) -> Optional[UploadStatus]:
-        with self._lock:
-            return self._uploads.get(upload_id)
+        return self.backend.get(upload_id)
 
-# Глобальный трекер загрузок
+# Идентификатор загрузки, который видит клиент: uuid4 в hex
+UPLOAD_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+def upload_channel(user_id: int, upload_id: str) -> Optional[str]:
+    """
+    Канал прогресса и ключ трекера для загрузки пользователя
+
+    В имя входит id пользователя, поэтому по чужому id загрузки ничего не
+    прочитать. Для id другого формата (например, канала proposal-1)
+    возвращается None.
+    """
+    if not UPLOAD_ID_RE.fullmatch(upload_id or ''):
+        return None
+    return f"upload-{user_id}-{upload_id}"
+
+# Глобальный трекер загрузок; бэкенд выбирается в init_upload_tracker
 upload_tracker = UploadTracker()
 
-def with_retry(max_retries: int = 3, delay: float = 1.0):
-    """Декоратор для повторных попыток выполнения функции"""
+def init_upload_tracker(app):
+    """Выбирает бэкенд трекера по UPLOAD_TRACKER_BACKEND ('memory', 'sqlite' или 'redis')"""
+    backend_name = app.config['UPLOAD_TRACKER_BACKEND']
+    ttl = app.config['UPLOAD_TRACKER_TTL']
+    if backend_name == 'sqlite':
+        backend = SqliteTrackerBackend(app.config['UPLOAD_TRACKER_SQLITE_PATH'], ttl=ttl)
+    elif backend_name == 'redis':
+        backend = RedisTrackerBackend(app.config['UPLOAD_TRACKER_REDIS_URL'], ttl=ttl)
+    else:
+        backend = MemoryTrackerBackend(ttl=ttl, max_size=app.config['UPLOAD_TRACKER_MAX_SIZE'])
+    upload_tracker.backend = backend
+    return upload_tracker
+
+def with_retry(max_retries: int = 3, delay: float = 1.0,
+               retry_on: Tuple[Type[Exception], ...] = (Exception,)):
+    """
+    Декоратор для повторных попыток выполнения функции
+
+    Повторяются только исключения из retry_on; остальные сразу помечают
+    загрузку как неудачную и пробрасываются дальше.
+    """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
@@ -75,7 +310,7 @@ def with_retry(max_retries: int = 3, delay: float = 1.0):
             for attempt in range(max_retries):
                 try:
                     return func(*args, **kwargs)
-                except Exception as e:
+                except retry_on as e:
                     last_exception = e
                     logging.error(f"Attempt {attempt + 1} failed: {str(e)}")
                     
@@ -85,7 +320,10 @@ def with_retry(max_retries: int = 3, delay: float = 1.0):
                     
                     if attempt < max_retries - 1:
                         time.sleep(delay * (2 ** attempt))  # Экспоненциальная задержка
-                    
+                except Exception as e:
+                    last_exception = e
+                    break
+
             if upload_id:
                 upload_tracker.set_status(upload_id, 'failed', str(last_exception))
             raise last_exception
@@ -106,11 +344,12 @@ class FileProcessor:
                          process_chunk: Callable) -> bool:
         """Обработка файла по частям с отслеживанием прогресса"""
         try:
-            file_size = os.fstat(file_obj.fileno()).st_size
+            file_size = get_upload_size(file_obj) or 0
             processed_size = 0
             
             upload_tracker.create_upload(upload_id, file_obj.filename, file_size)
             upload_tracker.set_status(upload_id, 'processing')
+            report_progress(upload_id, 'processing', stage='upload', progress=0.0)
 
             while not self._stop_event.is_set():
                 chunk = file_obj.read(self.chunk_size)
@@ -120,26 +359,35 @@ class FileProcessor:
                 process_chunk(chunk)
                 processed_size += len(chunk)
                 upload_tracker.update_progress(upload_id, processed_size)
+                # Публикация прореживается, поэтому вызов на каждый чанк дешев
+                report_progress(upload_id, 'processing', stage='upload',
+                                progress=processed_size / file_size * 100 if file_size else 100.0)
 
             if self._stop_event.is_set():
                 upload_tracker.set_status(upload_id, 'cancelled')
+                report_progress(upload_id, 'cancelled', stage='upload')
                 return False
 
             upload_tracker.set_status(upload_id, 'completed')
+            report_progress(upload_id, 'completed', stage='upload', progress=100.0)
             return True
 
         except Exception as e:
             upload_tracker.set_status(upload_id, 'failed', str(e))
+            report_progress(upload_id, 'failed', stage='upload', error=str(e))
             raise
 
     def cancel_processing(self):
         """Отмена обработки файла"""
         self._stop_event.set()
 
-# Пример использования в utils.py:
-@with_retry(max_retries=3)
+# Повторяются только ошибки ввода-вывода: ошибки валидации от повтора не исчезнут
+@with_retry(max_retries=3, retry_on=(OSError,))
 def process_excel(file, upload_id: str) -> Tuple[bool, str, Dict]:
     """Обработка Excel файла с поддержкой retry и отслеживанием прогресса"""
+    import pandas as pd
+    from .utils import validate_excel_data, validate_excel_structure
+
     try:
         processor = FileProcessor()
         
@@ -147,85 +395,34 @@ def process_excel(file, upload_id: str) -> Tuple[bool, str, Dict]:
         if not file.filename.endswith(('.xlsx', '.xls')):
             raise ValidationError("Неверный формат файла")
 
-        # Проверка размера
-        file_size = len(file.read())
-        if file_size > 10 * 1024 * 1024:
-            raise FileError("Файл слишком большой")
-        file.seek(0)
+        # Проверка размера по позиции в потоке, без чтения файла в память
+        check_upload_size(file)
+
+        # Повторная попытка читает загрузку с начала
+        file.stream.seek(0)
 
-        def process_chunk(chunk):
-            # Здесь может быть дополнительная обработка чанка
-            pass
+        # Один проход по загрузке: прогресс и запись во временный файл на диске
+        with tempfile.NamedTemporaryFile(suffix=Path(file.filename).suffix) as spool:
+            success = processor.process_in_chunks(file, upload_id, spool.write)
+            if not success:
+                raise FileError("Обработка файла была отменена")
+            spool.flush()
 
-        # Обработка файла по частям
-        success = processor.process_in_chunks(file, upload_id, process_chunk)
-        if not success:
-            raise FileError("Обработка файла была отменена")
+            # Чтение и валидация Excel прямо из временного файла
+            df = pd.read_excel(spool.name)
 
-        # Чтение и валидация Excel
-        df = pd.read_excel(file)
-        validate_excel_structure(df)
-        validate_excel_data(df)
+        for validation in (validate_excel_structure(df), validate_excel_data(df)):
+            if not validation['is_valid']:
+                raise ValidationError('\n'.join(validation['errors']))
 
         return True, "Файл успешно обработан", {
             'preview': df.head().to_dict(),
             'summary': {
                 'total_rows': len(df),
-                'total_sum': df['price'].sum() if 'price' in df.columns else 0
+                'total_sum': float(df['price'].sum()) if 'price' in df.columns else 0
             }
         }
 
     except Exception as e:
         logging.exception("Ошибка при обработке файла")
         raise
-
-# В routes.py:
-@app.route('/api/validate-excel', methods=['POST'])
-def validate_excel_endpoint():
-    try:
-        file = request.files['file']
-        upload_id = str(uuid.uuid4())
-        
-        success, message, data = process_excel(file, upload_id)
-        
-        return jsonify({
-            'success': success,
-            'message': message,
-            'data': data,
-            'upload_id': upload_id
-        })
-
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': str(e)
-        }), 400
-
-@app.route('/api/upload-status/<upload_id>')
-def get_upload_status(upload_id):
-    """Endpoint для получения статуса загрузки"""
-    status = upload_tracker.get_status(upload_id)
-    if status:
-        return jsonify({
-            'success': True,
-            'status': {
-                'id': status.id,
-                'filename': status.filename,
-                'status': status.status,
-                'progress': status.progress,
-                'retry_count': status.retry_count,
-                'error': status.error
-            }
-        })
-    return jsonify({
-        'success': False,
-        'error': 'Upload not found'
-    }), 404
-
-@app.route('/api/cancel-upload/<upload_id>', methods=['POST'])
-def cancel_upload(upload_id):
-    """Endpoint для отмены загрузки"""
-    processor = FileProcessor()
-    processor.cancel_processing()
-    upload_tracker.set_status(upload_id, 'cancelled')
-    return jsonify({'success': True})
\ No newline at end of file
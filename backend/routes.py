@@ -1,22 +1,86 @@
-from flask import Blueprint, request, jsonify, current_app, send_from_directory
+from flask import (
+    Blueprint, Response, request, jsonify, current_app, redirect, send_file,
+    send_from_directory, stream_with_context
+)
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, undefer_group
 from werkzeug.utils import secure_filename
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 from datetime import datetime
+import base64
+import binascii
+import hashlib
+import json
+import mimetypes
+import shutil
+import tempfile
 import time
-import os
-from .models import db, User, ProposalHistory
-from .utils import load_config, process_excel, generate_word
+import uuid
+import zipfile
+from .models import db, User, ProposalHistory, ProposalPayload, STORAGE_COMPRESSED, json_compatible
+from .excel_reader import get_extraction_plan, iter_client_rows
+from .batch import BatchItem, collect_workbooks, run_batch, write_archive
+from .word_templates import ENGINE_DOCX
+from .jobs import get_job_queue, proposal_channel, regenerate_output
+from .object_storage import object_storage
+from .output_storage import output_storage
+from .progress import iter_progress_events, latest_progress, report_progress
+from .uploads import make_work_dir, spool_upload, work_dir
+from .result_cache import result_cache, result_cache_key, template_digests
+from .retry_logic import process_excel, upload_channel, upload_tracker
+from .tracing import render_metrics, start_trace
+from .error_handler import FileError, ValidationError
+from .utils import generate_pdf
 from .middleware.auth import token_required
-from .utils import process_excel, ExcelValidationError
+from .passwords import PasswordHasherBusy, password_hasher
 
 # Создаем Blueprint для маршрутов
 bp = Blueprint('routes', __name__)
 
-@bp.route("/api/create-proposal", methods=["POST"])
-@token_required
+# Максимальный размер страницы списка предложений
+MAX_PAGE_SIZE = 100
+
+# Режимы отдачи файлов через фронтовой прокси
+OFFLOAD_X_ACCEL = 'x-accel'
+OFFLOAD_X_SENDFILE = 'x-sendfile'
+# Перенаправление на подписанную ссылку хранилища S3
+OFFLOAD_PRESIGNED = 'presigned'
+
+DOCX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+PDF_MIME_TYPE = 'application/pdf'
+
+@bp.route('/login', methods=['POST'])
+def login():
+    """
+    Вход по логину и паролю; возвращает JWT
+
+    Хэш проверяется в ограниченном пуле (passwords.password_hasher). Если
+    политика хэширования изменилась, новый хэш сохраняется тем же commit,
+    что и время входа.
+    """
+    payload = request.get_json(silent=True) or {}
+    username = payload.get('username')
+    password = payload.get('password')
+    if not username or not password:
+        return jsonify({'error': 'Укажите логин и пароль'}), 400
+
+    try:
+        user = User.query.filter_by(username=username).first()
+        if user is None or not user.is_active:
+            password_hasher.verify_dummy(password)
+            return jsonify({'error': 'Неправильный логин или пароль'}), 401
+        if not user.check_password(password):
+            return jsonify({'error': 'Неправильный логин или пароль'}), 401
+    except PasswordHasherBusy as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
 
+    user.last_login = datetime.utcnow()
+    db.session.commit()
+    return jsonify({'success': True, 'token': user.generate_token(), 'user': user.to_dict()})
 
 # Endpoint для создания коммерческого предложения из загруженного Excel-файла
+@bp.route("/api/create-proposal", methods=["POST"])
+@token_required
 def create_proposal(current_user):
     try:
         # Проверяем, что файл был отправлен
@@ -27,9 +91,6 @@ def create_proposal(current_user):
         if file.filename == '':
             return jsonify({"error": "Файл не выбран"}), 400
 
-        # Начало отсчета времени обработки
-        start_time = time.time()
-            
         # Создаем безопасное имя файла
         filename = secure_filename(file.filename)
             
@@ -37,125 +98,678 @@ def create_proposal(current_user):
         for folder in ['UPLOAD_FOLDER', 'TEMPLATE_FOLDER', 'OUTPUT_FOLDER']:
             Path(current_app.config[folder]).mkdir(exist_ok=True)
             
-        # Пути к файлам
-        excel_path = Path(current_app.config['UPLOAD_FOLDER']) / filename
+        # Загрузка живет в хранилище загрузок до завершения задания под
+        # уникальным ключом: одинаковые имена файлов у разных пользователей
+        # не перезаписывают друг друга
+        upload_key = f"{uuid.uuid4().hex}_{filename}"
         template_path = Path(current_app.config['TEMPLATE_FOLDER']) / "template.docx"
-        
-        # Создаем запись в истории
-        proposal = ProposalHistory(
-            user_id=current_user.id,
-            filename=filename,
-            original_filename=file.filename
-        )
-        
-        try:
-            # Сохраняем файл и обновляем информацию
-            file.save(excel_path)
-            proposal.file_size = excel_path.stat().st_size
-            proposal.mime_type = file.content_type
-            proposal.update_status(ProposalHistory.STATUS_PROCESSING)
-            
-            # Загружаем конфигурацию и обрабатываем файл
-            config = load_config('config.json')
-            success, error_msg, data = process_excel(str(excel_path), config)
-            
-            if not data:
-                proposal.update_status(ProposalHistory.STATUS_ERROR)
-                return jsonify({'error': 'Ошибка при обработке Excel файла'}), 400
-                
-            proposal.data = data
-
-            if not success:
-             # Обрабатываем ошибку валидации
-            if isinstance(error_msg, ExcelValidationError):
-                return jsonify({'error': error_msg.details}), 400
-            else:
-                return jsonify({'error': error_msg}), 400 # Или 500, если это внутренняя ошибка
-            
-            # Генерируем уникальное имя для выходного файла
-            output_filename = f"proposal_{proposal.id}_{int(time.time())}.docx"
-            output_path = Path(current_app.config['OUTPUT_FOLDER']) / output_filename
-            
-            # Генерируем документ
-            if not generate_word(data, str(template_path), str(output_path)):
-                proposal.update_status(ProposalHistory.STATUS_ERROR)
-                return jsonify({'error': 'Ошибка при создании документа'}), 500
-                
-            # Обновляем информацию о предложении
-            proposal.file_path = output_filename
-            proposal.processing_time = time.time() - start_time
-            proposal.update_status(ProposalHistory.STATUS_COMPLETED)
-            
-            return jsonify({
-                'success': True,
-                'proposal': proposal.to_dict(),
-                'file_url': f'/api/download/{output_filename}'
-            })
-            
-        except Exception as e:
-            proposal.update_status(ProposalHistory.STATUS_ERROR)
-            raise e
-            
-        finally:
-            # Удаляем временный Excel файл
-            if excel_path.exists():
-                excel_path.unlink()
+        engine = current_app.config['TEMPLATE_ENGINES'].get(template_path.name, ENGINE_DOCX)
+
+        # Рабочая папка запроса удаляется целиком при выходе: уборка не
+        # задевает файлы параллельных запросов
+        with work_dir(current_app.config['WORK_FOLDER']) as request_dir, \
+                start_trace('request', template=template_path.name) as trace:
+            excel_path = request_dir / (filename or 'estimate.xlsx')
+            proposal = None
+            try:
+                # Один проход потока на диск с контролем размера, без копии в памяти;
+                # SHA-256 загрузки считается по тем же порциям
+                upload_hash = hashlib.sha256()
+                with trace.stage('upload'):
+                    file_size = spool_upload(file, excel_path, hasher=upload_hash)
+
+                # Создаем запись в истории со статусом created - задание в очереди
+                proposal = ProposalHistory(
+                    user_id=current_user.id,
+                    filename=filename,
+                    original_filename=file.filename
+                )
+                proposal.file_size = file_size
+                proposal.mime_type = file.content_type
+
+                # Тот же файл с той же конфигурацией и шаблоном уже обрабатывался
+                with trace.stage('cache_lookup'):
+                    cache_key = result_cache_key(
+                        upload_hash.hexdigest(),
+                        get_extraction_plan(current_app.config['EXTRACTION_CONFIG']).digest,
+                        template_digests.get(template_path),
+                        engine
+                    )
+                    cached = result_cache.get(cache_key)
+                if cached:
+                    response = _complete_from_cache(proposal, *cached, request_dir, trace=trace)
+                    if response is not None:
+                        return response
+
+                # Задание может выполняться на другом узле: переносим книгу в хранилище;
+                # для local это атомарное переименование
+                with trace.stage('store_upload'):
+                    object_storage.uploads.store_file(upload_key, excel_path)
+
+                # Разбивка по стадиям запроса; задание дополнит ее своими стадиями
+                proposal.stage_timings = trace.snapshot()
+                with trace.stage('db_commit'):
+                    db.session.add(proposal)
+                    db.session.flush()
+                    # Запоминаем поля до commit: после него объект истекает и
+                    # каждое обращение к атрибуту стало бы отдельным SELECT
+                    job_id, job_status = proposal.id, proposal.status
+                    db.session.commit()
+
+                # Excel и Word обрабатываются в очереди заданий, запрос не ждет
+                report_progress(proposal_channel(job_id), job_status, stage='queued')
+                with trace.stage('enqueue'):
+                    get_job_queue().enqueue(job_id, upload_key, str(template_path), engine, cache_key)
+
+            except FileError as e:
+                return jsonify({'error': e.message, 'details': e.details}), e.status_code
+
+            except Exception:
+                db.session.rollback()
+                object_storage.uploads.delete(upload_key)
+                # После отката в БД есть только запись, сохраненная commit до
+                # ошибки (например, упала постановка в очередь); несохраненную
+                # update_status вставил бы заново
+                if proposal is not None and inspect(proposal).persistent:
+                    try:
+                        proposal.update_status(ProposalHistory.STATUS_ERROR)
+                    except Exception:
+                        current_app.logger.exception(f"Не удалось отметить ошибку задания {proposal.id}")
+                raise
+
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'status': job_status,
+            'status_url': f'/api/proposals/{job_id}/status',
+            'events_url': f'/api/proposals/{job_id}/events'
+        }), 202
                 
     except Exception as e:
         current_app.logger.exception("Ошибка при создании коммерческого предложения")
         return jsonify({'error': str(e)}), 500
 
-@bp.route('/api/download/<filename>')
+def _complete_from_cache(proposal, document_path, data, request_dir, trace):
+    """
+    Завершает предложение готовым результатом из кэша без повторной обработки
+
+    Returns:
+        Ответ API или None, если запись успели вытеснить из кэша
+    """
+    start_time = time.time()
+    # Копируем до записи в БД в рабочую папку запроса: пропавшая запись
+    # кэша - это обычный промах
+    temp_path = request_dir / 'cached.docx'
+    try:
+        result_cache.copy_to(document_path, temp_path)
+    except OSError:
+        current_app.logger.warning(f"Запись кэша пропала до копирования: {document_path}")
+        return None
+
+    uncommitted_output = None
+    try:
+        proposal.set_payload(data)
+        proposal.status = ProposalHistory.STATUS_COMPLETED
+        db.session.add(proposal)
+        db.session.flush()
+
+        output_filename = output_storage.relative_path(output_storage.new_name(f"proposal_{proposal.id}"))
+        proposal.output_size = temp_path.stat().st_size
+        output_storage.store(output_filename, temp_path)
+        uncommitted_output = output_filename
+        proposal.file_path = output_filename
+        proposal.processing_time = time.time() - start_time
+        proposal.stage_timings = trace.snapshot()
+        with trace.stage('db_commit'):
+            db.session.commit()
+        uncommitted_output = None
+    except Exception:
+        db.session.rollback()
+        if uncommitted_output:
+            # Без commit документ никому не принадлежит
+            output_storage.remove(uncommitted_output)
+        raise
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+    file_url = f'/api/download/{output_filename}'
+    report_progress(proposal_channel(proposal.id), proposal.status, progress=100.0,
+                    file_url=file_url, cached=True)
+    return jsonify({
+        'success': True,
+        'job_id': proposal.id,
+        'status': proposal.status,
+        'cached': True,
+        'file_url': file_url,
+        'status_url': f'/api/proposals/{proposal.id}/status',
+        'events_url': f'/api/proposals/{proposal.id}/events'
+    }), 200
+
+@bp.route('/api/proposals/<int:proposal_id>/status')
+@token_required
+def get_proposal_status(current_user, proposal_id):
+    """
+    Статус задания на создание коммерческого предложения
+    """
+    proposal = ProposalHistory.query.get(proposal_id)
+    if not proposal:
+        return jsonify({'error': 'Задание не найдено'}), 404
+
+    if proposal.user_id != current_user.id and current_user.role != 'admin':
+        return jsonify({'error': 'Нет доступа к заданию'}), 403
+
+    response = {
+        'success': True,
+        'job_id': proposal.id,
+        'status': proposal.status,
+        'proposal': proposal.to_dict()
+    }
+    if proposal.status == ProposalHistory.STATUS_CREATED:
+        # Промежуточные стадии задания пишутся не в БД, а в хранилище прогресса
+        event = latest_progress(proposal_channel(proposal.id))
+        if event and event.get('status') == ProposalHistory.STATUS_PROCESSING:
+            response.update(status=event['status'], stage=event.get('stage'),
+                            progress=event.get('progress'))
+    if proposal.is_completed:
+        response['file_url'] = f'/api/download/{proposal.file_path}'
+        response['pdf_url'] = f'/api/proposals/{proposal.id}/download?format=pdf'
+    return jsonify(response)
+
+@bp.route('/api/proposals/<int:proposal_id>')
+@token_required
+def get_proposal(current_user, proposal_id):
+    """
+    Детальный просмотр предложения вместе с извлеченными данными
+
+    Только здесь загружаются отложенная колонка data и сжатые данные.
+    """
+    proposal = ProposalHistory.query\
+        .options(undefer_group('payload'), joinedload(ProposalHistory.payload_row))\
+        .get(proposal_id)
+    if not proposal:
+        return jsonify({'error': 'Предложение не найдено'}), 404
+
+    if proposal.user_id != current_user.id and current_user.role != 'admin':
+        return jsonify({'error': 'Нет доступа к предложению'}), 403
+
+    result = proposal.to_dict()
+    result['data'] = proposal.get_payload()
+    return jsonify({'success': True, 'proposal': result})
+
+def _event_stream(channel_id: str):
+    """Ответ text/event-stream с продолжением по заголовку Last-Event-ID"""
+    last_version = request.headers.get('Last-Event-ID', 0, type=int)
+    response = Response(
+        stream_with_context(iter_progress_events(
+            channel_id,
+            last_version=last_version,
+            max_duration=current_app.config['PROGRESS_STREAM_TIMEOUT']
+        )),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # nginx не должен буферизовать поток
+    return response
+
+@bp.route('/api/proposals/<int:proposal_id>/events')
+@token_required
+def stream_proposal_events(current_user, proposal_id):
+    """
+    Поток Server-Sent Events со стадиями задания на создание предложения
+    """
+    proposal = ProposalHistory.query.get(proposal_id)
+    if not proposal:
+        return jsonify({'error': 'Задание не найдено'}), 404
+
+    if proposal.user_id != current_user.id and current_user.role != 'admin':
+        return jsonify({'error': 'Нет доступа к заданию'}), 403
+
+    return _event_stream(proposal_channel(proposal_id))
+
+@bp.route('/api/upload-status/<upload_id>/stream')
+@token_required
+def stream_upload_status(current_user, upload_id):
+    """
+    Поток Server-Sent Events с прогрессом загрузки вместо опроса /api/upload-status
+
+    Канал строится из id пользователя, поэтому доступны только свои загрузки.
+    """
+    channel_id = upload_channel(current_user.id, upload_id)
+    if channel_id is None:
+        return jsonify({'error': 'Загрузка не найдена'}), 404
+    return _event_stream(channel_id)
+
+@bp.route('/api/validate-excel', methods=['POST'])
+@token_required
+def validate_excel_upload(current_user):
+    """
+    Проверка сметы с отслеживанием загрузки
+
+    Клиент может передать свой upload_id (uuid4 в hex) в поле формы, чтобы
+    заранее подписаться на /api/upload-status/<upload_id>/stream; иначе id
+    создается здесь и возвращается в ответе.
+    """
+    file = request.files.get('file')
+    upload_id = request.form.get('upload_id') or uuid.uuid4().hex
+    channel_id = upload_channel(current_user.id, upload_id)
+    try:
+        if file is None or file.filename == '':
+            raise ValidationError("Файл не был загружен")
+        if channel_id is None:
+            raise ValidationError("Неверный идентификатор загрузки", details={'upload_id': upload_id})
+        success, message, data = process_excel(file, upload_id=channel_id)
+    except (ValidationError, FileError) as e:
+        # Ошибка в формате обработчика ApiError: его разбирает UploadForm
+        return jsonify({
+            'success': False,
+            'error': {'type': e.error_type.value, 'message': e.message, 'details': e.details},
+            'upload_id': upload_id
+        }), e.status_code
+
+    return jsonify({
+        'success': success,
+        'message': message,
+        'data': data,
+        'upload_id': upload_id
+    })
+
+@bp.route('/api/upload-status/<upload_id>')
+@token_required
+def get_upload_status(current_user, upload_id):
+    """Статус загрузки из трекера (для клиентов без Server-Sent Events)"""
+    channel_id = upload_channel(current_user.id, upload_id)
+    status = upload_tracker.get_status(channel_id) if channel_id else None
+    if status is None:
+        return jsonify({'success': False, 'error': 'Загрузка не найдена'}), 404
+
+    return jsonify({
+        'success': True,
+        'status': {
+            'id': upload_id,
+            'filename': status.filename,
+            'status': status.status,
+            'progress': status.progress,
+            'retry_count': status.retry_count,
+            'error': status.error
+        }
+    })
+
+@bp.route('/api/download/<path:filename>')
 @token_required
 def download_file(current_user, filename):
     """
     Endpoint для скачивания созданного файла
     """
     try:
-        # Проверяем права доступа к файлу
+        # Проверяем права доступа к файлу; поиск идет по индексу idx_proposal_file_path
         proposal = ProposalHistory.query.filter_by(file_path=filename).first()
         if not proposal:
             return jsonify({'error': 'Файл не найден'}), 404
-            
+
         if proposal.user_id != current_user.id and current_user.role != 'admin':
             return jsonify({'error': 'Нет доступа к файлу'}), 403
-            
-        return send_from_directory(
-            current_app.config['OUTPUT_FOLDER'],
-            filename,
-            as_attachment=True
-        )
-        
+
+        return _serve_output(proposal)
+
     except Exception as e:
         current_app.logger.exception("Ошибка при скачивании файла")
         return jsonify({'error': 'Файл не найден'}), 404
 
+@bp.route('/api/proposals/<int:proposal_id>/download')
+@token_required
+def download_proposal(current_user, proposal_id):
+    """
+    Скачивание документа по id предложения (поиск по первичному ключу)
+
+    С параметром format=pdf отдается PDF-версия; если она еще не создана
+    (выключен PDF_OUTPUT_ENABLED или документ взят из кэша результатов),
+    она создается пулом конвертеров при первом скачивании.
+    """
+    proposal = ProposalHistory.query.get(proposal_id)
+    if not proposal or not proposal.file_path:
+        return jsonify({'error': 'Файл не найден'}), 404
+
+    if proposal.user_id != current_user.id and current_user.role != 'admin':
+        return jsonify({'error': 'Нет доступа к файлу'}), 403
+
+    return _serve_output(proposal, as_pdf=request.args.get('format') == 'pdf')
+
+def _serve_output(proposal, as_pdf=False):
+    """
+    Отдает готовый документ после проверки прав
+
+    ETag строится из id предложения и версии объекта в хранилище, на
+    совпадающий If-None-Match отвечаем 304. Байты отдает:
+        - DOWNLOAD_OFFLOAD=presigned: S3 по подписанной ссылке (302);
+        - x-accel или x-sendfile: фронтовой прокси (nginx / Apache,
+          lighttpd), только для локального хранилища - он же обрабатывает Range;
+        - иначе приложение: локальный файл через send_from_directory, объект
+          S3 - потоком порциями; Range и условные запросы поддерживаются.
+    """
+    key = proposal.file_path
+    # proposal.mime_type - тип загруженной сметы, а отдается документ Word
+    mime_type = DOCX_MIME_TYPE
+    stored = output_storage.stat(key)
+    if stored is None:
+        # Документ удален по сроку хранения: создаем заново из сохраненных данных
+        if not regenerate_output(proposal):
+            if proposal.file_expired_at is not None:
+                return jsonify({'error': 'Срок хранения файла истек'}), 410
+            return jsonify({'error': 'Файл не найден'}), 404
+        stored = output_storage.stat(key)
+
+    if as_pdf:
+        key = output_storage.pdf_path(key)
+        mime_type = PDF_MIME_TYPE
+        stored = output_storage.stat(key)
+        if stored is None:
+            if not _render_pdf(proposal.file_path):
+                return jsonify({'error': 'Не удалось создать PDF, повторите попытку позже'}), 503
+            stored = output_storage.stat(key)
+
+    if stored is None:
+        return jsonify({'error': 'Файл не найден'}), 404
+
+    etag = hashlib.sha1(f"{proposal.id}:{stored.etag}".encode('utf-8')).hexdigest()
+    if etag in request.if_none_match:
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+
+    backend = output_storage.backend
+    download_name = PurePosixPath(key).name
+    offload = current_app.config['DOWNLOAD_OFFLOAD']
+    if offload == OFFLOAD_PRESIGNED:
+        url = backend.presigned_url(key, download_name, mime_type)
+        if url:
+            response = redirect(url)
+            # Ссылка подписана на время: кэшировать перенаправление нельзя
+            response.headers['Cache-Control'] = 'no-store'
+            return response
+
+    if not backend.local:
+        return _stream_object(backend, stored, download_name, mime_type, etag)
+
+    if offload in (OFFLOAD_X_ACCEL, OFFLOAD_X_SENDFILE):
+        response = Response(mimetype=mime_type)
+        if offload == OFFLOAD_X_ACCEL:
+            response.headers['X-Accel-Redirect'] = (
+                current_app.config['DOWNLOAD_ACCEL_PREFIX'].rstrip('/') + '/' + key
+            )
+        else:
+            response.headers['X-Sendfile'] = str(backend.path(key))
+        response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        response.set_etag(etag)
+        return response
+
+    # conditional=True: werkzeug сам отвечает 206 на Range и проверяет If-Range по ETag
+    response = send_from_directory(
+        backend.root,
+        key,
+        as_attachment=True,
+        download_name=download_name,
+        mimetype=mime_type,
+        conditional=True,
+        etag=etag
+    )
+    return response
+
+def _render_pdf(docx_key: str) -> bool:
+    """Создает PDF-версию документа из хранилища и сохраняет ее рядом с ним"""
+    pdf_key = output_storage.pdf_path(docx_key)
+    with work_dir(current_app.config['WORK_FOLDER'], 'pdf') as directory:
+        pdf_path = directory / PurePosixPath(pdf_key).name
+        with output_storage.backend.local_copy(docx_key, directory) as docx_path:
+            if not generate_pdf(str(docx_path), str(pdf_path)):
+                return False
+        output_storage.store(pdf_key, pdf_path)
+        return True
+
+def _stream_object(backend, stored, download_name, mime_type, etag):
+    """
+    Отдает объект удаленного хранилища потоком без чтения в память
+
+    Поддерживается один диапазон Range (докачка); If-Range с датой не
+    сравнивается, и в этом случае отдается весь файл.
+    """
+    start, end, status = 0, stored.size, 200
+    if (request.range is not None and request.if_range.date is None
+            and request.if_range.etag in (None, etag)):
+        span = request.range.range_for_length(stored.size)
+        if span is None:
+            response = Response(status=416)
+            response.headers['Content-Range'] = f'bytes */{stored.size}'
+            return response
+        (start, end), status = span, 206
+
+    response = Response(backend.iter_chunks(stored.key, start, end), status=status,
+                        mimetype=mime_type, direct_passthrough=True)
+    response.headers['Content-Length'] = str(end - start)
+    response.headers['Accept-Ranges'] = 'bytes'
+    if status == 206:
+        response.headers['Content-Range'] = f'bytes {start}-{end - 1}/{stored.size}'
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    response.set_etag(etag)
+    return response
+
 @bp.route('/api/proposals')
 @token_required
 def get_proposals(current_user):
     """
     Получение списка предложений пользователя
+
+    Постраничный вывод по курсору: next_cursor из ответа передается в
+    параметре cursor для следующей страницы. Общее число записей
+    считается только при include_total=true.
     """
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
-        proposals = ProposalHistory.query\
-            .filter_by(user_id=current_user.id)\
-            .order_by(ProposalHistory.created_at.desc())\
-            .paginate(page=page, per_page=per_page)
-        
-        return jsonify({
-            'items': [p.to_dict() for p in proposals.items],
-            'total': proposals.total,
-            'pages': proposals.pages,
-            'current_page': page
-        })
-        
+        per_page = min(max(request.args.get('per_page', 10, type=int), 1), MAX_PAGE_SIZE)
+        cursor = request.args.get('cursor')
+        try:
+            after = _decode_cursor(cursor) if cursor else None
+        except ValueError:
+            return jsonify({'error': 'Некорректный курсор'}), 400
+
+        proposals, has_more = ProposalHistory.keyset_page(current_user.id, after, per_page)
+
+        response = {
+            'items': [p.to_dict(username=current_user.username) for p in proposals],
+            'next_cursor': _encode_cursor(proposals[-1]) if has_more else None,
+            'has_more': has_more,
+            'per_page': per_page
+        }
+        if request.args.get('include_total', 'false').lower() in ('1', 'true', 'yes'):
+            response['total'] = ProposalHistory.query.filter_by(user_id=current_user.id).count()
+        return jsonify(response)
+
     except Exception as e:
         current_app.logger.exception("Ошибка при получении списка предложений")
         return jsonify({'error': str(e)}), 500
 
+def _encode_cursor(proposal) -> str:
+    """Непрозрачный курсор из ключа (created_at, id) последней записи страницы"""
+    raw = json.dumps([proposal.created_at.isoformat(), proposal.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def _decode_cursor(cursor: str):
+    """Ключ (created_at, id) из курсора; ValueError для некорректного значения"""
+    try:
+        created_at, proposal_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(proposal_id)
+    except (TypeError, ValueError, UnicodeError, binascii.Error) as e:
+        raise ValueError(str(e))
+
+@bp.route('/api/proposals/batch', methods=['POST'])
+@token_required
+def create_proposals_batch(current_user):
+    """
+    Пакетное создание коммерческих предложений
+
+    Принимает несколько Excel-файлов (или zip-архив с ними) в поле files,
+    либо одну книгу с режимом mode=rows, где каждая строка - отдельный
+    клиент. Обработка распределяется по пулу процессов. По умолчанию
+    возвращает zip-архив с документами, при format=links - ссылки.
+
+    Пакет обрабатывается внутри запроса, поэтому число элементов ограничено
+    BATCH_MAX_ITEMS; большие наборы отправляются несколькими пакетами.
+    """
+    uploads = request.files.getlist('files') or request.files.getlist('file')
+    if not uploads:
+        return jsonify({"error": "Файлы не были загружены"}), 400
+
+    mode = request.form.get('mode', 'files')
+    response_format = request.args.get('format', 'zip')
+    max_items = current_app.config['BATCH_MAX_ITEMS']
+
+    batch_id = uuid.uuid4().hex
+    template_path = Path(current_app.config['TEMPLATE_FOLDER']) / "template.docx"
+    engine = current_app.config['TEMPLATE_ENGINES'].get(template_path.name, ENGINE_DOCX)
+    batch_dir = make_work_dir(current_app.config['WORK_FOLDER'], f"batch_{batch_id}")
+
+    try:
+        items = []
+        # Размер и тип исходной книги каждого элемента - для file_size и mime_type истории
+        sources = {}
+        if mode == 'rows':
+            # Одна книга, одна строка на клиента
+            workbook_path, original_name = collect_workbooks(uploads[:1], batch_dir, 1)[0]
+            source = (workbook_path.stat().st_size, mimetypes.guess_type(original_name)[0])
+            rows = iter_client_rows(str(workbook_path), request.form.get('sheet'))
+            for index, row in enumerate(rows):
+                if index >= max_items:
+                    return jsonify({"error": f"Слишком много строк в пакете, максимум {max_items}"}), 400
+                items.append(BatchItem(
+                    index=index,
+                    name=str(row.get('client') or f"{original_name}#{index + 1}"),
+                    output_path=str(batch_dir / f"proposal_{batch_id}_{index:05d}.docx"),
+                    template_path=str(template_path),
+                    engine=engine,
+                    data=row
+                ))
+                sources[index] = source
+        else:
+            plan = get_extraction_plan(current_app.config['EXTRACTION_CONFIG'])
+            workbooks = collect_workbooks(uploads, batch_dir, max_items)
+            for index, (workbook_path, original_name) in enumerate(workbooks):
+                items.append(BatchItem(
+                    index=index,
+                    name=original_name,
+                    output_path=str(batch_dir / f"proposal_{batch_id}_{index:05d}.docx"),
+                    template_path=str(template_path),
+                    engine=engine,
+                    excel_path=str(workbook_path),
+                    plan=plan
+                ))
+                sources[index] = (workbook_path.stat().st_size, mimetypes.guess_type(original_name)[0])
+
+        if not items:
+            return jsonify({"error": "В пакете нет данных для обработки"}), 400
+
+        results = run_batch(items)
+
+        # Архив собирается до переноса документов из папки пакета в хранилище
+        archive, archived = None, 0
+        if response_format != 'links':
+            archive = tempfile.TemporaryFile()
+            archived = write_archive(results, archive)
+
+        stored = {}
+        for result in results:
+            if result.output_path:
+                output_path = Path(result.output_path)
+                key = output_storage.relative_path(output_path.name)
+                stored[result.index] = (key, output_path.stat().st_size)
+                output_storage.store(key, output_path)
+
+        # Одна пакетная вставка истории вместо коммита на каждый документ
+        now = datetime.utcnow()
+        compressed = current_app.config['PROPOSAL_DATA_STORAGE'] == STORAGE_COMPRESSED
+        mappings = [{
+            'user_id': current_user.id,
+            'filename': secure_filename(result.name) or f"batch_{batch_id}_{result.index}",
+            'original_filename': result.name,
+            'created_at': now,
+            'updated_at': now,
+            'status': ProposalHistory.STATUS_COMPLETED if result.status == 'completed'
+                      else ProposalHistory.STATUS_ERROR,
+            'data': None if compressed else json_compatible(result.data),
+            'file_path': stored[result.index][0] if result.index in stored else None,
+            'output_size': stored[result.index][1] if result.index in stored else None,
+            'file_size': sources[result.index][0],
+            'mime_type': sources[result.index][1],
+            'processing_time': result.processing_time
+        } for result in results]
+        # В режиме compressed нужны id вставленных строк для таблицы данных
+        db.session.bulk_insert_mappings(ProposalHistory, mappings, return_defaults=compressed)
+        if compressed:
+            payloads = []
+            for mapping, result in zip(mappings, results):
+                payload = ProposalPayload.from_data(result.data)
+                payload.proposal_id = mapping['id']
+                payloads.append(payload)
+            db.session.bulk_save_objects(payloads)
+        db.session.commit()
+
+        if response_format == 'links':
+            return jsonify({
+                'success': True,
+                'batch_id': batch_id,
+                'items': [{
+                    'name': result.name,
+                    'status': result.status,
+                    'error': result.error,
+                    'file_url': (f'/api/download/{stored[result.index][0]}'
+                                 if result.index in stored else None)
+                } for result in results]
+            })
+
+        if not archived:
+            archive.close()
+            return jsonify({'error': 'Ни один документ не был создан'}), 500
+        archive.seek(0)
+        return send_file(
+            archive,
+            mimetype='application/zip',
+            as_attachment=True,
+            download_name=f"proposals_{batch_id}.zip"
+        )
+
+    except (ValueError, zipfile.BadZipFile) as e:
+        return jsonify({'error': str(e)}), 400
+
+    except FileError as e:
+        return jsonify({'error': e.message, 'details': e.details}), e.status_code
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Ошибка при пакетном создании предложений")
+        return jsonify({'error': str(e)}), 500
+
+    finally:
+        # Удаляем папку пакета: книги и документы, не попавшие в хранилище
+        shutil.rmtree(batch_dir, ignore_errors=True)
+
+@bp.route('/api/cache/stats')
+@token_required
+def get_cache_stats(current_user):
+    """Счетчики кэша результатов для мониторинга (только для администраторов)"""
+    if current_user.role != 'admin':
+        return jsonify({'error': 'Нет доступа'}), 403
+    return jsonify({'success': True, 'result_cache': result_cache.stats()})
+
+@bp.route('/metrics')
+def metrics():
+    """Метрики в формате Prometheus: гистограммы стадий и счетчики кэша результатов"""
+    if not current_app.config['METRICS_ENABLED']:
+        return jsonify({'error': 'Not found'}), 404
+    cache = result_cache.stats()
+    text = render_metrics({
+        'proposal_result_cache_hits_total': cache['hits'],
+        'proposal_result_cache_misses_total': cache['misses'],
+        'proposal_result_cache_evictions_total': cache['evictions'],
+    })
+    return Response(text, mimetype='text/plain; version=0.0.4')
+
 # Регистрация Blueprint
 def register_routes(app):
     app.register_blueprint(bp)
\ No newline at end of file
@@ -0,0 +1,159 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Границы корзин гистограмм в секундах
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Пустой контекст для выключенной трассировки: без аллокаций на каждый вызов
+_NULL_STAGE = nullcontext()
+
+
+class Histogram:
+    """
+    Гистограмма задержек в формате Prometheus
+
+    Значения хранятся как счетчики по корзинам для каждого набора меток,
+    поэтому память не зависит от числа наблюдений.
+    """
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # [счетчики корзин..., +Inf], сумма
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for label_values, counts, total in sorted(snapshot):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values))
+            prefix = f"{labels}," if labels else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}'
+            suffix = f"{{{labels}}}" if labels else ''
+            yield f"{self.name}_sum{suffix} {total}"
+            yield f"{self.name}_count{suffix} {cumulative}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+stage_duration = Histogram(
+    'proposal_stage_duration_seconds',
+    'Длительность стадий создания предложения',
+    ('stage', 'template')
+)
+trace_duration = Histogram(
+    'proposal_trace_duration_seconds',
+    'Общая длительность участка обработки',
+    ('trace', 'template')
+)
+
+
+class Trace:
+    """
+    Замеры стадий одного участка обработки (запрос или задание)
+
+    Повторные стадии с тем же именем суммируются. При выключенной
+    трассировке stage() возвращает общий пустой контекст.
+    """
+    def __init__(self, name: str, template: str = '', enabled: bool = True):
+        self.name = name
+        self.template = template
+        self.enabled = enabled
+        self.timings: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def _measure(self, stage_name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.timings[stage_name] = self.timings.get(stage_name, 0.0) + elapsed
+
+    def stage(self, stage_name: str):
+        return self._measure(stage_name) if self.enabled else _NULL_STAGE
+
+    def snapshot(self) -> Dict[str, float]:
+        """Текущие длительности стадий в секундах (для сохранения в истории)"""
+        return {stage_name: round(elapsed, 4) for stage_name, elapsed in self.timings.items()}
+
+    def finish(self) -> Dict[str, float]:
+        """Выгружает замеры в гистограммы; возвращает длительности стадий"""
+        if self.enabled:
+            for stage_name, elapsed in self.timings.items():
+                stage_duration.observe(elapsed, stage_name, self.template)
+            trace_duration.observe(time.perf_counter() - self._started, self.name, self.template)
+        return self.snapshot()
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar('trace', default=None)
+
+# Включается в init_tracing из конфигурации (TRACING_ENABLED)
+tracing_enabled = True
+
+
+@contextmanager
+def start_trace(name: str, template: str = '') -> Iterator[Trace]:
+    """
+    Открывает трассировку участка; stage() внутри относится к ней
+
+    Гистограммы обновляются при выходе из контекста.
+    """
+    trace = Trace(name, template, enabled=tracing_enabled)
+    token = _current_trace.set(trace) if trace.enabled else None
+    try:
+        yield trace
+    finally:
+        if token is not None:
+            _current_trace.reset(token)
+        trace.finish()
+
+
+def stage(stage_name: str):
+    """Замер стадии в текущей трассировке; вне трассировки ничего не делает"""
+    trace = _current_trace.get()
+    if trace is None:
+        return _NULL_STAGE
+    return trace.stage(stage_name)
+
+
+def render_metrics(extra: Optional[Dict[str, float]] = None) -> str:
+    """Текст метрик в формате Prometheus; extra - дополнительные счетчики name -> value"""
+    lines = []
+    for histogram in (stage_duration, trace_duration):
+        lines.extend(histogram.render())
+    for name, value in (extra or {}).items():
+        lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def init_tracing(app):
+    """Включает или выключает трассировку по TRACING_ENABLED"""
+    global tracing_enabled
+    tracing_enabled = app.config['TRACING_ENABLED']
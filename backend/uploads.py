@@ -0,0 +1,156 @@
+import io
+import logging
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from .error_handler import FileError
+
+# Максимальный размер загружаемого Excel-файла
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Префикс рабочих папок запросов и заданий в WORK_FOLDER
+WORK_DIR_PREFIX = 'work_'
+
+
+def get_upload_size(file) -> Optional[int]:
+    """
+    Определяет размер загрузки без чтения содержимого
+
+    Для потоков с произвольным доступом (BytesIO, временный файл werkzeug)
+    размер берется из позиции конца потока, иначе - из Content-Length части.
+
+    Args:
+        file: FileStorage или файловый объект
+
+    Returns:
+        Optional[int]: Размер в байтах или None, если его нельзя узнать заранее
+    """
+    stream = getattr(file, 'stream', file)
+    try:
+        position = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell()
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return getattr(file, 'content_length', None) or None
+
+
+def _too_large(size: int, max_size: int) -> FileError:
+    return FileError(
+        message=f"Файл слишком большой. Максимальный размер {max_size // (1024 * 1024)}MB",
+        details={'size': size, 'max_size': max_size}
+    )
+
+
+def check_upload_size(file, max_size: int = MAX_UPLOAD_SIZE) -> Optional[int]:
+    """
+    Проверяет размер загрузки, не читая ее в память
+
+    Raises:
+        FileError: Если файл больше max_size
+    """
+    size = get_upload_size(file)
+    if size is not None and size > max_size:
+        raise _too_large(size, max_size)
+    return size
+
+
+def spool_upload(file, target_path, max_size: int = MAX_UPLOAD_SIZE,
+                 on_chunk: Optional[Callable[[int], None]] = None,
+                 size: Optional[int] = None, hasher=None) -> int:
+    """
+    Сохраняет загрузку на диск за один проход с постоянным расходом памяти
+
+    Поток копируется порциями по CHUNK_SIZE; размер контролируется по ходу
+    копирования, поэтому неизвестный заранее размер тоже ограничивается.
+
+    Args:
+        file: FileStorage или файловый объект
+        target_path: Куда сохранить файл
+        max_size (int): Максимальный размер в байтах
+        on_chunk (Optional[Callable[[int], None]]): Вызывается с числом записанных байт
+        size (Optional[int]): Известный заранее размер (например, из заголовка zip);
+            для сжатых потоков seek в конец означает распаковку всего файла
+        hasher: Объект hashlib, который обновляется каждой порцией (хэш без
+            повторного чтения файла)
+
+    Returns:
+        int: Размер сохраненного файла
+
+    Raises:
+        FileError: Если файл больше max_size; частично записанный файл удаляется
+    """
+    if size is None:
+        check_upload_size(file, max_size)
+    elif size > max_size:
+        raise _too_large(size, max_size)
+    stream = getattr(file, 'stream', file)
+    target_path = Path(target_path)
+    written = 0
+    try:
+        with open(target_path, 'wb') as target:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_size:
+                    raise _too_large(written, max_size)
+                target.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+                if on_chunk:
+                    on_chunk(written)
+    except Exception:
+        target_path.unlink(missing_ok=True)
+        raise
+    return written
+
+
+def make_work_dir(root, name: str = 'request') -> Path:
+    """
+    Создает собственную временную папку запроса или задания
+
+    Имя папки уникально (mkdtemp), поэтому одинаковые имена загрузок и
+    документов в параллельных потоках и процессах не пересекаются, а
+    уборка удаляет только свои файлы. Готовые файлы переносятся из нее в
+    хранилище переименованием.
+    """
+    Path(root).mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(prefix=f"{WORK_DIR_PREFIX}{name}_", dir=root))
+
+
+@contextmanager
+def work_dir(root, name: str = 'request') -> Iterator[Path]:
+    """Рабочая папка (make_work_dir), удаляемая целиком при выходе из блока"""
+    path = make_work_dir(root, name)
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def remove_stale_work_dirs(root, max_age: float) -> int:
+    """Удаляет рабочие папки, брошенные после сбоя процесса (старше max_age секунд)"""
+    removed = 0
+    cutoff = time.time() - max_age
+    try:
+        entries = list(os.scandir(root))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if (entry.name.startswith(WORK_DIR_PREFIX) and entry.is_dir(follow_symlinks=False)
+                    and entry.stat(follow_symlinks=False).st_mtime < cutoff):
+                shutil.rmtree(entry.path)
+                removed += 1
+        except OSError:
+            logging.exception(f"Не удалось удалить рабочую папку {entry.path}")
+    return removed
@@ -1,19 +1,24 @@
-from pydoc import doc
-import openpyxl
-import pandas as pd
-from docx import Document
-from docx.shared import Inches, Pt
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from logging import json
+import json
+import logging
+import os
 from pathlib import Path
-from typing import Dict, Optional, Any, Tuple, List
-from datetime import datetime
-from flask import logging, render_template
-from celery import shared_task
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Union
+
 from .error_handler import ValidationError, FileError, log_error
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, validator, ValidationError as PydanticValidationError
-from openpyxl import load_workbook
+from .excel_reader import ExtractionPlan, estimate_data_rows, extract_cells, iter_frame_chunks
+from .word_templates import ENGINE_DOCX, ENGINE_OOXML, template_cache
+from .ooxml_render import render_docx
+from .uploads import check_upload_size
+from .progress import report_progress
+from .tracing import stage
+from .pdf_converter import PdfConversionError, pdf_converter
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .excel_validation import ColumnRule
+
+# Размер порции строк при потоковой валидации больших файлов
+VALIDATION_CHUNK_SIZE = int(os.getenv('VALIDATION_CHUNK_SIZE', 1000))
 
 
 # Добавляем кастомные исключения для обработки ошибок
@@ -25,21 +30,6 @@ class ExcelProcessingError(Exception):
     # Кастомное исключение для ошибок обработки
     pass
 
-# Настраиваем систему логирования с ротацией файлов
-def setup_logging():
-    log_dir = Path("logs")
-    log_dir.mkdir(exist_ok=True)
-    log_file = log_dir / f"app_{datetime.now().strftime('%Y%m%d')}.log"
-
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler() # Также выводим в консоль
-        ]
-    )
-
 """
     Загружает конфигурацию из JSON-файла
     Args:
@@ -68,83 +58,24 @@ def load_config(config_path: str) -> Dict:
     
     Args:
         file_path (str): Путь к Excel-файлу
-        config (Dict): Словарь с настройками извлечения данных
+        config (Union[List[Dict], ExtractionPlan]): Настройки извлечения данных
+            или скомпилированный план из get_extraction_plan
     
     Returns:
         Optional[Dict[str, Any]]: Словарь с извлеченными данными или None при ошибке
     """
 
-class ExcelData(BaseModel):
-    step_1: str
-    step_2: str
-    step_3: str
-    step_1_deadline: str #  Пока str, позже изменим на datetime
-    step_2_deadline: str #  Пока str, позже изменим на datetime
-    step_3_deadline: str #  Пока str, позже изменим на datetime
-    total_deadline: str  # Пока str, позже изменим на datetime
-    tax: float
-    total_tax: float
-
-    @validator('tax', 'total_tax')
-    def check_positive(cls, value):
-        if value < 0:
-            raise ValueError("Значение должно быть положительным")
-        return value
-
-    # Добавить валидаторы для дат позже, после выбора формата
-
-def process_excel(file_path: str, config: Dict) -> Optional[Dict[str, Any]]:
+def process_excel(file_path: str, config: Union[List[Dict], ExtractionPlan]) -> Optional[Dict[str, Any]]:
     try:
-        # Проверяем существование файла
-        if not Path(file_path).exists():
-            raise FileNotFoundError(f"Excel файл не найден: {file_path}")
-
-        workbook = openpyxl.load_workbook(file_path, data_only=True)
-        data = {}
-        
-        # Перебираем все листы из конфигурации
-        for sheet_config in config:
-            sheet_name = sheet_config["sheet_name"]
-            if sheet_name not in workbook.sheetnames:
-                logging.warning(f"Лист '{sheet_name}' не найден")
-                continue
-
-            sheet = workbook[sheet_name]
-            
-            # Извлекаем данные согласно маппингу
-            for key, cell_address in sheet_config["data_mapping"].items():
-                try:
-                    cell = sheet[cell_address]
-                    # Добавляем базовую валидацию данных
-                    if cell.value is not None:
-                        data[key] = cell.value
-                    else:
-                        logging.warning(f"Пустая ячейка: {cell_address} на листе {sheet_name}")
-                        data[key] = None
-                except KeyError:
-                    logging.error(f"Неверный адрес ячейки: {cell_address}")
-                    data[key] = None
-
+        # Читаем только нужные листы и строки в потоковом режиме
+        with stage('extract'):
+            data = extract_cells(file_path, config)
         return data if data else None
 
     except Exception as e:
         logging.exception("Ошибка при обработке Excel файла")
         return None
     
-# Валидация данных
-try:
-    validated_data = ExcelData(**data)  # Валидация с помощью Pydantic
-    return True, None, validated_data.dict()
-except PydanticValidationError as e:
-    errors = [f"{err['loc'][0]}: {err['msg']}" for err in e.errors()]
-    return False, "\n".join(errors), None
-
-except FileNotFoundError:
-        return False, f"Файл не найден: {file_path}", None
-    except Exception as e:
-        # ... (логирование и обработка других ошибок)
-        return False, str(e), None
-
 """
     Генерирует Word-документ на основе шаблона и данных
     
@@ -152,35 +83,31 @@ except FileNotFoundError:
         data (Dict[str, Any]): Данные для вставки в документ
         template_path (str): Путь к шаблону Word
         output_path (str): Путь для сохранения результата
+        engine (str): Движок генерации: 'docx' (python-docx) или 'ooxml'
     
     Returns:
         Optional[str]: Путь к созданному файлу или None при ошибке
     """
-def generate_word(data: Dict[str, Any], template_path: str, output_path: str) -> Optional[str]:
+def generate_word(data: Dict[str, Any], template_path: str, output_path: str,
+                  engine: str = ENGINE_DOCX) -> Optional[str]:
     try:
-        doc = Document(template_path)
-        
-        # Обрабатываем закладки в документе
-        for bookmark in doc.bookmarks:
-            if bookmark.name in data:
-                value = data[bookmark.name]
-                
-                # Форматируем значение в зависимости от типа
-                formatted_value = format_value(value)
-                
-                # Вставляем значение в закладку
-                run = bookmark.parent.add_run()
-                run.text = formatted_value
-                
-                # Применяем базовое форматирование
-                if isinstance(value, (int, float)):
-                    run.font.size = Pt(11)
-                    run.font.name = 'Arial'
-
-        # Сохраняем документ
         output_file = Path(output_path)
         output_file.parent.mkdir(exist_ok=True)
-        doc.save(output_file)
+
+        if engine == ENGINE_OOXML:
+            # Потоковая подстановка в OOXML без объектной модели python-docx
+            with stage('render'):
+                render_docx(data, template_path, str(output_file))
+        elif engine == ENGINE_DOCX:
+            # Берем разобранный шаблон из кэша и заполняем его копию
+            with stage('template_load'):
+                skeleton = template_cache.get(template_path)
+            with stage('render'):
+                document = skeleton.render(data)
+            with stage('save'):
+                document.save(output_file)
+        else:
+            raise ValueError(f"Неизвестный движок генерации: {engine}")
         
         logging.info(f"Документ успешно создан: {output_file}")
         return str(output_file)
@@ -189,24 +116,30 @@ def generate_word(data: Dict[str, Any], template_path: str, output_path: str) ->
         logging.exception("Ошибка при генерации Word документа")
         return None
 
-"""
-    Форматирует значение для вставки в документ
-    
+def generate_pdf(docx_path: str, pdf_path: Optional[str] = None) -> Optional[str]:
+    """
+    Создает PDF-версию готового документа Word
+
+    Преобразование выполняет пул прогретых процессов LibreOffice
+    (pdf_converter), поэтому запуск офиса не повторяется для каждого
+    документа.
+
     Args:
-        value (Any): Значение для форматирования
-    
+        docx_path (str): Путь к документу Word
+        pdf_path (Optional[str]): Путь к PDF, по умолчанию рядом с документом
+
     Returns:
-        str: Отформатированное значение
-"""
-def format_value(value: Any) -> str:
-    if isinstance(value, (int, float)):
-        return f"{value:,.2f}".replace(',', ' ')
-    elif isinstance(value, bool):
-        return "Да" if value else "Нет"
-    elif value is None:
-        return ""
-    else:
-        return str(value)
+        Optional[str]: Путь к созданному PDF или None при ошибке
+    """
+    target = Path(pdf_path) if pdf_path else Path(docx_path).with_suffix('.pdf')
+    try:
+        with stage('pdf'):
+            pdf_converter.convert(docx_path, target)
+        logging.info(f"PDF успешно создан: {target}")
+        return str(target)
+    except PdfConversionError as e:
+        logging.error(f"Ошибка при создании PDF: {e}")
+        return None
 
 def validate_excel_file(file):
     """
@@ -223,32 +156,18 @@ def validate_excel_file(file):
         
         # Проверка расширения файла
         if not file.filename.endswith(('.xlsx', '.xls')):
-            raise ValidationError(
-                message = "Неверный формат файла. Допускаются только .xlsx или .xls"
-                details={'filename': file.filename}
-                logging.error(message)
-                raise ExcelValidationError(message)
-
-        # Проверка размера файла
-        file_size = len(file.read())
-        if file_size > 10 * 1024 * 1024:  # 10MB
-            raise FileError(
-                message="Файл слишком большой. Максимальный размер 10MB",
-                details={'size': file_size, 'max_size': 10 * 1024 * 1024}
-            )
-        logging.info(f"Размер файла: {file_size / (1024*1024):.2f} MB")
-        
-        if file_size > 10 * 1024 * 1024:  # 10MB
-            raise FileError(
-                message = "Файл слишком большой. Максимальный размер 10MB"
-                details={'size': file_size, 'max_size': 10 * 1024 * 1024}
-                logging.error(message)
-                raise ExcelValidationError(message)
-            
-        file.seek(0)
-
-        # Чтение файла с помощью pandas
-        df = pd.read_excel(file)
+            message = "Неверный формат файла. Допускаются только .xlsx или .xls"
+            logging.error(message)
+            raise ValidationError(message=message, details={'filename': file.filename})
+
+        # Проверка размера по позиции в потоке, без чтения файла в память
+        file_size = check_upload_size(file)
+        if file_size is not None:
+            logging.info(f"Размер файла: {file_size / (1024*1024):.2f} MB")
+
+        # Читаем прямо из потока загрузки: werkzeug уже держит его во временном файле
+        import pandas as pd
+        df = pd.read_excel(file.stream)
         logging.info(f"Файл успешно прочитан. Количество строк: {len(df)}")
 
         # Проверка структуры и данных
@@ -263,6 +182,7 @@ def validate_excel_file(file):
             logging.error(f"Ошибка данных: {data_validation['errors']}")
             raise ExcelValidationError('\n'.join(data_validation['errors']))
 
+        logging.info("Валидация успешно завершена")
         return True, "Файл успешно проверен", {
             'preview': df.head().to_dict(),
             'summary': {
@@ -270,7 +190,10 @@ def validate_excel_file(file):
                 'total_sum': df['price'].sum() if 'price' in df.columns else 0
             }
         }
-    
+
+    except ExcelValidationError as e:
+        return False, str(e), {}
+
     except (ValidationError, FileError) as e:
         log_error(e, {'filename': file.filename})
         raise
@@ -279,25 +202,7 @@ def validate_excel_file(file):
         log_error(e, {'filename': file.filename})
         raise FileError(f"Ошибка при обработке файла: {str(e)}")
 
-        # Подготовка превью данных
-        preview_data = {
-            'preview': df.head().to_dict(),
-            'summary': {
-                'total_rows': len(df),
-                'total_sum': df['price'].sum() if 'price' in df.columns else 0
-            }
-        }
-
-        logging.info("Валидация успешно завершена")
-        return True, "Файл успешно проверен", preview_data
-
-    except ExcelValidationError as e:
-        return False, str(e), {}
-    except Exception as e:
-        logging.exception("Непредвиденная ошибка при валидации")
-        return False, f"Ошибка при обработке файла: {str(e)}", {}
-
-def validate_excel_structure(df: pd.DataFrame) -> Dict[str, Any]:
+def validate_excel_structure(df: 'pd.DataFrame') -> Dict[str, Any]:
     """Проверка структуры Excel файла"""
     required_columns = ['name', 'price', 'quantity']
     errors = []
@@ -316,68 +221,67 @@ def validate_excel_structure(df: pd.DataFrame) -> Dict[str, Any]:
         'errors': errors
     }
 
-def validate_excel_data(df: pd.DataFrame) -> Dict[str, Any]:
-    """Расширенная валидация данных в Excel файле"""
-    errors = []
-    
-    # Проверка цен
-    if 'price' in df.columns:
-        invalid_prices = df[~df['price'].apply(lambda x: isinstance(x, (int, float)) and x > 0)]
-        if not invalid_prices.empty:
-            errors.append(f"Неверные цены в строках: {invalid_prices.index.tolist()}")
-
-    # Проверка количества
-    if 'quantity' in df.columns:
-        invalid_quantities = df[~df['quantity'].apply(lambda x: isinstance(x, (int, float)) and x > 0)]
-        if not invalid_quantities.empty:
-            errors.append(f"Неверное количество в строках: {invalid_quantities.index.tolist()}")
-
-    # Проверка наименований
-    if 'name' in df.columns:
-        empty_names = df[df['name'].isna() | (df['name'] == '')]
-        if not empty_names.empty:
-            errors.append(f"Пустые наименования в строках: {empty_names.index.tolist()}")
+def validate_excel_data(df: 'pd.DataFrame',
+                        rules: Optional[Iterable['ColumnRule']] = None) -> Dict[str, Any]:
+    """
+    Расширенная валидация данных в Excel файле
 
-    return {
-        'is_valid': len(errors) == 0,
-        'errors': errors
-    }
+    Проверки выполняются векторно по колонкам (см. excel_validation),
+    в сообщениях выводится не больше MAX_REPORTED_ROWS номеров строк.
+    По умолчанию применяются правила DEFAULT_RULES.
+    """
+    from .excel_validation import DEFAULT_RULES, validate_frame
+    return validate_frame(df, DEFAULT_RULES if rules is None else rules)
 
-@shared_task
-def async_validate_excel_file(file_path: str) -> Dict[str, Any]:
+def async_validate_excel_file(file_path: str, channel_id: Optional[str] = None,
+                              chunk_size: int = VALIDATION_CHUNK_SIZE) -> Dict[str, Any]:
     """
     Асинхронная валидация больших файлов через Celery
-    
+
+    Задача регистрируется в celery_app (excel.validate), чтобы модуль не
+    загружал Celery при импорте.
+
+    Лист читается потоково порциями по chunk_size строк, поэтому пиковая
+    память воркера определяется размером порции, а не размером файла.
+
     Args:
         file_path: Путь к файлу для валидации
-        
+        channel_id: Канал прогресса; прогресс публикуется после каждой порции
+        chunk_size: Число строк в порции
+
     Returns:
         Dict[str, Any]: Результат валидации
     """
     try:
         logging.info(f"Начало асинхронной валидации: {file_path}")
-        
-        # Чтение файла порциями для больших файлов
-        chunk_size = 1000
-        chunks = pd.read_excel(file_path, chunksize=chunk_size)
-        
-        all_errors = []
-        total_rows = 0
-        
-        for chunk_num, chunk in enumerate(chunks, 1):
-            validation_result = validate_excel_data(chunk)
-            if not validation_result['is_valid']:
-                all_errors.extend(validation_result['errors'])
-            total_rows += len(chunk)
-            logging.info(f"Обработано {chunk_num * chunk_size} строк")
-
-        if all_errors:
+
+        expected_rows = estimate_data_rows(file_path)
+        from .excel_validation import ValidationAccumulator
+        accumulator = ValidationAccumulator()
+
+        for chunk_num, chunk in enumerate(iter_frame_chunks(file_path, chunk_size), 1):
+            accumulator.add(chunk)
+            logging.info(f"Порция {chunk_num}: обработано {accumulator.total_rows} строк")
+            if channel_id:
+                progress = min(accumulator.total_rows / expected_rows * 100, 99.0) if expected_rows else None
+                report_progress(channel_id, 'processing', stage='validate', progress=progress,
+                                processed_rows=accumulator.total_rows)
+
+        result = accumulator.result()
+        total_rows = accumulator.total_rows
+
+        if not result['is_valid']:
+            if channel_id:
+                report_progress(channel_id, 'error', stage='validate', errors=result['errors'])
             return {
                 'status': 'error',
-                'errors': all_errors,
+                'errors': result['errors'],
                 'total_rows': total_rows
             }
 
+        if channel_id:
+            report_progress(channel_id, 'completed', stage='validate', progress=100.0,
+                            total_rows=total_rows)
         return {
             'status': 'success',
             'message': 'Валидация успешно завершена',
@@ -386,10 +290,9 @@ def async_validate_excel_file(file_path: str) -> Dict[str, Any]:
 
     except Exception as e:
         logging.exception("Ошибка при асинхронной валидации")
+        if channel_id:
+            report_progress(channel_id, 'error', stage='validate', error=str(e))
         return {
             'status': 'error',
             'message': str(e)
         }
-
-# Инициализация при импорте модуля
-setup_logging()
\ No newline at end of file
@@ -0,0 +1,214 @@
+import copy
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# python-docx импортируется при первом разборе или заполнении шаблона
+
+# Движки генерации документов: объектная модель python-docx или прямая правка OOXML
+ENGINE_DOCX = 'docx'
+ENGINE_OOXML = 'ooxml'
+
+# Плейсхолдеры вида {{step_1}} внутри текста шаблона
+PLACEHOLDER_RE = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Путь к элементу как последовательность индексов дочерних узлов от корня документа
+ElementPath = Tuple[int, ...]
+
+
+def format_value(value: Any) -> str:
+    """
+    Форматирует значение для вставки в документ
+
+    Args:
+        value (Any): Значение для форматирования
+
+    Returns:
+        str: Отформатированное значение
+    """
+    if isinstance(value, (int, float)):
+        return f"{value:,.2f}".replace(',', ' ')
+    elif isinstance(value, bool):
+        return "Да" if value else "Нет"
+    elif value is None:
+        return ""
+    else:
+        return str(value)
+
+
+def _element_path(root, element) -> ElementPath:
+    """Вычисляет путь от корня документа до элемента"""
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    return tuple(reversed(path))
+
+
+def _resolve_path(root, path: ElementPath):
+    """Находит элемент по пути без обхода всего дерева"""
+    element = root
+    for index in path:
+        element = element[index]
+    return element
+
+
+@dataclass
+class TemplateSkeleton:
+    """
+    Разобранный шаблон Word с индексом точек вставки
+
+    Шаблон разбирается один раз; для каждого документа делается копия
+    в памяти, а закладки и плейсхолдеры находятся по заранее
+    сохраненным путям.
+    """
+    path: str
+    mtime_ns: int
+    document: object
+    bookmarks: Dict[str, ElementPath] = field(default_factory=dict)
+    placeholders: Dict[str, List[ElementPath]] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, template_path: str) -> 'TemplateSkeleton':
+        from docx import Document
+        from docx.oxml.ns import qn
+
+        path = Path(template_path)
+        mtime_ns = path.stat().st_mtime_ns
+        document = Document(str(path))
+        root = document.element
+
+        bookmarks = {}
+        for bookmark in root.iter(qn('w:bookmarkStart')):
+            name = bookmark.get(qn('w:name'))
+            if name and name not in bookmarks:
+                bookmarks[name] = _element_path(root, bookmark)
+
+        placeholders = {}
+        for text in root.iter(qn('w:t')):
+            for name in PLACEHOLDER_RE.findall(text.text or ''):
+                paths = placeholders.setdefault(name, [])
+                text_path = _element_path(root, text)
+                if text_path not in paths:
+                    paths.append(text_path)
+
+        logging.info(f"Шаблон разобран: {template_path}")
+        return cls(
+            path=str(path),
+            mtime_ns=mtime_ns,
+            document=document,
+            bookmarks=bookmarks,
+            placeholders=placeholders
+        )
+
+    def new_document(self):
+        """
+        Создает новый документ из копии шаблона
+
+        Returns:
+            Tuple: (документ, {имя: элемент w:bookmarkStart},
+                    {имя: [элементы w:t с плейсхолдером]})
+        """
+        # Копируется часть документа, а обертка Document создается заново:
+        # python-docx кэширует в ней обертку тела (paragraphs, tables), и
+        # deepcopy скопировал бы тело отдельным деревом, не связанным с копией
+        document = copy.deepcopy(self.document.part).document
+        root = document.element
+        bookmarks = {
+            name: _resolve_path(root, path) for name, path in self.bookmarks.items()
+        }
+        placeholders = {
+            name: [_resolve_path(root, path) for path in paths]
+            for name, paths in self.placeholders.items()
+        }
+        return document, bookmarks, placeholders
+
+    def render(self, data: Dict[str, Any]):
+        """
+        Заполняет копию шаблона данными
+
+        Args:
+            data (Dict[str, Any]): Данные для вставки в документ
+
+        Returns:
+            Document: Заполненный документ, готовый к сохранению
+        """
+        from docx.oxml import OxmlElement
+        from docx.shared import Pt
+        from docx.text.run import Run
+
+        document, bookmarks, placeholders = self.new_document()
+
+        # Обрабатываем закладки в документе
+        for name, bookmark in bookmarks.items():
+            if name in data:
+                value = data[name]
+
+                # Вставляем значение сразу после начала закладки
+                run_element = OxmlElement('w:r')
+                bookmark.addnext(run_element)
+                run = Run(run_element, None)
+                run.text = format_value(value)
+
+                # Применяем базовое форматирование
+                if isinstance(value, (int, float)):
+                    run.font.size = Pt(11)
+                    run.font.name = 'Arial'
+
+        # Подставляем значения в плейсхолдеры {{name}}
+        def substitute(match):
+            name = match.group(1)
+            return format_value(data[name]) if name in data else match.group(0)
+
+        for text_elements in placeholders.values():
+            for text_element in text_elements:
+                text_element.text = PLACEHOLDER_RE.sub(substitute, text_element.text)
+
+        return document
+
+
+class TemplateCache:
+    """
+    LRU-кэш разобранных шаблонов
+
+    Ключ - путь к шаблону; запись считается устаревшей, если mtime
+    файла изменился, и тогда шаблон разбирается заново.
+    """
+    def __init__(self, max_size: int = 8):
+        self.max_size = max_size
+        self._templates: "OrderedDict[str, TemplateSkeleton]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, template_path: str) -> TemplateSkeleton:
+        path = str(Path(template_path).resolve())
+        mtime_ns = os.stat(path).st_mtime_ns
+
+        with self._lock:
+            skeleton = self._templates.get(path)
+            if skeleton and skeleton.mtime_ns == mtime_ns:
+                self._templates.move_to_end(path)
+                return skeleton
+
+        skeleton = TemplateSkeleton.load(path)
+
+        with self._lock:
+            self._templates[path] = skeleton
+            self._templates.move_to_end(path)
+            while len(self._templates) > self.max_size:
+                evicted, _ = self._templates.popitem(last=False)
+                logging.info(f"Шаблон вытеснен из кэша: {evicted}")
+        return skeleton
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+
+# Глобальный кэш шаблонов
+template_cache = TemplateCache(max_size=int(os.getenv('TEMPLATE_CACHE_SIZE', 8)))
@@ -0,0 +1,23 @@
+"""
+Точка входа для WSGI-сервера и воркеров Celery
+
+    gunicorn backend.wsgi:app
+    JOB_QUEUE_BACKEND=celery celery -A backend.wsgi.celery worker
+    FLASK_APP=backend.app:create_app flask db upgrade
+    FLASK_APP=backend.app:create_app flask run   # сервер разработки
+"""
+from .app import create_app
+from .jobs import QUEUE_CELERY
+from .output_storage import start_output_sweeper
+
+app = create_app()
+
+# Обслуживание хранилища документов при OUTPUT_SWEEP_INTERVAL > 0 - только в
+# веб-процессе, с первого запроса; воркеры gunicorn обходят хранилище не
+# чаще раза за период на всех (см. OutputStorage.sweep)
+start_output_sweeper(app)
+
+# Celery загружается, только если задания идут через брокер; init_job_queue
+# уже подключил к нему приложение
+if app.config['JOB_QUEUE_BACKEND'] == QUEUE_CELERY:
+    from .celery_app import celery
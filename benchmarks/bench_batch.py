@@ -0,0 +1,99 @@
+"""
+Бенчмарк масштабирования пакетной генерации по числу процессов
+
+Создает набор синтетических смет и прогоняет их через run_batch
+(process_excel + generate_word) на пулах разного размера, показывая
+пропускную способность и ускорение относительно одного процесса.
+
+Запуск:
+    python benchmarks/bench_batch.py --items 64 --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.batch import BatchItem, make_executor, run_batch  # noqa: E402
+from backend.excel_reader import ExtractionPlan  # noqa: E402
+from benchmarks.bench_excel_extraction import SAMPLE_CONFIG, generate_workbook  # noqa: E402
+
+DEFAULT_TEMPLATE = ROOT / 'tests' / 'CP_WMS.docx'
+
+
+def default_workers():
+    cores = os.cpu_count() or 1
+    workers = [1]
+    while workers[-1] * 2 <= cores:
+        workers.append(workers[-1] * 2)
+    if workers[-1] != cores:
+        workers.append(cores)
+    return workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--items', type=int, default=64)
+    parser.add_argument('--rows', type=int, default=2000, help='строк в каждой смете')
+    parser.add_argument('--workers', type=int, nargs='+', default=default_workers())
+    parser.add_argument('--template', type=Path, default=DEFAULT_TEMPLATE)
+    parser.add_argument('--engine', default='docx')
+    args = parser.parse_args()
+
+    plan = ExtractionPlan.compile(SAMPLE_CONFIG)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        source = workdir / 'estimate.xlsx'
+        generate_workbook(source, args.rows)
+
+        items = [
+            BatchItem(
+                index=index,
+                name=f"estimate_{index}.xlsx",
+                output_path=str(workdir / f"proposal_{index}.docx"),
+                template_path=str(args.template),
+                engine=args.engine,
+                excel_path=str(source),
+                plan=plan
+            )
+            for index in range(args.items)
+        ]
+
+        baseline = None
+        for workers in args.workers:
+            with make_executor(workers) as executor:
+                # Прогрев: процессы пула разбирают шаблон и импортируют модули
+                list(executor.map(abs, range(workers)))
+                run_batch(items[:workers], executor)
+
+                started = time.perf_counter()
+                batch = run_batch(items, executor)
+                elapsed = time.perf_counter() - started
+
+            failed = [result.name for result in batch if result.status != 'completed']
+            if failed:
+                print(f"Ошибки обработки: {failed}")
+                sys.exit(1)
+
+            throughput = args.items / elapsed
+            baseline = baseline or throughput
+            results.append({
+                'workers': workers,
+                'items': args.items,
+                'seconds': round(elapsed, 3),
+                'docs_per_sec': round(throughput, 2),
+                'speedup': round(throughput / baseline, 2),
+            })
+            print(f"{workers:>3} процессов  {throughput:>8.2f} док/с  x{throughput / baseline:.2f}")
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Бенчмарк извлечения ячеек из Excel: полная загрузка книги против потокового чтения
+
+Генерирует синтетические книги сметы (по умолчанию 10k и 100k строк),
+затем для каждого движка запускает отдельный процесс и замеряет
+время работы и пиковое потребление памяти (RSS).
+
+Запуск:
+    python benchmarks/bench_excel_extraction.py --rows 10000 100000
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from openpyxl import Workbook, load_workbook
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.excel_reader import ExtractionPlan, extract_cells  # noqa: E402
+
+SAMPLE_CONFIG = [
+    {
+        "sheet_name": "service_list",
+        "data_mapping": {
+            "step_1": "F22",
+            "step_2": "F23",
+            "step_3": "F24",
+            "step_1_deadline": "B14",
+            "step_2_deadline": "B15",
+            "step_3_deadline": "B16",
+            "total_deadline": "B18",
+            "tax": "E18",
+            "total_tax": "F18"
+        }
+    }
+]
+
+
+def legacy_extract(file_path, config):
+    """Прежний способ: полная загрузка книги и поиск через sheet[cell_address]"""
+    workbook = load_workbook(file_path, data_only=True)
+    data = {}
+    for sheet_config in config:
+        sheet = workbook[sheet_config["sheet_name"]]
+        for key, cell_address in sheet_config["data_mapping"].items():
+            data[key] = sheet[cell_address].value
+    return data
+
+
+def streaming_extract(file_path, config):
+    """Потоковое чтение по заранее скомпилированному плану"""
+    return extract_cells(file_path, SAMPLE_PLAN)
+
+
+SAMPLE_PLAN = ExtractionPlan.compile(SAMPLE_CONFIG)
+
+ENGINES = {
+    'legacy': legacy_extract,
+    'streaming': streaming_extract,
+}
+
+
+def generate_workbook(path: Path, rows: int, columns: int = 10):
+    """Создает книгу с листом service_list и объемным листом сметы"""
+    workbook = Workbook(write_only=True)
+
+    service_list = workbook.create_sheet("service_list")
+    mapped = {}
+    for key, address in SAMPLE_CONFIG[0]["data_mapping"].items():
+        mapped[address] = f"{key}-value" if 'deadline' in key else 1000.5
+    for row in range(1, rows + 1):
+        service_list.append([
+            mapped.get(f"{chr(ord('A') + col)}{row}", f"r{row}c{col}")
+            for col in range(columns)
+        ])
+
+    estimate = workbook.create_sheet("estimate")
+    estimate.append(['name', 'price', 'quantity'] + [f"col_{i}" for i in range(columns - 3)])
+    for row in range(rows):
+        estimate.append([f"item {row}", row * 1.5 + 1, row % 7 + 1] + list(range(columns - 3)))
+
+    workbook.save(path)
+
+
+def measure(engine: str, file_path: str) -> dict:
+    """Замер в текущем процессе; вызывается из дочернего процесса"""
+    started = time.perf_counter()
+    data = ENGINES[engine](file_path, SAMPLE_CONFIG)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss в Linux измеряется в килобайтах
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'engine': engine,
+        'seconds': round(elapsed, 4),
+        'peak_rss_mb': round(peak_rss_kb / 1024, 1),
+        'keys': len(data),
+    }
+
+
+def run_isolated(engine: str, file_path: Path) -> dict:
+    """Запускает замер в отдельном процессе, чтобы пиковый RSS не смешивался"""
+    output = subprocess.run(
+        [sys.executable, __file__, '--measure', engine, str(file_path)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--measure', nargs=2, metavar=('ENGINE', 'FILE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(*args.measure)))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = Path(tmp) / f"estimate_{rows}.xlsx"
+            generate_workbook(path, rows)
+            for engine in ENGINES:
+                result = run_isolated(engine, path)
+                result['rows'] = rows
+                results.append(result)
+                print(f"{rows:>8} строк  {engine:<10} {result['seconds']:>8.3f} с  "
+                      f"{result['peak_rss_mb']:>8.1f} MB")
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Бенчмарк проверки паролей при разных настройках стоимости
+
+Для каждого числа итераций PBKDF2 измеряет проверки в секунду в одном
+потоке (на ядро) и через ограниченный пул PasswordHasher с заданным
+числом потоков. Помогает выбрать PASSWORD_HASH_ITERATIONS и
+PASSWORD_HASH_WORKERS под ожидаемый утренний пик входов.
+
+Запуск:
+    python benchmarks/bench_password_hashing.py --iterations 100000 260000 600000 --workers 2 4
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from werkzeug.security import check_password_hash
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.passwords import PasswordHasher  # noqa: E402
+
+PASSWORD = 'correct horse battery staple'
+
+
+def single_thread_rate(password_hash: str, duration: float) -> float:
+    """Проверок в секунду без пула: стоимость одной проверки на ядре"""
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        if not check_password_hash(password_hash, PASSWORD):
+            raise RuntimeError('Пароль не прошел проверку')
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def pool_rate(hasher: PasswordHasher, password_hash: str, logins: int, clients: int) -> float:
+    """Проверок в секунду через пул при clients одновременных входах"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(lambda _: hasher.verify(password_hash, PASSWORD), range(logins)))
+    elapsed = time.perf_counter() - started
+    if not all(results):
+        raise RuntimeError('Пароль не прошел проверку')
+    return logins / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--algorithm', default='pbkdf2:sha256')
+    parser.add_argument('--iterations', type=int, nargs='+', default=[100_000, 260_000, 600_000])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--duration', type=float, default=2.0, help='секунд на замер в одном потоке')
+    parser.add_argument('--logins', type=int, default=40, help='входов на замер пула')
+    args = parser.parse_args()
+
+    results = []
+    for iterations in args.iterations:
+        hasher = PasswordHasher(args.algorithm, iterations, max_workers=1, wait_timeout=60)
+        password_hash = hasher.hash(PASSWORD)
+        per_core = single_thread_rate(password_hash, args.duration)
+        row = {
+            'method': hasher.method,
+            'per_core_per_sec': round(per_core, 1),
+            'verify_ms': round(1000 / per_core, 2),
+            'pool_per_sec': {},
+        }
+        for workers in args.workers:
+            hasher.configure(args.algorithm, iterations, workers, wait_timeout=60)
+            rate = pool_rate(hasher, password_hash, args.logins, clients=workers * 3)
+            row['pool_per_sec'][workers] = round(rate, 1)
+        results.append(row)
+
+        pool = '  '.join(f"{workers} потоков {rate:>7.1f}/с" for workers, rate in row['pool_per_sec'].items())
+        print(f"{hasher.method:<24} {per_core:>7.1f}/с на ядро ({row['verify_ms']:.1f} мс)  {pool}")
+
+    print(json.dumps({'cpu_count': os.cpu_count(), 'results': results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Бенчмарк пикового расхода памяти при приеме загрузки
+
+Сравнивает прежний путь (len(file.read()) для проверки размера, затем
+повторное чтение потока) с новым: размер по seek/tell и однократная
+запись потока на диск порциями. Память меряется tracemalloc.
+
+Запуск:
+    python benchmarks/bench_upload_memory.py --sizes 1 5 10
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.uploads import check_upload_size, spool_upload  # noqa: E402
+
+MB = 1024 * 1024
+
+
+def legacy_upload(stream, target_path):
+    # Размер через чтение всего файла в память, затем копия на диск
+    file_size = len(stream.read())
+    stream.seek(0)
+    with open(target_path, 'wb') as target:
+        target.write(stream.read())
+    return file_size
+
+
+def spooled_upload(stream, target_path):
+    check_upload_size(stream, max_size=1024 * MB)
+    return spool_upload(stream, target_path, max_size=1024 * MB)
+
+
+def measure(func, size_mb, workdir):
+    # Поток создается до старта трассировки: его буфер - это уже принятый запрос
+    stream = io.BytesIO(os.urandom(size_mb * MB))
+    target = workdir / f"{func.__name__}.bin"
+    tracemalloc.start()
+    written = func(stream, target)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert written == size_mb * MB
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 10], help='размеры в MB')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for size_mb in args.sizes:
+            legacy = measure(legacy_upload, size_mb, workdir)
+            spooled = measure(spooled_upload, size_mb, workdir)
+            results.append({
+                'size_mb': size_mb,
+                'legacy_peak_kb': round(legacy / 1024, 1),
+                'spooled_peak_kb': round(spooled / 1024, 1),
+            })
+            print(f"{size_mb:>4} MB  прежний {legacy / MB:>7.2f} MB  потоковый {spooled / MB:>7.3f} MB")
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Бенчмарк валидации данных сметы
+
+Сравнивает прежнюю построчную проверку (apply с lambda на каждую ячейку)
+с векторной validate_frame на больших DataFrame и проверяет, что при
+выводе всех строк сообщения совпадают.
+
+Запуск:
+    python benchmarks/bench_validation.py --rows 10000 100000 1000000
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.excel_validation import validate_frame  # noqa: E402
+
+
+def legacy_validate(df):
+    errors = []
+    if 'price' in df.columns:
+        invalid_prices = df[~df['price'].apply(lambda x: isinstance(x, (int, float)) and x > 0)]
+        if not invalid_prices.empty:
+            errors.append(f"Неверные цены в строках: {invalid_prices.index.tolist()}")
+    if 'quantity' in df.columns:
+        invalid_quantities = df[~df['quantity'].apply(lambda x: isinstance(x, (int, float)) and x > 0)]
+        if not invalid_quantities.empty:
+            errors.append(f"Неверное количество в строках: {invalid_quantities.index.tolist()}")
+    if 'name' in df.columns:
+        empty_names = df[df['name'].isna() | (df['name'] == '')]
+        if not empty_names.empty:
+            errors.append(f"Пустые наименования в строках: {empty_names.index.tolist()}")
+    return {'is_valid': len(errors) == 0, 'errors': errors}
+
+
+def generate_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    names = np.where(rng.random(rows) < 0.001, '', 'Позиция')
+    price = rng.random(rows) * 1000
+    price[rng.random(rows) < 0.001] = -1
+    quantity = rng.integers(0, 100, rows)
+    return pd.DataFrame({'name': names, 'price': price, 'quantity': quantity})
+
+
+def best_of(func, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(df)
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        df = generate_frame(rows)
+        legacy_time, legacy = best_of(legacy_validate, df, args.repeat)
+        vector_time, _ = best_of(validate_frame, df, args.repeat)
+
+        full = validate_frame(df, max_reported=rows)
+        if full != legacy:
+            print(f"Результаты не совпадают на {rows} строках")
+            sys.exit(1)
+
+        results.append({
+            'rows': rows,
+            'legacy_ms': round(legacy_time * 1000, 2),
+            'vectorized_ms': round(vector_time * 1000, 2),
+            'speedup': round(legacy_time / vector_time, 1),
+        })
+        print(f"{rows:>9} строк  прежняя {legacy_time * 1000:>9.2f} мс  "
+              f"векторная {vector_time * 1000:>8.2f} мс  x{legacy_time / vector_time:.1f}")
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
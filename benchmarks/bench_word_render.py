@@ -0,0 +1,115 @@
+"""
+Бенчмарк генерации Word: python-docx (кэш шаблонов) против прямой правки OOXML
+
+Перед замером проверяет, что оба движка дают одинаковый по содержимому
+документ: XML-части сравниваются в каноническом виде (C14N), остальные
+части - побайтно. Затем считает пропускную способность (документов в секунду).
+
+Запуск:
+    python benchmarks/bench_word_render.py --iterations 50
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from lxml import etree
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from backend.ooxml_render import render_docx  # noqa: E402
+from backend.word_templates import template_cache  # noqa: E402
+
+DEFAULT_TEMPLATE = ROOT / 'tests' / 'CP_WMS.docx'
+
+SAMPLE_DATA = {
+    'step_1': 125000.0,
+    'step_2': 48000.5,
+    'step_3': 17500,
+    'step_1_deadline': '10 рабочих дней',
+    'step_2_deadline': '15 рабочих дней',
+    'step_3_deadline': '5 рабочих дней',
+    'total_deadline': '30 рабочих дней',
+    'tax': 38100.1,
+    'total_tax': 228600.6,
+}
+
+
+def render_with_docx(data, template_path, output_path):
+    template_cache.get(template_path).render(data).save(output_path)
+
+
+ENGINES = {
+    'docx': render_with_docx,
+    'ooxml': render_docx,
+}
+
+
+def _canonical(name, payload):
+    if name == '[Content_Types].xml':
+        # python-docx пересобирает список типов, порядок записей не важен
+        root = etree.fromstring(payload)
+        return sorted(etree.tostring(child, method='c14n') for child in root)
+    if name.endswith('.xml') or name.endswith('.rels'):
+        return etree.tostring(etree.fromstring(payload), method='c14n')
+    return payload
+
+
+def compare_outputs(first: Path, second: Path) -> list:
+    """Возвращает список частей пакета, различающихся по содержимому"""
+    with zipfile.ZipFile(first) as a, zipfile.ZipFile(second) as b:
+        names = set(a.namelist()) | set(b.namelist())
+        return sorted(
+            name for name in names
+            if name not in a.namelist() or name not in b.namelist()
+            or _canonical(name, a.read(name)) != _canonical(name, b.read(name))
+        )
+
+
+def measure(engine: str, template: Path, workdir: Path, iterations: int) -> dict:
+    render = ENGINES[engine]
+    render(SAMPLE_DATA, str(template), str(workdir / f'warmup_{engine}.docx'))
+
+    started = time.perf_counter()
+    for i in range(iterations):
+        render(SAMPLE_DATA, str(template), str(workdir / f'{engine}_{i}.docx'))
+    elapsed = time.perf_counter() - started
+    return {
+        'engine': engine,
+        'iterations': iterations,
+        'seconds': round(elapsed, 4),
+        'docs_per_sec': round(iterations / elapsed, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--template', type=Path, default=DEFAULT_TEMPLATE)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        reference = {engine: workdir / f'reference_{engine}.docx' for engine in ENGINES}
+        for engine, path in reference.items():
+            ENGINES[engine](SAMPLE_DATA, str(args.template), str(path))
+
+        differences = compare_outputs(reference['docx'], reference['ooxml'])
+        if differences:
+            print(f"Содержимое движков различается: {differences}")
+            sys.exit(1)
+        print("Содержимое документов совпадает")
+
+        results = [measure(engine, args.template, workdir, args.iterations) for engine in ENGINES]
+
+    for result in results:
+        print(f"{result['engine']:<6} {result['docs_per_sec']:>8.2f} док/с")
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
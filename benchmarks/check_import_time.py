@@ -0,0 +1,105 @@
+"""
+Проверка времени запуска приложения
+
+В свежем процессе замеряется импорт backend.app и вызов create_app, как
+при холодном старте воркера. Проверка не проходит (код выхода 1), если
+медиана по нескольким запускам больше бюджета или после запуска
+загружены тяжелые зависимости, которые должны импортироваться лениво.
+Самые дорогие импорты берутся из python -X importtime.
+
+Запуск:
+    python benchmarks/check_import_time.py --budget-ms 1000 --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Модули, которых не должно быть в памяти сразу после create_app
+LAZY_MODULES = ('pandas', 'openpyxl', 'docx', 'celery.app', 'alembic', 'pydantic', 'uno', 'boto3')
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from backend.app import create_app
+create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    'startup_ms': round(elapsed * 1000, 1),
+    'loaded': [name for name in %r if name in sys.modules],
+}))
+""" % (LAZY_MODULES,)
+
+
+def run_probe(workdir: str, importtime: bool = False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE]
+    # Папки приложения и журнал создаются во временной директории
+    env = dict(os.environ, PYTHONPATH=str(ROOT), LOG_FOLDER=os.path.join(workdir, 'logs'),
+               UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+               TEMPLATE_FOLDER=os.path.join(workdir, 'templates'),
+               OUTPUT_FOLDER=os.path.join(workdir, 'output'),
+               WORK_FOLDER=os.path.join(workdir, 'work'),
+               RESULT_CACHE_FOLDER=os.path.join(workdir, 'cache'))
+    completed = subprocess.run(command, cwd=workdir, env=env, check=True,
+                               capture_output=True, text=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr
+
+
+def top_imports(importtime_log: str, limit: int):
+    """Самые дорогие импорты первых двух уровней вложенности по накопленному времени"""
+    entries = []
+    for line in importtime_log.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Каждый уровень вложенности добавляет два пробела отступа
+        if name.startswith('     '):
+            continue
+        entries.append((int(cumulative) / 1000, name.strip()))
+    return sorted(entries, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--budget-ms', type=float,
+                        default=float(os.getenv('IMPORT_TIME_BUDGET_MS', 1000)))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='сколько самых дорогих импортов показать')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Первый запуск прогревает кэш байткода и не учитывается
+        run_probe(workdir)
+        results = [run_probe(workdir)[0] for _ in range(args.runs)]
+        _, importtime_log = run_probe(workdir, importtime=True)
+
+    median_ms = statistics.median(result['startup_ms'] for result in results)
+    loaded = sorted({name for result in results for name in result['loaded']})
+
+    print(f"Запуск приложения: медиана {median_ms:.1f} мс (бюджет {args.budget_ms:.0f} мс), "
+          f"запуски: {', '.join(str(result['startup_ms']) for result in results)}")
+    print("Самые дорогие импорты:")
+    for cumulative_ms, name in top_imports(importtime_log, args.top):
+        print(f"  {cumulative_ms:>8.1f} мс  {name}")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"время запуска {median_ms:.1f} мс больше бюджета {args.budget_ms:.0f} мс")
+    if loaded:
+        failures.append(f"при запуске загружены модули, которые должны импортироваться лениво: {', '.join(loaded)}")
+    if failures:
+        print("Регрессия времени запуска:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("Время запуска в пределах бюджета")
+
+
+if __name__ == '__main__':
+    main()
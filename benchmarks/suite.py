@@ -0,0 +1,293 @@
+"""
+Набор бенчмарков конвейера Excel -> Word с сравнением с базовой линией
+
+Синтетические сметы строятся из тестовой книги tests/Estimation_WMS.xlsx:
+к ней добавляются лист service_list с ячейками из конфигурации, лист
+estimate на заданное число строк и копии листа калькулятора. Каждый
+сценарий выполняется в отдельном процессе, чтобы пиковый RSS не смешивался:
+
+    process_excel        - извлечение данных по плану
+    validate_excel_data  - проверка листа estimate
+    generate_word_docx   - генерация документа движком python-docx
+    generate_word_ooxml  - генерация документа прямой записью OOXML
+    create_proposal      - POST /api/create-proposal через тестовый клиент
+                           Flask до статуса completed
+
+Для каждого сценария записываются пропускная способность, p50/p95 и
+пиковый RSS. Если есть базовая линия, результаты сравниваются с ней, и
+при регрессии больше допуска скрипт завершается с кодом 1.
+
+Базовая линия зависит от машины, поэтому в репозиторий не входит: ее
+записывают на агенте CI (или локально) с теми же параметрами, с которыми
+потом сравнивают. В режиме --ci (включается и переменной окружения CI)
+отсутствие базовой линии или другие параметры прогона - тоже код 1, а не
+молча пропущенное сравнение.
+
+Запуск:
+    python benchmarks/suite.py --rows 5000 --sheets 3 --iterations 20
+    python benchmarks/suite.py --update-baseline
+    python benchmarks/suite.py --ci --baseline /var/cache/bench/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_excel_extraction import SAMPLE_CONFIG  # noqa: E402
+
+FIXTURE_WORKBOOK = ROOT / 'tests' / 'Estimation_WMS.xlsx'
+FIXTURE_TEMPLATE = ROOT / 'tests' / 'CP_WMS.docx'
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+
+CASES = (
+    'process_excel',
+    'validate_excel_data',
+    'generate_word_docx',
+    'generate_word_ooxml',
+    'create_proposal',
+)
+
+
+def build_workbook(path: Path, rows: int, sheets: int):
+    """Создает смету из тестовой книги: service_list, estimate на rows строк и sheets копий калькулятора"""
+    workbook = load_workbook(FIXTURE_WORKBOOK)
+
+    service_list = workbook.create_sheet('service_list')
+    for key, address in SAMPLE_CONFIG[0]['data_mapping'].items():
+        service_list[address] = f"{key}-value" if 'deadline' in key else 1000.5
+
+    estimate = workbook.create_sheet('estimate')
+    estimate.append(['name', 'price', 'quantity'])
+    for row in range(rows):
+        estimate.append([f"Позиция {row}", row * 1.5 + 1, row % 7 + 1])
+
+    calculator = workbook.worksheets[min(2, len(workbook.worksheets) - 1)]
+    for index in range(sheets):
+        workbook.copy_worksheet(calculator).title = f"{calculator.title} {index + 2}"
+
+    workbook.save(path)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def timed(func, iterations):
+    """Прогрев и замер: список длительностей в секундах"""
+    func()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def prepare_case(case: str, workdir: Path):
+    """Возвращает функцию одной итерации сценария"""
+    workbook = workdir / 'estimate.xlsx'
+    config_path = workdir / 'config.json'
+
+    if case == 'create_proposal':
+        return prepare_route(workdir, workbook, config_path)
+
+    from backend.excel_reader import ExtractionPlan
+    from backend.utils import generate_word, process_excel, validate_excel_data
+
+    plan = ExtractionPlan.compile(SAMPLE_CONFIG)
+    if case == 'process_excel':
+        return lambda: process_excel(str(workbook), plan)
+
+    if case == 'validate_excel_data':
+        import pandas as pd
+        df = pd.read_excel(workbook, sheet_name='estimate')
+        return lambda: validate_excel_data(df)
+
+    data = process_excel(str(workbook), plan)
+    engine = case.rsplit('_', 1)[1]
+    output = workdir / f"proposal_{engine}.docx"
+    return lambda: generate_word(data, str(FIXTURE_TEMPLATE), str(output), engine=engine)
+
+
+def prepare_route(workdir: Path, workbook: Path, config_path: Path):
+    """Приложение с SQLite во временной папке, локальной очередью и без кэша результатов"""
+    template_folder = workdir / 'templates'
+    template_folder.mkdir(exist_ok=True)
+    shutil.copyfile(FIXTURE_TEMPLATE, template_folder / 'template.docx')
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{workdir / 'bench.db'}",
+        'SECRET_KEY': 'bench',
+        'JWT_SECRET_KEY': 'bench',
+        'UPLOAD_FOLDER': str(workdir / 'uploads'),
+        'OUTPUT_FOLDER': str(workdir / 'output'),
+        'TEMPLATE_FOLDER': str(template_folder),
+        'EXTRACTION_CONFIG': str(config_path),
+        'JOB_QUEUE_BACKEND': 'local',
+        'RESULT_CACHE_ENABLED': 'false',
+    })
+
+    from backend.app import create_app
+    from backend.models import User, db
+
+    app = create_app({'LOG_FOLDER': str(workdir / 'logs')})
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+        token = user.generate_token()
+
+    client = app.test_client()
+    headers = {'Authorization': f"Bearer {token}"}
+    payload = workbook.read_bytes()
+
+    def create_proposal():
+        response = client.post(
+            '/api/create-proposal',
+            data={'file': (BytesIO(payload), 'estimate.xlsx')},
+            headers=headers,
+            content_type='multipart/form-data'
+        )
+        job = response.get_json()
+        if response.status_code not in (200, 202):
+            raise RuntimeError(f"create-proposal: {response.status_code} {job}")
+        # Ждем завершения задания: замер охватывает весь конвейер
+        status_url = job['status_url']
+        while job['status'] not in ('completed', 'error'):
+            time.sleep(0.005)
+            job = client.get(status_url, headers=headers).get_json()
+        if job['status'] != 'completed':
+            raise RuntimeError(f"Задание завершилось с ошибкой: {job}")
+
+    return create_proposal
+
+
+def measure(case: str, workdir: Path, iterations: int) -> dict:
+    """Замер сценария в текущем процессе; вызывается из дочернего процесса"""
+    run = prepare_case(case, workdir)
+    timings = timed(run, iterations)
+    # ru_maxrss в Linux измеряется в килобайтах
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'iterations': iterations,
+        'throughput_per_sec': round(iterations / sum(timings), 3),
+        'p50_ms': round(statistics.median(timings) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'peak_rss_mb': round(peak_rss_kb / 1024, 1),
+    }
+
+
+def run_isolated(case: str, workdir: Path, iterations: int) -> dict:
+    output = subprocess.run(
+        [sys.executable, __file__, '--measure', case, str(workdir), '--iterations', str(iterations)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Список регрессий: медленнее, меньше пропускная способность или больше памяти"""
+    regressions = []
+    for case, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(case)
+        if not previous:
+            continue
+        checks = (
+            ('p50_ms', current['p50_ms'] > previous['p50_ms'] * (1 + tolerance)),
+            ('p95_ms', current['p95_ms'] > previous['p95_ms'] * (1 + tolerance)),
+            ('throughput_per_sec',
+             current['throughput_per_sec'] < previous['throughput_per_sec'] / (1 + tolerance)),
+            ('peak_rss_mb', current['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + tolerance)),
+        )
+        for metric, regressed in checks:
+            if regressed:
+                regressions.append(f"{case}.{metric}: {previous[metric]} -> {current[metric]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=5000, help='строк на листе estimate')
+    parser.add_argument('--sheets', type=int, default=3, help='дополнительных копий листа калькулятора')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    parser.add_argument('--output', type=Path, help='куда записать результаты в JSON')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.2, help='допустимое ухудшение, доля')
+    parser.add_argument('--update-baseline', action='store_true', help='записать результаты как базовую линию')
+    parser.add_argument('--ci', action='store_true', default=bool(os.getenv('CI')),
+                        help='без базовой линии или с другими параметрами завершаться с кодом 1')
+    parser.add_argument('--measure', nargs=2, metavar=('CASE', 'WORKDIR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        case, workdir = args.measure
+        print(json.dumps(measure(case, Path(workdir), args.iterations)))
+        return
+
+    results = {
+        'params': {'rows': args.rows, 'sheets': args.sheets, 'iterations': args.iterations},
+        'environment': {'python': platform.python_version(), 'machine': platform.machine(),
+                        'cpu_count': os.cpu_count()},
+        'cases': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        build_workbook(workdir / 'estimate.xlsx', args.rows, args.sheets)
+        (workdir / 'config.json').write_text(json.dumps(SAMPLE_CONFIG), encoding='utf-8')
+
+        for case in args.cases:
+            result = run_isolated(case, workdir, args.iterations)
+            results['cases'][case] = result
+            print(f"{case:<22} {result['throughput_per_sec']:>9.2f}/с  p50 {result['p50_ms']:>9.2f} мс  "
+                  f"p95 {result['p95_ms']:>9.2f} мс  {result['peak_rss_mb']:>7.1f} MB")
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output:
+        args.output.write_text(text + '\n', encoding='utf-8')
+    if args.update_baseline:
+        args.baseline.write_text(text + '\n', encoding='utf-8')
+        print(f"Базовая линия сохранена: {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        if args.ci:
+            print(f"Базовая линия не найдена ({args.baseline}); запишите ее через --update-baseline")
+            sys.exit(1)
+        print(f"Базовая линия не найдена ({args.baseline}), сравнение пропущено")
+        return
+
+    baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+    if baseline.get('params') != results['params']:
+        print(f"Параметры базовой линии отличаются: {baseline.get('params')}")
+        if args.ci:
+            sys.exit(1)
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("Регрессии производительности:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("Регрессий относительно базовой линии нет")
+
+
+if __name__ == '__main__':
+    main()
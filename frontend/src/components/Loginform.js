@@ -38,7 +38,8 @@ function LoginForm() {
             } else { // Переход на экран №2
                 const data = await response.json(); // Get data from successful response
                 // Store token or user data in local storage or context
-                localStorage.setItem('user', JSON.stringify(data));
+                localStorage.setItem('user', JSON.stringify(data.user));
+                localStorage.setItem('token', data.token); // Используется api.js для заголовка Authorization
                 window.location.href = '/dashboard'; // Не забыть заменить /login и /dashboard на ваши реальные конечные точки API.
             }
         } catch (error) {
@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { proposalService } from '../services/api';
+import { proposalService, streamEvents } from '../services/api';
 import { useDropzone } from 'react-dropzone';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
@@ -65,6 +65,35 @@ const UploadForm = ({ onUploadSuccess }) => {
         }
     };
 
+    // Ожидание завершения задания через поток событий; при обрыве потока - опрос статуса
+    const waitForProposal = async (jobId, interval = 1000) => {
+        let finalEvent = null;
+        try {
+            await streamEvents(`/proposals/${jobId}/events`, (event) => {
+                if (event.progress !== null && event.progress !== undefined) {
+                    setUploadProgress(event.progress);
+                }
+                if (event.status === 'completed' || event.status === 'error') {
+                    finalEvent = event;
+                }
+            });
+        } catch (err) {
+            console.error("Поток событий недоступен: ", err);
+        }
+        if (finalEvent && finalEvent.file_url) {
+            return finalEvent;
+        }
+
+        for (;;) {
+            const response = await axios.get(`/api/proposals/${jobId}/status`);
+            const { status } = response.data;
+            if (status === 'completed' || status === 'error') {
+                return response.data;
+            }
+            await new Promise(resolve => setTimeout(resolve, interval));
+        }
+    };
+
     // Функция создания коммерческого предложения
     const createCommercialProposal = async (file) => {
         const formData = new FormData();
@@ -72,15 +101,23 @@ const UploadForm = ({ onUploadSuccess }) => {
         
         try {
             const response = await axios.post('/api/create-proposal', formData);
-        
-            if (response.data.success) {
+            if (!response.data.success) {
+                throw new Error(response.data.error);
+            }
+
+            // Запрос возвращает id задания сразу, документ создается в очереди;
+            // для уже обработанного файла результат приходит сразу из кэша
+            const job = response.data.status === 'completed'
+                ? response.data
+                : await waitForProposal(response.data.job_id);
+            if (job.status === 'completed') {
                 // Автоматическое скачивание файла
                 const link = document.createElement('a');
-                link.href = response.data.file_url;
+                link.href = job.file_url;
                 link.click();
-                return response.data;
+                return job;
             } else {
-                throw new Error(response.data.error);
+                throw new Error('Ошибка при создании документа');
             }
         } catch (err) {
             console.error("Ошибка: ", err);
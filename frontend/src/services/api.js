@@ -26,6 +26,42 @@ api.interceptors.response.use(
     }
 );
 
+// Подписка на поток Server-Sent Events. EventSource не умеет передавать
+// заголовок Authorization, поэтому поток читается через fetch
+export const streamEvents = async (url, onEvent, signal) => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(`/api${url}`, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+        signal
+    });
+    if (!response.ok) {
+        throw new Error(`Ошибка подписки на события: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        const messages = buffer.split('\n\n');
+        buffer = messages.pop();
+        messages.forEach(message => {
+            const data = message
+                .split('\n')
+                .filter(line => line.startsWith('data: '))
+                .map(line => line.slice(6))
+                .join('\n');
+            if (data) {
+                onEvent(JSON.parse(data));
+            }
+        });
+    }
+};
+
 export const proposalService = {
     // Создание коммерческого предложения
     createProposal: async (file) => {
@@ -35,9 +71,35 @@ export const proposalService = {
         return response.data;
     },
 
-    // Получение списка предложений
-    getProposals: async (page = 1, perPage = 10) => {
-        const response = await api.get(`/proposals?page=${page}&per_page=${perPage}`);
+    // Пакетное создание предложений: несколько смет или zip-архив
+    createProposalsBatch: async (files, { mode = 'files', format = 'zip' } = {}) => {
+        const formData = new FormData();
+        files.forEach(file => formData.append('files', file));
+        formData.append('mode', mode);
+        const response = await api.post(`/proposals/batch?format=${format}`, formData, {
+            responseType: format === 'zip' ? 'blob' : 'json'
+        });
+        return response.data;
+    },
+
+    // Статус задания на создание предложения
+    getProposalStatus: async (jobId) => {
+        const response = await api.get(`/proposals/${jobId}/status`);
+        return response.data;
+    },
+
+    // Детальный просмотр предложения с извлеченными данными
+    getProposal: async (proposalId) => {
+        const response = await api.get(`/proposals/${proposalId}`);
+        return response.data;
+    },
+
+    // Получение списка предложений: следующая страница запрашивается по next_cursor
+    getProposals: async (cursor = null, perPage = 10, includeTotal = false) => {
+        const params = { per_page: perPage };
+        if (cursor) params.cursor = cursor;
+        if (includeTotal) params.include_total = true;
+        const response = await api.get('/proposals', { params });
         return response.data;
     },
 
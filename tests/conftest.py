@@ -0,0 +1,121 @@
+import io
+import json
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+from backend.app import create_app
+from backend.models import User, db
+
+FIXTURES = Path(__file__).parent
+ESTIMATE = FIXTURES / 'Estimation_WMS.xlsx'
+TEMPLATE = FIXTURES / 'CP_WMS.docx'
+
+EXTRACTION_CONFIG = [
+    {
+        'sheet_name': 'Резюме_Проекта',
+        'data_mapping': {
+            'services': 'C2',
+            'software': 'C3',
+            'total': 'C8',
+            'total_tax': 'D8'
+        }
+    }
+]
+
+
+def make_config(root: Path, **overrides):
+    """Конфигурация приложения с SQLite и папками внутри root"""
+    template_folder = root / 'templates'
+    template_folder.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(TEMPLATE, template_folder / 'template.docx')
+    config_path = root / 'config.json'
+    config_path.write_text(json.dumps(EXTRACTION_CONFIG, ensure_ascii=False), encoding='utf-8')
+
+    config = {
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{root / 'test.db'}",
+        'SECRET_KEY': 'test',
+        'JWT_SECRET_KEY': 'test',
+        'PASSWORD_HASH_ITERATIONS': 1000,
+        'UPLOAD_FOLDER': str(root / 'uploads'),
+        'OUTPUT_FOLDER': str(root / 'output'),
+        'WORK_FOLDER': str(root / 'work'),
+        'TEMPLATE_FOLDER': str(template_folder),
+        'RESULT_CACHE_FOLDER': str(root / 'cache'),
+        'LOG_FOLDER': str(root / 'logs'),
+        'EXTRACTION_CONFIG': str(config_path),
+        'JOB_QUEUE_BACKEND': 'local',
+        'OUTPUT_SWEEP_INTERVAL': 0,
+        'PROGRESS_STREAM_TIMEOUT': 1,
+    }
+    config.update(overrides)
+    return config
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    """Переопределения конфигурации; тесты модуля могут подменить фикстуру"""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    app = create_app(make_config(tmp_path, **app_config))
+    with app.app_context():
+        db.create_all()
+    yield app
+    # Дожидаемся фоновых заданий, пока база и папки еще на месте
+    app.extensions['job_queue'].executor.shutdown(wait=True)
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Создает пользователя и возвращает заголовки с его токеном"""
+    def make_user(username: str, role: str = 'user') -> dict:
+        with app.app_context():
+            user = User(username=username, email=f"{username}@example.com", role=role)
+            user.set_password(username)
+            db.session.add(user)
+            db.session.commit()
+            return {'Authorization': f"Bearer {user.generate_token()}"}
+    return make_user
+
+
+@pytest.fixture
+def auth_headers(make_user):
+    return make_user('manager')
+
+
+@pytest.fixture
+def create_proposal(client, auth_headers):
+    """Отправляет смету и ждет завершения задания; возвращает итоговый статус"""
+    def create_proposal(payload: bytes = None, headers: dict = None, filename: str = 'estimate.xlsx'):
+        headers = headers or auth_headers
+        response = client.post(
+            '/api/create-proposal',
+            data={'file': (io.BytesIO(payload or ESTIMATE.read_bytes()), filename)},
+            headers=headers,
+            content_type='multipart/form-data'
+        )
+        job = response.get_json()
+        assert response.status_code in (200, 202), job
+        status_url = job['status_url']
+        deadline = time.monotonic() + 30
+        while True:
+            job = client.get(status_url, headers=headers).get_json()
+            if job['status'] in ('completed', 'error'):
+                return job
+            assert time.monotonic() < deadline, job
+            time.sleep(0.01)
+    return create_proposal
@@ -0,0 +1,134 @@
+import time
+
+import pytest
+from sqlalchemy import event
+
+from backend.middleware import auth
+from backend.middleware.auth import AuthenticatedUser, TokenCache
+from backend.models import User, db
+
+ALICE = AuthenticatedUser(id=1, username='alice', role='user', is_active=True)
+BOB = AuthenticatedUser(id=2, username='bob', role='admin', is_active=True)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время time.monotonic для проверки TTL"""
+    now = [1000.0]
+    monkeypatch.setattr(auth.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = TokenCache(ttl=60)
+    cache.put('a', ALICE)
+
+    clock[0] += 59
+    assert cache.get('a') == ALICE
+    clock[0] += 2
+    assert cache.get('a') is None
+
+
+def test_entry_does_not_outlive_token(clock):
+    cache = TokenCache(ttl=60)
+    cache.put('a', ALICE, token_exp=time.time() + 10)
+    cache.put('b', ALICE, token_exp=time.time() - 1)
+
+    clock[0] += 11
+    assert cache.get('a') is None
+    assert cache.get('b') is None
+
+
+def test_least_recently_used_is_evicted():
+    cache = TokenCache(ttl=60, max_size=2)
+    cache.put('a', ALICE)
+    cache.put('b', BOB)
+    cache.get('a')
+
+    cache.put('c', BOB)
+
+    assert cache.get('a') == ALICE
+    assert cache.get('b') is None
+    assert cache.get('c') == BOB
+
+
+def test_invalidate_user_drops_all_tokens():
+    cache = TokenCache(ttl=60)
+    cache.put('a1', ALICE)
+    cache.put('a2', ALICE)
+    cache.put('b', BOB)
+
+    cache.invalidate_user(ALICE.id)
+
+    assert cache.get('a1') is None and cache.get('a2') is None
+    assert cache.get('b') == BOB
+
+
+def test_zero_ttl_disables_cache():
+    cache = TokenCache(ttl=0)
+    cache.put('a', ALICE)
+
+    assert cache.get('a') is None
+
+
+@pytest.fixture
+def user_queries(app):
+    """Счетчик запросов SELECT к таблице user"""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and 'FROM user' in statement:
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', count)
+
+
+def _set_user(app, **values):
+    with app.app_context():
+        user = User.query.filter_by(username='manager').one()
+        for name, value in values.items():
+            setattr(user, name, value)
+        db.session.commit()
+
+
+def test_repeated_requests_skip_user_lookup(client, auth_headers, user_queries):
+    assert client.get('/api/proposals', headers=auth_headers).status_code == 200
+    assert len(user_queries) == 1
+
+    for _ in range(3):
+        assert client.get('/api/proposals', headers=auth_headers).status_code == 200
+    assert len(user_queries) == 1
+
+
+def test_blocking_user_invalidates_cached_token(app, client, auth_headers):
+    assert client.get('/api/proposals', headers=auth_headers).status_code == 200
+
+    _set_user(app, is_active=False)
+
+    assert client.get('/api/proposals', headers=auth_headers).status_code == 401
+
+
+def test_role_change_is_seen_immediately(app, client, auth_headers):
+    assert client.get('/api/cache/stats', headers=auth_headers).status_code == 403
+
+    _set_user(app, role='admin')
+
+    assert client.get('/api/cache/stats', headers=auth_headers).status_code == 200
+
+
+@pytest.mark.parametrize('app_config', [{'AUTH_CACHE_TTL': 0}])
+def test_disabled_cache_loads_user_every_time(client, auth_headers, user_queries):
+    for _ in range(3):
+        assert client.get('/api/proposals', headers=auth_headers).status_code == 200
+
+    assert len(user_queries) == 3
+
+
+def test_invalid_token_is_rejected(client):
+    response = client.get('/api/proposals', headers={'Authorization': 'Bearer not-a-token'})
+
+    assert response.status_code == 401
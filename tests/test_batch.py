@@ -0,0 +1,158 @@
+import io
+import zipfile
+from pathlib import Path
+
+import openpyxl
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from backend import batch
+from backend.batch import BatchResult, collect_workbooks, write_archive
+from backend.models import ProposalHistory
+
+ESTIMATE = Path(__file__).parent / 'Estimation_WMS.xlsx'
+
+
+def _upload(name, payload=b'xlsx'):
+    return FileStorage(stream=io.BytesIO(payload), filename=name)
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, payload in members.items():
+            archive.writestr(name, payload)
+    return buffer.getvalue()
+
+
+def test_collect_workbooks_keeps_only_excel(tmp_path):
+    uploads = [_upload('first.xlsx', b'one'), _upload('notes.txt'), _upload('second.XLS', b'two')]
+
+    workbooks = collect_workbooks(uploads, tmp_path, 10)
+
+    assert [name for _, name in workbooks] == ['first.xlsx', 'second.XLS']
+    assert [path.read_bytes() for path, _ in workbooks] == [b'one', b'two']
+    assert len({path for path, _ in workbooks}) == 2
+
+
+def test_collect_workbooks_from_zip(tmp_path):
+    archive = _zip({
+        'clients/a.xlsx': b'a',
+        'clients/': b'',
+        '../../escape.xlsx': b'b',
+        'readme.txt': b'text',
+    })
+
+    workbooks = collect_workbooks([_upload('batch.zip', archive)], tmp_path, 10)
+
+    # Пути внутри архива отбрасываются: файлы остаются в папке пакета
+    assert [name for _, name in workbooks] == ['a.xlsx', 'escape.xlsx']
+    assert all(path.parent == tmp_path for path, _ in workbooks)
+    assert [path.read_bytes() for path, _ in workbooks] == [b'a', b'b']
+
+
+@pytest.mark.parametrize('uploads, message', [
+    ([_upload('notes.txt')], 'Не найдено'),
+    ([_upload(f"{index}.xlsx") for index in range(3)], 'максимум 2'),
+])
+def test_collect_workbooks_errors(tmp_path, uploads, message):
+    with pytest.raises(ValueError, match=message):
+        collect_workbooks(uploads, tmp_path, 2)
+
+
+def test_write_archive_stores_completed_documents(tmp_path):
+    done = tmp_path / 'proposal_1.docx'
+    done.write_bytes(b'PK document')
+    results = [
+        BatchResult(index=0, name='a.xlsx', status='completed', output_path=str(done)),
+        BatchResult(index=1, name='b.xlsx', status='error', error='Ошибка'),
+    ]
+    archive = io.BytesIO()
+
+    assert write_archive(results, archive) == 1
+
+    with zipfile.ZipFile(archive) as target:
+        assert target.namelist() == ['proposal_1.docx']
+        assert target.getinfo('proposal_1.docx').compress_type == zipfile.ZIP_STORED
+        assert target.read('proposal_1.docx') == b'PK document'
+
+
+@pytest.fixture
+def app_config():
+    return {'BATCH_MAX_ITEMS': 3, 'BATCH_MAX_WORKERS': 2}
+
+
+@pytest.fixture
+def post_batch(client, auth_headers):
+    def post_batch(files, query='', **form):
+        return client.post(
+            f"/api/proposals/batch{query}",
+            data=dict(form, files=[(io.BytesIO(payload), name) for name, payload in files]),
+            headers=auth_headers,
+            content_type='multipart/form-data'
+        )
+    yield post_batch
+    batch.shutdown_executor()
+
+
+def test_batch_returns_archive(app, post_batch):
+    estimate = ESTIMATE.read_bytes()
+
+    response = post_batch([('first.xlsx', estimate), ('clients.zip', _zip({'second.xlsx': estimate}))])
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        names = archive.namelist()
+        assert len(names) == 2
+        assert all(archive.read(name).startswith(b'PK') for name in names)
+    with app.app_context():
+        proposals = ProposalHistory.query.order_by(ProposalHistory.id).all()
+        assert [p.original_filename for p in proposals] == ['first.xlsx', 'second.xlsx']
+        assert all(p.is_completed and p.file_path for p in proposals)
+
+
+def test_batch_links_report_item_errors(client, auth_headers, post_batch):
+    response = post_batch([('good.xlsx', ESTIMATE.read_bytes()), ('broken.xlsx', b'not excel')],
+                          query='?format=links')
+
+    items = response.get_json()['items']
+    assert [item['status'] for item in items] == ['completed', 'error']
+    assert items[1]['file_url'] is None
+    assert client.get(items[0]['file_url'], headers=auth_headers).status_code == 200
+
+
+def test_batch_rows_mode(post_batch, tmp_path):
+    workbook = openpyxl.Workbook()
+    workbook.active.append(['client', 'services', 'total'])
+    workbook.active.append(['Альфа', 100, 120])
+    workbook.active.append([None, None, None])
+    workbook.active.append(['Бета', 200, 240])
+    path = tmp_path / 'clients.xlsx'
+    workbook.save(path)
+
+    response = post_batch([('clients.xlsx', path.read_bytes())], query='?format=links', mode='rows')
+
+    items = response.get_json()['items']
+    assert [(item['name'], item['status']) for item in items] == [('Альфа', 'completed'), ('Бета', 'completed')]
+
+
+def test_batch_size_is_capped(app, post_batch):
+    response = post_batch([(f"{index}.xlsx", b'xlsx') for index in range(4)])
+
+    assert response.status_code == 400
+    assert 'максимум 3' in response.get_json()['error']
+    with app.app_context():
+        assert ProposalHistory.query.count() == 0
+
+
+def test_pool_is_created_once(post_batch, monkeypatch):
+    created = []
+    make_executor = batch.make_executor
+    monkeypatch.setattr(batch, 'make_executor', lambda workers: created.append(workers) or make_executor(workers))
+
+    for _ in range(2):
+        assert post_batch([('estimate.xlsx', ESTIMATE.read_bytes())]).status_code == 200
+
+    assert created == [2]
+    assert batch.get_executor()._mp_context.get_start_method() == 'spawn'
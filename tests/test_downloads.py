@@ -0,0 +1,71 @@
+import pytest
+
+from backend.models import ProposalHistory
+from backend.routes import DOCX_MIME_TYPE
+
+
+@pytest.fixture
+def app_config(tmp_path, monkeypatch):
+    # Относительные папки, как в .env.example: считаются от текущего каталога
+    monkeypatch.chdir(tmp_path)
+    return {'UPLOAD_FOLDER': 'uploads', 'OUTPUT_FOLDER': 'output', 'WORK_FOLDER': 'work'}
+
+
+@pytest.fixture
+def proposal(create_proposal):
+    job = create_proposal()
+    assert job['status'] == 'completed'
+    return job
+
+
+def test_download_with_relative_output_folder(client, auth_headers, proposal):
+    response = client.get(proposal['file_url'], headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.data.startswith(b'PK')
+    assert response.mimetype == DOCX_MIME_TYPE
+    assert 'attachment' in response.headers['Content-Disposition']
+
+
+def test_download_by_id_is_word_document(app, client, auth_headers, proposal):
+    # Смета загружена с типом Excel, но отдается документ Word
+    with app.app_context():
+        assert ProposalHistory.query.get(proposal['job_id']).mime_type != DOCX_MIME_TYPE
+
+    response = client.get(f"/api/proposals/{proposal['job_id']}/download", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.mimetype == DOCX_MIME_TYPE
+
+
+def test_conditional_and_range_requests(client, auth_headers, proposal):
+    first = client.get(proposal['file_url'], headers=auth_headers)
+    etag = first.headers['ETag']
+
+    not_modified = client.get(proposal['file_url'], headers=dict(auth_headers, **{'If-None-Match': etag}))
+    partial = client.get(proposal['file_url'], headers=dict(auth_headers, Range='bytes=0-9'))
+
+    assert not_modified.status_code == 304
+    assert partial.status_code == 206
+    assert partial.data == first.data[:10]
+
+
+@pytest.mark.parametrize('offload, header', [('x-sendfile', 'X-Sendfile'), ('x-accel', 'X-Accel-Redirect')])
+def test_offload_headers(app, client, auth_headers, proposal, tmp_path, offload, header):
+    app.config['DOWNLOAD_OFFLOAD'] = offload
+
+    response = client.get(proposal['file_url'], headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.data == b''
+    key = proposal['file_url'].split('/api/download/', 1)[1]
+    if offload == 'x-sendfile':
+        assert response.headers[header] == str((tmp_path / 'output' / key).resolve())
+    else:
+        assert response.headers[header] == f"/protected/output/{key}"
+
+
+def test_foreign_download_is_forbidden(client, make_user, proposal):
+    response = client.get(proposal['file_url'], headers=make_user('other'))
+
+    assert response.status_code == 403
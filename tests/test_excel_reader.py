@@ -0,0 +1,136 @@
+import json
+import os
+from pathlib import Path
+
+import openpyxl
+import pandas as pd
+import pytest
+from openpyxl.styles import Font
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+
+from backend.excel_reader import ExtractionPlan, ExtractionPlanCache, extract_cells, iter_frame_chunks
+from backend.utils import async_validate_excel_file, validate_excel_data
+
+ESTIMATE = Path(__file__).parent / 'Estimation_WMS.xlsx'
+
+
+@pytest.fixture
+def estimate_with_gaps(tmp_path):
+    """Смета с пустыми строками внутри данных и оформленным пустым хвостом"""
+    path = tmp_path / 'estimate.xlsx'
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(['name', 'price', 'quantity'])
+    sheet.append(['WMS', 100, 1])
+    sheet.append([None, None, None])
+    sheet.append(['Лицензии', -5, 1])
+    sheet.append(['Поддержка', 50, 0])
+    sheet.append([None, None, None])
+    sheet.append([None, None, None])
+    sheet.append(['Обучение', 10, 1])
+    # Оформленная пустая ячейка расширяет лист: хвост из пустых строк
+    sheet['A20'].font = Font(bold=True)
+    workbook.save(path)
+    return path
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 1000])
+def test_chunks_match_read_excel(estimate_with_gaps, chunk_size):
+    expected = pd.read_excel(estimate_with_gaps)
+
+    streamed = pd.concat(list(iter_frame_chunks(str(estimate_with_gaps), chunk_size)))
+
+    assert streamed.index.tolist() == expected.index.tolist()
+    assert streamed['name'].isna().tolist() == expected['name'].isna().tolist()
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 1000])
+def test_streaming_validation_reports_same_rows(estimate_with_gaps, chunk_size):
+    expected = validate_excel_data(pd.read_excel(estimate_with_gaps))
+
+    result = async_validate_excel_file(str(estimate_with_gaps), chunk_size=chunk_size)
+
+    assert result['status'] == 'error'
+    assert result['errors'] == expected['errors']
+    assert result['total_rows'] == 7
+
+
+def test_extract_cells_matches_full_workbook():
+    config = [
+        {'sheet_name': 'Резюме_Проекта', 'data_mapping': {'total_tax': 'D8', 'services': 'c2', 'title': 'B1'}},
+        {'sheet_name': 'Лицензии', 'data_mapping': {'wms': 'E3', 'hardware': 'E11'}},
+        {'sheet_name': 'Резюме_Проекта', 'data_mapping': {'note': 'E6', 'empty': 'Z500'}},
+    ]
+    workbook = openpyxl.load_workbook(ESTIMATE, data_only=True)
+    expected = {
+        key: workbook[sheet['sheet_name']][address.upper()].value
+        for sheet in config for key, address in sheet['data_mapping'].items()
+    }
+
+    assert extract_cells(str(ESTIMATE), config) == expected
+    assert extract_cells(str(ESTIMATE), ExtractionPlan.compile(config)) == expected
+
+
+def test_extract_cells_skips_missing_sheet_and_bad_address():
+    config = [
+        {'sheet_name': 'Нет такого листа', 'data_mapping': {'missing': 'A1'}},
+        {'sheet_name': 'Резюме_Проекта', 'data_mapping': {'bad': 'not a cell', 'total': 'C8'}},
+    ]
+
+    data = extract_cells(str(ESTIMATE), config)
+
+    assert 'missing' not in data
+    assert data['bad'] is None
+    assert data['total'] == openpyxl.load_workbook(ESTIMATE, data_only=True)['Резюме_Проекта']['C8'].value
+
+
+def test_extract_cells_reads_only_up_to_last_mapped_row(monkeypatch):
+    plan = ExtractionPlan.compile([{'sheet_name': 'Резюме_Проекта', 'data_mapping': {'a': 'C8', 'b': 'B2'}}])
+    sheet_plan = plan.sheets[0]
+    ranges = []
+    iter_rows = ReadOnlyWorksheet.iter_rows
+
+    def recording_iter_rows(self, *args, **kwargs):
+        ranges.append(kwargs)
+        return iter_rows(self, *args, **kwargs)
+
+    monkeypatch.setattr(ReadOnlyWorksheet, 'iter_rows', recording_iter_rows)
+
+    extract_cells(str(ESTIMATE), plan)
+
+    assert [cell[0] for cell in sheet_plan.cells] == ['b', 'a']
+    assert ranges == [{'min_row': 2, 'max_row': 8, 'min_col': 2, 'max_col': 3, 'values_only': True}]
+
+
+def _write_config(path, address, mtime_ns):
+    path.write_text(json.dumps([{'sheet_name': 'Лист', 'data_mapping': {'total': address}}]), encoding='utf-8')
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_plan_cache_follows_config_changes(tmp_path, monkeypatch):
+    config_path = tmp_path / 'config.json'
+    _write_config(config_path, 'C8', 1_000_000_000)
+    cache = ExtractionPlanCache()
+    compiled = []
+    compile_plan = ExtractionPlan.compile.__func__
+
+    def counting_compile(cls, config, digest=''):
+        compiled.append(digest)
+        return compile_plan(cls, config, digest)
+
+    monkeypatch.setattr(ExtractionPlan, 'compile', classmethod(counting_compile))
+
+    plan = cache.get(str(config_path))
+    assert cache.get(str(config_path)) is plan
+
+    # Файл переписан тем же содержимым: план не перекомпилируется
+    _write_config(config_path, 'C8', 2_000_000_000)
+    assert cache.get(str(config_path)) is plan
+    assert len(compiled) == 1
+
+    # Другой адрес при том же размере файла: новый mtime, другой SHA-256
+    _write_config(config_path, 'D9', 3_000_000_000)
+    changed = cache.get(str(config_path))
+    assert changed.digest != plan.digest
+    assert changed.sheets[0].cells[0][1] == 'D9'
+    assert len(compiled) == 2
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.excel_validation import ValidationAccumulator, format_rows, validate_frame
+from backend.utils import validate_excel_data
+
+ESTIMATE = pd.DataFrame({
+    'name': ['WMS', None, '', 'Лицензии', 'Обучение', 'Поддержка'],
+    'price': [100, -5, 0, np.nan, '150', 2.5],
+    'quantity': [1, 2, 0, 1, 3, -1],
+})
+
+
+def _reference_errors(df):
+    """Построчная проверка, которую заменили векторные правила"""
+    def positive(value):
+        return isinstance(value, (int, float)) and value > 0
+
+    errors = []
+    for column, message in (('price', 'Неверные цены в строках'),
+                            ('quantity', 'Неверное количество в строках')):
+        rows = df.index[~df[column].apply(positive)].tolist()
+        if rows:
+            errors.append(f"{message}: {rows}")
+    rows = df.index[df['name'].isna() | (df['name'] == '')].tolist()
+    if rows:
+        errors.append(f"Пустые наименования в строках: {rows}")
+    return errors
+
+
+def test_messages_match_row_by_row_checks():
+    result = validate_excel_data(ESTIMATE)
+
+    assert result == {'is_valid': False, 'errors': _reference_errors(ESTIMATE)}
+    assert result['errors'] == [
+        'Неверные цены в строках: [1, 2, 3, 4]',
+        'Неверное количество в строках: [2, 5]',
+        'Пустые наименования в строках: [1, 2]',
+    ]
+
+
+def test_valid_frame_and_missing_columns():
+    assert validate_excel_data(ESTIMATE.iloc[[0]]) == {'is_valid': True, 'errors': []}
+    assert validate_excel_data(pd.DataFrame({'other': [None]})) == {'is_valid': True, 'errors': []}
+
+
+@pytest.mark.parametrize('rows, expected', [
+    ([1, 2, 3], '[1, 2, 3]'),
+    ([1, 2, 3, 4, 5], '[1, 2, 3] и еще 2'),
+])
+def test_long_row_lists_are_truncated(rows, expected):
+    assert format_rows(rows, max_reported=3) == expected
+
+
+def test_truncation_counts_all_invalid_rows():
+    df = pd.DataFrame({'name': ['x'] * 30, 'price': [-1] * 30, 'quantity': [1] * 30})
+
+    result = validate_frame(df, max_reported=5)
+
+    assert result['errors'] == ['Неверные цены в строках: [0, 1, 2, 3, 4] и еще 25']
+
+
+@pytest.mark.parametrize('chunk_size', [1, 4, 100])
+def test_chunked_validation_matches_whole_frame(chunk_size):
+    df = pd.concat([ESTIMATE] * 5, ignore_index=True)
+    accumulator = ValidationAccumulator(max_reported=7)
+
+    for start in range(0, len(df), chunk_size):
+        accumulator.add(df.iloc[start:start + chunk_size])
+
+    assert accumulator.result() == validate_frame(df, max_reported=7)
+    assert accumulator.total_rows == len(df)
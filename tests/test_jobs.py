@@ -0,0 +1,224 @@
+import io
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import openpyxl
+import pytest
+from sqlalchemy import event
+
+from backend import jobs
+from backend.models import ProposalHistory, db
+
+ESTIMATE = Path(__file__).parent / 'Estimation_WMS.xlsx'
+
+
+def _estimate_with_date() -> bytes:
+    """Смета, одна из ячеек которой - дата: ее значение приходит как datetime"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'Резюме_Проекта'
+    sheet['C2'] = datetime(2024, 3, 1, 12, 30)
+    sheet['C3'] = 322500
+    sheet['C8'] = 3887700
+    sheet['D8'] = 4600740
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def _files(folder, pattern='**/*.docx'):
+    return sorted(path.name for path in folder.glob(pattern))
+
+
+def test_job_stores_dates_as_strings(app, client, auth_headers, create_proposal):
+    job = create_proposal(_estimate_with_date())
+
+    assert job['status'] == 'completed'
+    proposal = client.get(f"/api/proposals/{job['job_id']}", headers=auth_headers).get_json()['proposal']
+    assert proposal['data']['services'] == '2024-03-01 12:30:00'
+
+
+@pytest.mark.parametrize('app_config', [{'PROPOSAL_DATA_STORAGE': 'compressed'}])
+def test_job_stores_dates_compressed(client, auth_headers, create_proposal):
+    job = create_proposal(_estimate_with_date())
+
+    proposal = client.get(f"/api/proposals/{job['job_id']}", headers=auth_headers).get_json()['proposal']
+    assert proposal['data']['services'] == '2024-03-01 12:30:00'
+
+
+def test_failed_commit_leaves_no_cache_entry_or_output(app, monkeypatch, tmp_path, create_proposal):
+    finish = jobs._finish
+
+    def failing_finish(proposal, status, trace):
+        if status == ProposalHistory.STATUS_COMPLETED:
+            raise RuntimeError('commit failed')
+        return finish(proposal, status, trace)
+
+    monkeypatch.setattr(jobs, '_finish', failing_finish)
+
+    job = create_proposal()
+    # Рабочая папка удаляется после записи статуса: дожидаемся конца задания
+    app.extensions['job_queue'].executor.shutdown(wait=True)
+
+    assert job['status'] == 'error'
+    assert job['proposal']['file_path'] is None
+    assert _files(tmp_path / 'cache') == []
+    assert _files(tmp_path / 'output') == []
+    assert _files(tmp_path / 'work', '**/*') == []
+
+
+def test_cache_is_filled_after_commit(app, monkeypatch, tmp_path, create_proposal):
+    committed = []
+    finish = jobs._finish
+
+    def recording_finish(proposal, status, trace):
+        finish(proposal, status, trace)
+        committed.append(_files(tmp_path / 'cache'))
+
+    monkeypatch.setattr(jobs, '_finish', recording_finish)
+
+    first = create_proposal()
+    second = create_proposal()
+
+    assert first['status'] == 'completed'
+    assert committed == [[]]
+    assert len(_files(tmp_path / 'cache')) == 1
+    assert second['status'] == 'completed'
+    assert second['proposal']['file_path'] != first['proposal']['file_path']
+
+
+@pytest.fixture
+def failing_commit(app):
+    """Следующий commit сессии завершается ошибкой (один раз)"""
+    armed = []
+
+    def fail(session):
+        if armed:
+            armed.clear()
+            raise RuntimeError('commit failed')
+
+    event.listen(db.session, 'before_commit', fail)
+    yield armed
+    event.remove(db.session, 'before_commit', fail)
+
+
+def _post_estimate(client, headers):
+    return client.post(
+        '/api/create-proposal',
+        data={'file': (io.BytesIO(ESTIMATE.read_bytes()), 'estimate.xlsx')},
+        headers=headers,
+        content_type='multipart/form-data'
+    )
+
+
+def test_failed_commit_of_cached_result_removes_output(app, client, auth_headers, tmp_path,
+                                                        create_proposal, failing_commit):
+    first = create_proposal()
+    failing_commit.append(True)
+
+    response = _post_estimate(client, auth_headers)
+
+    assert response.status_code == 500
+    assert 'commit failed' in response.get_json()['error']
+    assert _files(tmp_path / 'output') == [first['proposal']['file_path'].rsplit('/', 1)[1]]
+    with app.app_context():
+        # Несохраненная запись не вставляется заново со статусом error
+        assert [p.id for p in ProposalHistory.query.all()] == [first['job_id']]
+
+
+def test_failed_enqueue_marks_committed_job_as_error(app, client, auth_headers, monkeypatch):
+    def failing_enqueue(*args):
+        raise RuntimeError('queue unavailable')
+
+    monkeypatch.setattr(app.extensions['job_queue'], 'enqueue', failing_enqueue)
+
+    response = _post_estimate(client, auth_headers)
+
+    assert response.status_code == 500
+    assert 'queue unavailable' in response.get_json()['error']
+    with app.app_context():
+        assert [p.status for p in ProposalHistory.query.all()] == [ProposalHistory.STATUS_ERROR]
+    assert list(Path(app.config['UPLOAD_FOLDER']).iterdir()) == []
+
+
+def test_job_status_transitions(app, client, auth_headers, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    process_excel = jobs.process_excel
+
+    def blocking_process_excel(*args):
+        started.set()
+        assert release.wait(10)
+        return process_excel(*args)
+
+    monkeypatch.setattr(jobs, 'process_excel', blocking_process_excel)
+
+    response = _post_estimate(client, auth_headers)
+    job = response.get_json()
+    assert response.status_code == 202
+    assert job['status'] == ProposalHistory.STATUS_CREATED
+
+    assert started.wait(10)
+    running = client.get(job['status_url'], headers=auth_headers).get_json()
+    assert (running['status'], running['stage']) == (ProposalHistory.STATUS_PROCESSING, 'extract')
+    assert 'file_url' not in running
+    with app.app_context():
+        # Промежуточная стадия в БД не пишется
+        assert ProposalHistory.query.get(job['job_id']).status == ProposalHistory.STATUS_CREATED
+
+    release.set()
+    app.extensions['job_queue'].executor.shutdown(wait=True)
+    done = client.get(job['status_url'], headers=auth_headers).get_json()
+    assert done['status'] == ProposalHistory.STATUS_COMPLETED
+    assert done['file_url'] == f"/api/download/{done['proposal']['file_path']}"
+
+
+def test_job_with_unreadable_workbook_ends_in_error(create_proposal):
+    job = create_proposal(b'not an excel workbook')
+
+    assert job['status'] == ProposalHistory.STATUS_ERROR
+    assert 'file_url' not in job
+
+
+def test_job_status_is_private(client, auth_headers, make_user, create_proposal):
+    job = create_proposal()
+
+    status_url = f"/api/proposals/{job['job_id']}/status"
+
+    assert client.get(status_url, headers=make_user('other')).status_code == 403
+    assert client.get('/api/proposals/999/status', headers=auth_headers).status_code == 404
+
+
+@pytest.fixture
+def commits(app):
+    """Состояния предложений в момент каждого commit"""
+    recorded = []
+
+    def record(session):
+        # Запись к этому моменту уже может быть сброшена в БД через flush
+        for instance in list(session.identity_map.values()) + list(session.new):
+            if isinstance(instance, ProposalHistory):
+                recorded.append((instance.status, instance.file_path))
+
+    event.listen(db.session, 'before_commit', record)
+    yield recorded
+    event.remove(db.session, 'before_commit', record)
+
+
+def test_lifecycle_takes_two_commits(app, create_proposal, commits):
+    job = create_proposal()
+    app.extensions['job_queue'].executor.shutdown(wait=True)
+
+    # Запрос сохраняет created, задание - итоговый статус вместе с файлом
+    assert commits == [
+        (ProposalHistory.STATUS_CREATED, None),
+        (ProposalHistory.STATUS_COMPLETED, job['proposal']['file_path']),
+    ]
+    assert job['proposal']['processing_time'] is not None
+
+
+def test_failed_job_takes_two_commits(app, create_proposal, commits):
+    create_proposal(b'not an excel workbook')
+    app.extensions['job_queue'].executor.shutdown(wait=True)
+
+    assert commits == [(ProposalHistory.STATUS_CREATED, None), (ProposalHistory.STATUS_ERROR, None)]
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import inspect
+
+from backend.models import db
+
+try:
+    import flask_migrate
+except ImportError:
+    # Alembic, несовместимый с установленным SQLAlchemy, падает уже при импорте
+    pytest.skip('Alembic недоступен', allow_module_level=True)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / 'backend' / 'migrations'
+
+
+@pytest.fixture
+def migrated_app(app):
+    flask_migrate.Migrate(app, db, directory=str(MIGRATIONS_DIR))
+    with app.app_context():
+        # Схему создают миграции, а не db.create_all() фикстуры app
+        db.drop_all()
+    return app
+
+
+def _schema():
+    inspector = inspect(db.engine)
+    return {
+        table: {column['name'] for column in inspector.get_columns(table)}
+        for table in inspector.get_table_names() if table != 'alembic_version'
+    }
+
+
+def test_upgrade_head_matches_models(migrated_app):
+    with migrated_app.app_context():
+        flask_migrate.upgrade()
+
+        assert _schema() == {
+            table.name: {column.name for column in table.columns}
+            for table in db.metadata.sorted_tables
+        }
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes('proposal_history')}
+        assert {'idx_proposal_user_created', 'idx_proposal_file_path'} <= indexes
+        assert 'idx_proposal_user' not in indexes
+
+
+def test_downgrade_base_removes_schema(migrated_app):
+    with migrated_app.app_context():
+        flask_migrate.upgrade()
+        flask_migrate.downgrade(revision='base')
+
+        assert _schema() == {}
+
+        # Цепочка проходится заново после полного отката
+        flask_migrate.upgrade()
+        assert 'proposal_payload' in _schema()
@@ -0,0 +1,149 @@
+import errno
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from backend import object_storage
+from backend.object_storage import LocalObjectStore, S3Connection, S3ObjectStore
+from backend.routes import DOCX_MIME_TYPE
+
+BUCKET = 'logistics-cp'
+PAYLOAD = bytes(range(256)) * 4096  # 1 МБ: несколько порций CHUNK_SIZE
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    with mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        yield
+
+
+@pytest.fixture(params=['local', 's3'])
+def store(request, tmp_path):
+    if request.param == 'local':
+        return LocalObjectStore(tmp_path / 'store')
+    request.getfixturevalue('aws')
+    connection = S3Connection(region='us-east-1')
+    return S3ObjectStore(connection, BUCKET, 'output/', scratch_dir=tmp_path / 'scratch')
+
+
+def _source(tmp_path, payload=PAYLOAD):
+    path = tmp_path / 'source.docx'
+    path.write_bytes(payload)
+    return path
+
+
+def test_store_and_read_back(store, tmp_path):
+    source = _source(tmp_path)
+
+    store.store_file('2026/10/cp.docx', source)
+
+    assert not source.exists()
+    stored = store.stat('2026/10/cp.docx')
+    assert stored.size == len(PAYLOAD)
+    assert b''.join(store.iter_chunks('2026/10/cp.docx')) == PAYLOAD
+    assert [item.key for item in store.list()] == ['2026/10/cp.docx']
+
+
+def test_byte_range(store, tmp_path):
+    store.store_file('cp.docx', _source(tmp_path))
+
+    assert b''.join(store.iter_chunks('cp.docx', 10, 300000)) == PAYLOAD[10:300000]
+    assert b''.join(store.iter_chunks('cp.docx', len(PAYLOAD) - 5)) == PAYLOAD[-5:]
+
+
+def test_local_copy_and_delete(store, tmp_path):
+    store.store_file('cp.docx', _source(tmp_path))
+
+    with store.local_copy('cp.docx', tmp_path) as path:
+        assert path.read_bytes() == PAYLOAD
+
+    store.delete('cp.docx')
+    assert store.stat('cp.docx') is None
+    assert list(store.list()) == []
+
+
+def test_missing_object(store):
+    assert store.stat('missing.docx') is None
+
+
+@pytest.mark.parametrize('key', ['', '/etc/passwd', '../outside.docx', 'a/../../outside.docx'])
+def test_local_key_cannot_leave_root(tmp_path, key):
+    with pytest.raises(ValueError):
+        LocalObjectStore(tmp_path).path(key)
+
+
+def test_local_store_across_filesystems(tmp_path, monkeypatch):
+    real_replace = os.replace
+    source = _source(tmp_path)
+
+    def replace(src, dst):
+        # Перенос из рабочей папки на другой файловой системе невозможен
+        if str(src) == str(source):
+            raise OSError(errno.EXDEV, 'Invalid cross-device link')
+        real_replace(src, dst)
+
+    monkeypatch.setattr(object_storage.os, 'replace', replace)
+    store = LocalObjectStore(tmp_path / 'store')
+
+    store.store_file('cp.docx', source)
+
+    assert not source.exists()
+    assert b''.join(store.iter_chunks('cp.docx')) == PAYLOAD
+    assert [item.key for item in store.list()] == ['cp.docx']
+
+
+class TestS3Downloads:
+    @pytest.fixture
+    def app_config(self, aws):
+        return {'STORAGE_BACKEND': 's3', 'S3_BUCKET': BUCKET, 'S3_REGION': 'us-east-1'}
+
+    @pytest.fixture
+    def proposal(self, create_proposal):
+        job = create_proposal()
+        assert job['status'] == 'completed', job
+        return job
+
+    def test_document_is_stored_in_bucket(self, proposal):
+        key = proposal['file_url'].split('/api/download/', 1)[1]
+        keys = [item['Key'] for item in
+                boto3.client('s3').list_objects_v2(Bucket=BUCKET)['Contents']]
+
+        assert f"output/{key}" in keys
+
+    def test_download_is_streamed(self, client, auth_headers, proposal):
+        response = client.get(proposal['file_url'], headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == DOCX_MIME_TYPE
+        assert response.data.startswith(b'PK')
+        assert int(response.headers['Content-Length']) == len(response.data)
+
+    def test_range_and_conditional_requests(self, client, auth_headers, proposal):
+        full = client.get(proposal['file_url'], headers=auth_headers)
+        etag = full.headers['ETag']
+
+        partial = client.get(proposal['file_url'], headers=dict(auth_headers, Range='bytes=5-14'))
+        not_modified = client.get(proposal['file_url'], headers=dict(auth_headers, **{'If-None-Match': etag}))
+        unsatisfiable = client.get(proposal['file_url'], headers=dict(auth_headers, Range='bytes=999999999-'))
+
+        assert partial.status_code == 206
+        assert partial.data == full.data[5:15]
+        assert partial.headers['Content-Range'] == f"bytes 5-14/{len(full.data)}"
+        assert not_modified.status_code == 304
+        assert unsatisfiable.status_code == 416
+
+    def test_presigned_redirect(self, app, client, auth_headers, proposal):
+        app.config['DOWNLOAD_OFFLOAD'] = 'presigned'
+
+        response = client.get(proposal['file_url'], headers=auth_headers)
+
+        assert response.status_code == 302
+        assert 'Signature=' in response.headers['Location']
+        assert response.headers['Cache-Control'] == 'no-store'
@@ -0,0 +1,85 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+from docx import Document
+
+from backend.ooxml_render import DocumentXmlRewriter, render_docx
+from backend.utils import generate_word
+from backend.word_templates import ENGINE_DOCX, ENGINE_OOXML, format_value
+
+FIXTURES = Path(__file__).parent
+
+DOCUMENT = (
+    '<w:body><w:p><w:r><w:t>Total {{tax}} rub</w:t></w:r></w:p>'
+    '<w:p><w:bookmarkStart w:id="0" w:name="client"/><w:bookmarkEnd w:id="0"/></w:p>'
+    '<w:p><w:r><w:t xml:space="preserve"> {{missing}} </w:t></w:r></w:p></w:body>'
+)
+DATA = {'tax': 20, 'client': 'ООО <Ромашка>'}
+
+
+def _rewrite(parts):
+    rewriter = DocumentXmlRewriter(DATA)
+    return ''.join(rewriter.feed(part) for part in parts) + rewriter.close()
+
+
+def test_whole_document_substitution():
+    result = _rewrite([DOCUMENT])
+
+    assert '<w:t>Total 20.00 rub</w:t>' in result
+    assert 'ООО &lt;Ромашка&gt;' in result
+    assert '{{missing}}' in result
+
+
+@pytest.mark.parametrize('offset', range(1, len(DOCUMENT)))
+def test_substitution_does_not_depend_on_chunk_boundary(offset):
+    assert _rewrite([DOCUMENT[:offset], DOCUMENT[offset:]]) == _rewrite([DOCUMENT])
+
+
+def test_character_by_character_feed():
+    assert _rewrite(list(DOCUMENT)) == _rewrite([DOCUMENT])
+
+
+def test_render_docx_fills_template(tmp_path):
+    output = tmp_path / 'out.docx'
+
+    render_docx({'tax': 20}, str(FIXTURES / 'CP_WMS.docx'), str(output))
+
+    with zipfile.ZipFile(FIXTURES / 'CP_WMS.docx') as source, zipfile.ZipFile(output) as target:
+        assert source.namelist() == target.namelist()
+        assert target.testzip() is None
+
+
+def test_members_keep_content_and_compression(tmp_path):
+    output = tmp_path / 'out.docx'
+
+    render_docx({'total_tax': 20}, str(FIXTURES / 'CP_WMS.docx'), str(output))
+
+    with zipfile.ZipFile(FIXTURES / 'CP_WMS.docx') as source, zipfile.ZipFile(output) as target:
+        for info in source.infolist():
+            if info.filename == 'word/document.xml':
+                continue
+            copied = target.getinfo(info.filename)
+            assert copied.compress_type == info.compress_type
+            assert copied.date_time == info.date_time
+            assert target.read(copied) == source.read(info)
+
+
+def _document_text(path):
+    document = Document(str(path))
+    paragraphs = [paragraph.text for paragraph in document.paragraphs]
+    cells = [cell.text for table in document.tables for row in table.rows for cell in row.cells]
+    return paragraphs, cells
+
+
+def test_engines_produce_the_same_text(tmp_path):
+    data = {'total_tax': 4600740.5, 'services': 'Внедрение WMS'}
+    outputs = {}
+    for engine in (ENGINE_DOCX, ENGINE_OOXML):
+        outputs[engine] = tmp_path / f"{engine}.docx"
+        assert generate_word(data, str(FIXTURES / 'CP_WMS.docx'), str(outputs[engine]), engine=engine)
+
+    paragraphs, cells = _document_text(outputs[ENGINE_OOXML])
+
+    assert (paragraphs, cells) == _document_text(outputs[ENGINE_DOCX])
+    assert any(format_value(data['total_tax']) in text for text in paragraphs + cells)
@@ -0,0 +1,200 @@
+import os
+import shutil
+import time
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+from backend.models import ProposalHistory, User, db
+from backend.object_storage import LocalObjectStore, object_storage
+from backend.output_storage import COLD_MARKER, OutputStorage, output_storage, start_output_sweeper
+
+TEMPLATE = Path(__file__).parent / 'CP_WMS.docx'
+DAY = 86400
+
+
+@pytest.fixture
+def app_config():
+    return {'OUTPUT_RETENTION_DAYS': 30}
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(object_storage, 'outputs', LocalObjectStore(tmp_path / 'output'))
+    return OutputStorage(retention_days=30, cold_after_days=7)
+
+
+def _put(storage, tmp_path, key, age_days=0):
+    source = tmp_path / 'document.docx'
+    shutil.copyfile(TEMPLATE, source)
+    storage.store(key, source)
+    path = storage.backend.path(key)
+    modified = time.time() - age_days * DAY
+    os.utime(path, (modified, modified))
+    return path
+
+
+def _add_proposal(file_path, expired_days_ago=None):
+    """Запись истории, которой принадлежит файл; в контексте приложения"""
+    user = User.query.first()
+    if user is None:
+        user = User(username='owner', email='owner@example.com')
+        user.set_password('owner')
+        db.session.add(user)
+        db.session.flush()
+    proposal = ProposalHistory(user.id, 'estimate.xlsx', 'estimate.xlsx')
+    proposal.status = ProposalHistory.STATUS_COMPLETED
+    proposal.file_path = file_path
+    if expired_days_ago is not None:
+        proposal.file_expired_at = datetime.utcnow() - timedelta(days=expired_days_ago)
+    db.session.add(proposal)
+    db.session.commit()
+
+
+def test_relative_path_is_sharded():
+    storage = OutputStorage(shard_depth=2)
+
+    key = storage.relative_path('proposal_1.docx')
+
+    first, second, name = key.split('/')
+    assert len(first) == len(second) == 2
+    assert name == 'proposal_1.docx'
+    assert storage.relative_path('proposal_1.docx') == key
+    assert OutputStorage(shard_depth=0).relative_path('proposal_1.docx') == 'proposal_1.docx'
+
+
+def test_recompress_keeps_document_and_mtime(storage, tmp_path):
+    path = _put(storage, tmp_path, 'ab/cd/cp.docx', age_days=10)
+    modified = path.stat().st_mtime_ns
+    with zipfile.ZipFile(TEMPLATE) as source:
+        members = {name: source.read(name) for name in source.namelist()}
+
+    storage.recompress(path)
+
+    with zipfile.ZipFile(path) as archive:
+        assert archive.comment == COLD_MARKER
+        assert {name: archive.read(name) for name in archive.namelist()} == members
+    assert path.stat().st_mtime_ns == modified
+    # Помеченный архив повторно не перепаковывается
+    assert storage.recompress(path) is False
+
+
+def test_sweep_files_follows_history(app, storage, tmp_path):
+    with app.app_context():
+        fresh = _put(storage, tmp_path, 'aa/aa/fresh.docx')
+        cold = _put(storage, tmp_path, 'bb/bb/cold.docx', age_days=10)
+        old = _put(storage, tmp_path, 'cc/cc/old.docx', age_days=40)
+        expired = _put(storage, tmp_path, 'dd/dd/expired.docx', age_days=40)
+        expired_pdf = _put(storage, tmp_path, 'dd/dd/expired.pdf', age_days=40)
+        regenerated = _put(storage, tmp_path, 'ee/ee/regenerated.docx')
+        temp = _put(storage, tmp_path, 'ff/ff/.old.tmp.docx', age_days=2)
+        for key in ('aa/aa/fresh.docx', 'bb/bb/cold.docx', 'cc/cc/old.docx'):
+            _add_proposal(key)
+        _add_proposal('dd/dd/expired.docx', expired_days_ago=1)
+        _add_proposal('ee/ee/regenerated.docx', expired_days_ago=1)
+
+        stats = storage.sweep_files()
+
+    assert stats == {'recompressed': 2, 'removed': 2, 'orphans_removed': 0, 'temp_removed': 1}
+    # Возраст файла сам по себе не повод удалять: запись не помечена устаревшей
+    assert old.exists() and fresh.exists() and regenerated.exists()
+    assert not expired.exists() and not expired_pdf.exists() and not temp.exists()
+    with zipfile.ZipFile(cold) as archive:
+        assert archive.comment == COLD_MARKER
+    with zipfile.ZipFile(fresh) as archive:
+        assert archive.comment != COLD_MARKER
+
+
+def test_orphans_are_removed_only_on_request(app, storage, tmp_path):
+    with app.app_context():
+        old_orphan = _put(storage, tmp_path, 'aa/aa/orphan.docx', age_days=40)
+        new_orphan = _put(storage, tmp_path, 'bb/bb/orphan.docx')
+
+        assert storage.sweep_files()['orphans_removed'] == 0
+        assert old_orphan.exists()
+
+        storage.remove_orphans = True
+        assert storage.sweep_files()['orphans_removed'] == 1
+
+    assert not old_orphan.exists() and new_orphan.exists()
+
+
+def _expire(app, proposal_id):
+    """Состаривает предложение на 40 дней и запускает удаление по сроку хранения"""
+    with app.app_context():
+        proposal = ProposalHistory.query.get(proposal_id)
+        proposal.created_at = proposal.updated_at = datetime.utcnow() - timedelta(days=40)
+        db.session.commit()
+        assert output_storage.expire_proposals() == 1
+        proposal = ProposalHistory.query.get(proposal_id)
+        assert proposal.file_expired_at is not None
+        assert output_storage.stat(proposal.file_path) is None
+
+
+def test_expired_document_is_regenerated_on_download(app, client, auth_headers, create_proposal):
+    job = create_proposal()
+    _expire(app, job['job_id'])
+
+    response = client.get(job['file_url'], headers=auth_headers)
+
+    assert response.status_code == 200
+    assert response.data.startswith(b'PK')
+    with app.app_context():
+        proposal = ProposalHistory.query.get(job['job_id'])
+        assert proposal.file_expired_at is None
+        assert proposal.output_size == len(response.data)
+        # Срок хранения отсчитывается заново
+        assert output_storage.expire_proposals() == 0
+
+
+@pytest.mark.parametrize('app_config', [{'OUTPUT_RETENTION_DAYS': 30, 'OUTPUT_REGENERATE': False}])
+def test_expired_document_without_regeneration(app, client, auth_headers, create_proposal):
+    job = create_proposal()
+    _expire(app, job['job_id'])
+
+    response = client.get(job['file_url'], headers=auth_headers)
+
+    assert response.status_code == 410
+
+
+@pytest.mark.parametrize('app_config', [{}])
+def test_retention_is_off_by_default(app, create_proposal):
+    job = create_proposal()
+
+    with app.app_context():
+        proposal = ProposalHistory.query.get(job['job_id'])
+        proposal.created_at = proposal.updated_at = datetime.utcnow() - timedelta(days=400)
+        db.session.commit()
+        assert output_storage.expire_proposals() == 0
+        assert output_storage.stat(proposal.file_path) is not None
+
+
+def test_sweep_runs_once_per_interval(app):
+    with app.app_context():
+        assert output_storage.sweep(min_interval=3600) is not None
+        assert output_storage.sweep(min_interval=3600) is None
+        # Команда flask sweep-outputs проходит без ограничения
+        assert output_storage.sweep() is not None
+
+
+def test_sweep_command_reports_stats(app):
+    result = app.test_cli_runner().invoke(args=['sweep-outputs'])
+
+    assert result.exit_code == 0
+    assert "'expired': 0" in result.output
+
+
+def test_sweeper_starts_only_with_web_requests(app, client):
+    assert 'output_sweeper' not in app.extensions
+
+    app.config['OUTPUT_SWEEP_INTERVAL'] = 3600
+    sweeper = start_output_sweeper(app)
+    assert not sweeper._thread.is_alive()
+
+    client.get('/health')
+    try:
+        assert sweeper._thread.is_alive()
+    finally:
+        sweeper.stop()
@@ -0,0 +1,56 @@
+import pytest
+
+from backend.models import User
+from backend.passwords import PasswordHasher, PasswordHasherBusy, init_password_hasher, stored_method
+
+
+def _stored_hash(app, username='manager'):
+    with app.app_context():
+        return User.query.filter_by(username=username).one().password
+
+
+def _login(client, password='manager'):
+    return client.post('/login', json={'username': 'manager', 'password': password})
+
+
+def test_login_keeps_hash_under_current_policy(app, client, auth_headers):
+    before = _stored_hash(app)
+
+    assert _login(client).status_code == 200
+
+    assert _stored_hash(app) == before
+    assert stored_method(before) == 'pbkdf2:sha256:1000'
+
+
+def test_login_rehashes_after_policy_change(app, client, auth_headers):
+    before = _stored_hash(app)
+    app.config['PASSWORD_HASH_ITERATIONS'] = 2000
+    init_password_hasher(app)
+
+    # Неверный пароль хэш не меняет
+    assert _login(client, 'wrong').status_code == 401
+    assert _stored_hash(app) == before
+
+    assert _login(client).status_code == 200
+
+    after = _stored_hash(app)
+    assert stored_method(after) == 'pbkdf2:sha256:2000'
+    with app.app_context():
+        assert User.query.filter_by(username='manager').one().last_login is not None
+    # Повторный вход проверяет новый хэш и больше его не меняет
+    assert _login(client).status_code == 200
+    assert _stored_hash(app) == after
+
+
+def test_busy_hasher_rejects_instead_of_queueing():
+    hasher = PasswordHasher(iterations=1000, max_workers=1, wait_timeout=0.1)
+    password_hash = hasher.hash('secret')
+    # Слот и два места в очереди заняты другими входами
+    for _ in range(3):
+        hasher._slots.acquire()
+
+    with pytest.raises(PasswordHasherBusy):
+        hasher.verify(password_hash, 'secret')
+
+    hasher._slots.release()
+    assert hasher.verify(password_hash, 'secret')
@@ -0,0 +1,233 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from backend import pdf_converter
+from backend.pdf_converter import CliConverterWorker, ConverterWorker, PdfConversionError, PdfConverterPool
+from backend.utils import generate_pdf
+
+# Заменители soffice: пишут PDF в --outdir, падают или зависают
+SOFFICE_SCRIPTS = {
+    'ok': (
+        "import sys, pathlib\n"
+        "args = sys.argv[1:]\n"
+        "out = pathlib.Path(args[args.index('--outdir') + 1])\n"
+        "source = pathlib.Path(args[-1])\n"
+        "(out / (source.stem + '.pdf')).write_bytes(b'%PDF-1.4 ' + source.name.encode())\n"
+    ),
+    'fail': "import sys\nsys.exit(1)\n",
+    'hang': "import time\ntime.sleep(60)\n",
+}
+
+
+def _soffice(tmp_path, mode):
+    path = tmp_path / f"soffice_{mode}"
+    path.write_text(f"#!{sys.executable}\n{SOFFICE_SCRIPTS[mode]}")
+    path.chmod(0o755)
+    return str(path)
+
+
+class FakeWorker(ConverterWorker):
+    """
+    Воркер без LibreOffice: вместо офиса - спящий процесс, вместо UNO - ожидание
+
+    Преобразование длится delay секунд и прерывается ошибкой, если процесс
+    убит, как вызов UNO к убитому офису.
+    """
+    delay = 0.0
+    starts = 0
+    active = 0
+    max_active = 0
+    counter_lock = threading.Lock()
+
+    def start(self):
+        self._popen_sleeper()
+        self.jobs_done = 0
+        with FakeWorker.counter_lock:
+            FakeWorker.starts += 1
+
+    def _popen_sleeper(self):
+        process = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+        with self._lock:
+            self._process = process
+            self.killed = False
+
+    def convert(self, source_path, target_path):
+        with FakeWorker.counter_lock:
+            FakeWorker.active += 1
+            FakeWorker.max_active = max(FakeWorker.max_active, FakeWorker.active)
+        try:
+            deadline = time.monotonic() + FakeWorker.delay
+            while time.monotonic() < deadline:
+                if not self.alive:
+                    raise RuntimeError('DisposedException')
+                time.sleep(0.01)
+            target_path.write_bytes(b'%PDF-1.4')
+            self.jobs_done += 1
+        finally:
+            with FakeWorker.counter_lock:
+                FakeWorker.active -= 1
+
+
+@pytest.fixture
+def fake_workers(monkeypatch):
+    monkeypatch.setattr(pdf_converter, 'ConverterWorker', FakeWorker)
+    monkeypatch.setattr(pdf_converter, '_uno_available', lambda: True)
+    for name, value in (('delay', 0.0), ('starts', 0), ('active', 0), ('max_active', 0)):
+        monkeypatch.setattr(FakeWorker, name, value)
+
+
+@pytest.fixture
+def make_pool(tmp_path):
+    pools = []
+
+    def make_pool(**options):
+        options = dict({'soffice': sys.executable, 'profile_root': tmp_path / 'profiles'}, **options)
+        pool = PdfConverterPool(**options)
+        pools.append(pool)
+        return pool
+    yield make_pool
+    for pool in pools:
+        pool.shutdown()
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'proposal.docx'
+    path.write_bytes(b'PK')
+    return path
+
+
+def test_requests_wait_for_a_free_worker(fake_workers, make_pool, source, tmp_path):
+    FakeWorker.delay = 0.2
+    pool = make_pool(workers=1)
+    targets = [tmp_path / f"out_{index}.pdf" for index in range(3)]
+
+    threads = [threading.Thread(target=pool.convert, args=(source, target)) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(target.read_bytes() == b'%PDF-1.4' for target in targets)
+    assert FakeWorker.max_active == 1
+    assert FakeWorker.starts == 1
+    assert pool.conversions == 3
+
+
+def test_queue_timeout_when_all_workers_busy(fake_workers, make_pool, source, tmp_path):
+    FakeWorker.delay = 1.0
+    pool = make_pool(workers=1, queue_timeout=0.1)
+    busy = threading.Thread(target=pool.convert, args=(source, tmp_path / 'busy.pdf'))
+    busy.start()
+    time.sleep(0.2)
+
+    with pytest.raises(PdfConversionError, match='заняты'):
+        pool.convert(source, tmp_path / 'waiting.pdf')
+    busy.join()
+
+
+def test_worker_is_recycled_after_max_jobs(fake_workers, make_pool, source, tmp_path):
+    pool = make_pool(workers=1, max_jobs=2)
+
+    for index in range(5):
+        pool.convert(source, tmp_path / f"out_{index}.pdf")
+
+    assert FakeWorker.starts == 3
+    assert pool.restarts == 2
+    assert pool.conversions == 5
+
+
+def test_watchdog_kills_hung_conversion(fake_workers, make_pool, source, tmp_path):
+    FakeWorker.delay = 5.0
+    pool = make_pool(workers=1, job_timeout=0.2)
+
+    started = time.monotonic()
+    with pytest.raises(PdfConversionError, match='превысило'):
+        pool.convert(source, tmp_path / 'hung.pdf')
+
+    assert time.monotonic() - started < 3
+    assert not (tmp_path / 'hung.pdf').exists()
+    assert list(tmp_path.glob('.hung*')) == []
+    # Следующий документ получает перезапущенный воркер
+    FakeWorker.delay = 0.0
+    assert pool.convert(source, tmp_path / 'next.pdf').exists()
+    assert FakeWorker.starts == 2
+
+
+def test_kill_leaves_cleanup_to_the_owner(tmp_path):
+    worker = FakeWorker(0, sys.executable, tmp_path)
+    worker.start()
+    process = worker._process
+
+    worker.kill()
+    process.wait(timeout=5)
+
+    # Сторож только посылает сигнал: ссылку на процесс очищает stop()
+    assert worker._process is process
+    assert worker.killed and not worker.alive
+    worker.stop()
+    assert worker._process is None
+
+
+def test_without_uno_pool_uses_soffice_convert_to(monkeypatch, make_pool, source, tmp_path):
+    monkeypatch.setattr(pdf_converter, '_uno_available', lambda: False)
+    pool = make_pool(workers=2, soffice=_soffice(tmp_path, 'ok'))
+
+    target = pool.convert(source, tmp_path / 'out.pdf')
+
+    assert isinstance(pool._workers[0], CliConverterWorker)
+    assert target.read_bytes() == b'%PDF-1.4 proposal.docx'
+    assert [path.name for path in tmp_path.glob('.pdf_*')] == []
+
+
+@pytest.mark.parametrize('mode, message', [('fail', 'кодом 1'), ('hang', 'превысило')])
+def test_soffice_convert_to_errors(monkeypatch, make_pool, source, tmp_path, mode, message):
+    monkeypatch.setattr(pdf_converter, '_uno_available', lambda: False)
+    pool = make_pool(workers=1, soffice=_soffice(tmp_path, mode), job_timeout=0.5)
+
+    with pytest.raises(PdfConversionError, match=message):
+        pool.convert(source, tmp_path / 'out.pdf')
+    assert not (tmp_path / 'out.pdf').exists()
+
+
+def test_generate_pdf_returns_none_on_failure(monkeypatch, source, tmp_path):
+    def failing_convert(source_path, target_path):
+        raise PdfConversionError('LibreOffice недоступен')
+
+    monkeypatch.setattr(pdf_converter.pdf_converter, 'convert', failing_convert)
+
+    assert generate_pdf(str(source), str(tmp_path / 'out.pdf')) is None
+
+
+class TestPdfDownloads:
+    @pytest.fixture
+    def app_config(self, tmp_path, monkeypatch, request):
+        monkeypatch.setattr(pdf_converter, '_uno_available', lambda: False)
+        return {
+            'PDF_OUTPUT_ENABLED': True,
+            'PDF_CONVERTER_SOFFICE': _soffice(tmp_path, request.param),
+            'PDF_CONVERTER_PROFILE_DIR': str(tmp_path / 'profiles'),
+            'PDF_CONVERTER_TIMEOUT': 5,
+        }
+
+    @pytest.mark.parametrize('app_config', ['ok'], indirect=True)
+    def test_job_stores_pdf(self, client, auth_headers, create_proposal):
+        job = create_proposal()
+
+        response = client.get(job['pdf_url'], headers=auth_headers)
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/pdf'
+        assert response.data.startswith(b'%PDF')
+
+    @pytest.mark.parametrize('app_config', ['fail'], indirect=True)
+    def test_failed_pdf_does_not_fail_the_job(self, client, auth_headers, create_proposal):
+        job = create_proposal()
+
+        assert job['status'] == 'completed'
+        assert client.get(job['file_url'], headers=auth_headers).status_code == 200
+        assert client.get(job['pdf_url'], headers=auth_headers).status_code == 503
@@ -0,0 +1,41 @@
+import uuid
+
+from backend.progress import report_progress
+from backend.retry_logic import upload_channel
+
+
+def test_upload_channel_is_namespaced_by_user():
+    upload_id = uuid.uuid4().hex
+
+    assert upload_channel(1, upload_id) == f"upload-1-{upload_id}"
+    assert upload_channel(1, upload_id) != upload_channel(2, upload_id)
+    assert upload_channel(1, 'proposal-1') is None
+    assert upload_channel(1, '../proposal-1') is None
+
+
+def test_upload_stream_requires_token(client):
+    response = client.get(f"/api/upload-status/{uuid.uuid4().hex}/stream")
+
+    assert response.status_code == 401
+
+
+def test_upload_stream_rejects_foreign_channels(client, auth_headers):
+    report_progress('proposal-1', 'completed', progress=100.0)
+
+    response = client.get('/api/upload-status/proposal-1/stream', headers=auth_headers)
+
+    assert response.status_code == 404
+
+
+def test_upload_stream_shows_only_own_uploads(client, make_user):
+    owner = make_user('owner')
+    other = make_user('other')
+    upload_id = uuid.uuid4().hex
+    # Пользователи создаются по порядку, поэтому id владельца - 1
+    report_progress(upload_channel(1, upload_id), 'completed', stage='upload', progress=100.0)
+
+    own = client.get(f"/api/upload-status/{upload_id}/stream", headers=owner).get_data(as_text=True)
+    foreign = client.get(f"/api/upload-status/{upload_id}/stream", headers=other).get_data(as_text=True)
+
+    assert 'event: progress' in own and '"completed"' in own
+    assert 'event: progress' not in foreign
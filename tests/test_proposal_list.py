@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from backend.models import ProposalHistory, User, db
+
+START = datetime(2026, 1, 1, 12, 0, 0, 123456)
+
+
+def _add_proposals(app, username, stamps):
+    """Записи истории с заданными created_at; возвращает их id"""
+    with app.app_context():
+        user = User.query.filter_by(username=username).one()
+        proposals = []
+        for stamp in stamps:
+            proposal = ProposalHistory(user.id, 'estimate.xlsx', 'estimate.xlsx')
+            proposal.created_at = proposal.updated_at = stamp
+            proposal.data = {'total': 1}
+            proposals.append(proposal)
+        db.session.add_all(proposals)
+        db.session.commit()
+        return [proposal.id for proposal in proposals]
+
+
+def _pages(client, headers, per_page):
+    pages, cursor = [], None
+    while True:
+        query = f"?per_page={per_page}" + (f"&cursor={cursor}" if cursor else '')
+        response = client.get(f"/api/proposals{query}", headers=headers).get_json()
+        pages.append([item['id'] for item in response['items']])
+        cursor = response['next_cursor']
+        assert response['has_more'] == (cursor is not None)
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('per_page', [1, 2, 3, 4, 7, 100])
+def test_pages_split_equal_created_at(app, client, auth_headers, make_user, per_page):
+    # Группы с одинаковым created_at попадают на границы страниц
+    stamps = [START] * 3 + [START + timedelta(seconds=1)] * 2 + [START - timedelta(microseconds=1)] * 2
+    ids = _add_proposals(app, 'manager', stamps)
+    make_user('other')
+    _add_proposals(app, 'other', [START] * 2)
+
+    pages = _pages(client, auth_headers, per_page)
+
+    expected = sorted(zip(stamps, ids), key=lambda item: (item[0], item[1]), reverse=True)
+    assert [proposal_id for page in pages for proposal_id in page] == [proposal_id for _, proposal_id in expected]
+    assert all(len(page) == per_page for page in pages[:-1])
+
+
+def test_total_only_on_request(app, client, auth_headers):
+    _add_proposals(app, 'manager', [START] * 3)
+
+    plain = client.get('/api/proposals?per_page=2', headers=auth_headers).get_json()
+    counted = client.get('/api/proposals?per_page=2&include_total=true', headers=auth_headers).get_json()
+
+    assert 'total' not in plain
+    assert counted['total'] == 3
+
+
+@pytest.mark.parametrize('cursor', ['not-base64!', 'WzEsIDJd', 'bnVsbA=='])
+def test_invalid_cursor_is_rejected(client, auth_headers, cursor):
+    response = client.get(f"/api/proposals?cursor={cursor}", headers=auth_headers)
+
+    assert response.status_code == 400
+
+
+@pytest.fixture
+def statements(app):
+    """SQL-запросы, выполненные во время теста"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def _loads_payload(statement):
+    return 'proposal_history.data' in statement or 'proposal_payload' in statement
+
+
+@pytest.mark.parametrize('app_config', [{}, {'PROPOSAL_DATA_STORAGE': 'compressed'}])
+def test_listing_does_not_load_payload(app, client, auth_headers, create_proposal, statements):
+    job = create_proposal()
+    statements.clear()
+
+    listing = client.get('/api/proposals', headers=auth_headers).get_json()
+
+    assert [item['id'] for item in listing['items']] == [job['job_id']]
+    assert 'data' not in listing['items'][0]
+    assert not any(_loads_payload(statement) for statement in statements)
+
+    detail = client.get(f"/api/proposals/{job['job_id']}", headers=auth_headers).get_json()
+
+    assert detail['proposal']['data']['total'] is not None
+    assert any(_loads_payload(statement) for statement in statements)
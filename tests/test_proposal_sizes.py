@@ -0,0 +1,55 @@
+import io
+from pathlib import Path
+
+from backend.models import ProposalHistory, db
+from backend.output_storage import output_storage
+
+ESTIMATE = Path(__file__).parent / 'Estimation_WMS.xlsx'
+
+
+def _stored(app, proposal_id):
+    with app.app_context():
+        proposal = ProposalHistory.query.get(proposal_id)
+        return proposal.file_size, proposal.output_size, proposal.file_path
+
+
+def test_sizes_of_upload_and_document(app, create_proposal):
+    job = create_proposal()
+
+    file_size, output_size, key = _stored(app, job['job_id'])
+    assert file_size == ESTIMATE.stat().st_size
+    with app.app_context():
+        assert output_size == output_storage.stat(key).size
+    assert job['proposal']['output_size'] == output_size
+
+
+def test_regeneration_keeps_upload_size(app, client, auth_headers, create_proposal):
+    job = create_proposal()
+    file_size, _, key = _stored(app, job['job_id'])
+    with app.app_context():
+        output_storage.remove(key)
+
+    response = client.get(f"/api/proposals/{job['job_id']}/download", headers=auth_headers)
+
+    assert response.status_code == 200
+    assert _stored(app, job['job_id'])[:2] == (file_size, len(response.data))
+
+
+def test_batch_records_workbook_and_document_sizes(app, client, auth_headers):
+    payload = ESTIMATE.read_bytes()
+
+    response = client.post(
+        '/api/proposals/batch?format=links',
+        data={'files': [(io.BytesIO(payload), 'first.xlsx'), (io.BytesIO(payload), 'second.xlsx')]},
+        headers=auth_headers,
+        content_type='multipart/form-data'
+    )
+
+    assert response.status_code == 200
+    with app.app_context():
+        proposals = ProposalHistory.query.order_by(ProposalHistory.id).all()
+        assert [proposal.file_size for proposal in proposals] == [len(payload)] * 2
+        for proposal in proposals:
+            assert proposal.output_size == output_storage.stat(proposal.file_path).size
+            assert proposal.mime_type.endswith('spreadsheetml.sheet')
+        db.session.remove()
@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from backend import result_cache as result_cache_module
+from backend.result_cache import ResultCache
+
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / 'document.docx'
+    path.write_bytes(b'x' * 1000)
+    return path
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """Считает полные обходы кэша"""
+    calls = []
+    evict = ResultCache.evict
+
+    def counting_evict(self):
+        calls.append(time.monotonic())
+        return evict(self)
+
+    monkeypatch.setattr(ResultCache, 'evict', counting_evict)
+    return calls
+
+
+def test_put_and_get_round_trip(tmp_path, document):
+    cache = ResultCache(tmp_path / 'cache')
+
+    assert cache.put('ab' * 32, document, {'total': 10})
+    cached_path, data = cache.get('ab' * 32)
+
+    assert cached_path.read_bytes() == document.read_bytes()
+    assert data == {'total': 10}
+    assert cache.get('cd' * 32) is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_put_does_not_rescan_below_limit(tmp_path, document, scans):
+    cache = ResultCache(tmp_path / 'cache', max_bytes=1024 * 1024)
+
+    for index in range(20):
+        cache.put(f"{index:064x}", document, {'index': index})
+
+    # Только первая запись сверяет оценку размера с диском
+    assert len(scans) == 1
+
+
+def test_rescan_after_interval(tmp_path, document, scans, monkeypatch):
+    cache = ResultCache(tmp_path / 'cache', max_bytes=1024 * 1024)
+    cache.put('1' * 64, document, {})
+    monkeypatch.setattr(result_cache_module, 'SIZE_RESCAN_INTERVAL', -1)
+
+    cache.put('2' * 64, document, {})
+
+    assert len(scans) == 2
+
+
+def test_evicts_least_recently_used(tmp_path, document):
+    cache = ResultCache(tmp_path / 'cache', max_bytes=3500)
+    keys = [f"{index:064x}" for index in range(5)]
+    for key in keys:
+        cache.put(key, document, {'key': key})
+        # Давность использования - mtime .json, разводим записи во времени
+        time.sleep(0.01)
+        cache.get(keys[0])
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[-1]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.evictions >= 2
+    total = sum(path.stat().st_size for path in (tmp_path / 'cache').glob('*/*'))
+    assert total <= 3500
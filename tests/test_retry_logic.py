@@ -0,0 +1,75 @@
+import io
+
+import pandas as pd
+import pytest
+from werkzeug.datastructures import FileStorage
+
+from backend import retry_logic
+from backend.error_handler import ValidationError
+from backend.retry_logic import MemoryTrackerBackend, UploadTracker, process_excel
+
+
+@pytest.fixture(autouse=True)
+def tracker(monkeypatch):
+    tracker = UploadTracker(MemoryTrackerBackend())
+    monkeypatch.setattr(retry_logic, 'upload_tracker', tracker)
+    monkeypatch.setattr(retry_logic.time, 'sleep', lambda seconds: None)
+    return tracker
+
+
+def _workbook(frame: pd.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    frame.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+class FlakyStream(io.BytesIO):
+    """Поток, первое чтение которого падает с ошибкой ввода-вывода"""
+    def __init__(self, payload: bytes):
+        super().__init__(payload)
+        self.failures = 1
+
+    def read(self, size=-1):
+        if self.failures:
+            self.failures -= 1
+            raise OSError('connection reset')
+        return super().read(size)
+
+
+VALID = pd.DataFrame({'name': ['WMS', 'Поддержка'], 'price': [100, 50], 'quantity': [1, 2]})
+
+
+def test_process_excel_reports_summary(tracker):
+    upload = FileStorage(io.BytesIO(_workbook(VALID)), filename='estimate.xlsx')
+
+    success, _, data = process_excel(upload, upload_id='upload-1')
+
+    assert success
+    assert data['summary'] == {'total_rows': 2, 'total_sum': 150}
+    status = tracker.get_status('upload-1')
+    assert status.status == 'completed'
+    assert status.progress == 100.0
+
+
+def test_invalid_structure_fails_without_retry(tracker):
+    frame = pd.DataFrame({'name': ['WMS'], 'cost': [100]})
+    upload = FileStorage(io.BytesIO(_workbook(frame)), filename='estimate.xlsx')
+
+    with pytest.raises(ValidationError):
+        process_excel(upload, upload_id='upload-2')
+
+    status = tracker.get_status('upload-2')
+    assert status.status == 'failed'
+    assert status.retry_count == 0
+
+
+def test_io_error_is_retried_from_the_start(tracker):
+    upload = FileStorage(FlakyStream(_workbook(VALID)), filename='estimate.xlsx')
+
+    success, _, data = process_excel(upload, upload_id='upload-3')
+
+    assert success
+    assert data['summary']['total_rows'] == 2
+    status = tracker.get_status('upload-3')
+    assert status.status == 'completed'
+    assert status.retry_count == 1
@@ -0,0 +1,72 @@
+import io
+import uuid
+
+import pandas as pd
+
+
+def _workbook(frame: pd.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    frame.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+VALID = pd.DataFrame({'name': ['WMS', 'Поддержка'], 'price': [100, 50], 'quantity': [1, 2]})
+
+
+def _validate(client, headers, payload: bytes, **form):
+    return client.post(
+        '/api/validate-excel',
+        data=dict(form, file=(io.BytesIO(payload), 'estimate.xlsx')),
+        headers=headers,
+        content_type='multipart/form-data'
+    )
+
+
+def test_validate_excel_tracks_upload(client, auth_headers):
+    upload_id = uuid.uuid4().hex
+
+    response = _validate(client, auth_headers, _workbook(VALID), upload_id=upload_id)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['success'] and body['upload_id'] == upload_id
+    assert body['data']['summary'] == {'total_rows': 2, 'total_sum': 150}
+
+    status = client.get(f"/api/upload-status/{upload_id}", headers=auth_headers).get_json()
+    assert status['status']['status'] == 'completed'
+    assert status['status']['progress'] == 100.0
+
+    events = client.get(f"/api/upload-status/{upload_id}/stream", headers=auth_headers)
+    assert '"completed"' in events.get_data(as_text=True)
+
+
+def test_invalid_workbook_is_reported(client, auth_headers):
+    frame = pd.DataFrame({'name': ['WMS'], 'cost': [100]})
+
+    response = _validate(client, auth_headers, _workbook(frame))
+
+    assert response.status_code == 400
+    assert response.get_json()['error']['type'] == 'validation'
+    upload_id = response.get_json()['upload_id']
+    status = client.get(f"/api/upload-status/{upload_id}", headers=auth_headers).get_json()
+    assert status['status']['status'] == 'failed'
+
+
+def test_upload_status_is_private(client, auth_headers, make_user):
+    upload_id = _validate(client, auth_headers, _workbook(VALID)).get_json()['upload_id']
+
+    assert client.get(f"/api/upload-status/{upload_id}").status_code == 401
+    assert client.get(f"/api/upload-status/{upload_id}", headers=make_user('other')).status_code == 404
+
+
+def test_client_upload_id_is_validated(client, auth_headers):
+    response = _validate(client, auth_headers, _workbook(VALID), upload_id='proposal-1')
+
+    assert response.status_code == 400
+
+
+def test_missing_file_uses_api_error_format(client, auth_headers):
+    response = client.post('/api/validate-excel', data={}, headers=auth_headers)
+
+    assert response.status_code == 400
+    assert response.get_json()['error']['message'] == 'Файл не был загружен'
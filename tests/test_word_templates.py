@@ -0,0 +1,63 @@
+import os
+from pathlib import Path
+
+from docx import Document
+
+from backend.word_templates import TemplateCache
+
+TEMPLATE = Path(__file__).parent / 'CP_WMS.docx'
+
+
+def _template(path, text, mtime_ns):
+    document = Document()
+    document.add_paragraph(text)
+    document.save(str(path))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def _text(document):
+    paragraphs = [paragraph.text for paragraph in document.paragraphs]
+    return paragraphs + [cell.text for table in document.tables for row in table.rows for cell in row.cells]
+
+
+def test_cached_template_is_reused_until_mtime_changes(tmp_path):
+    path = tmp_path / 'template.docx'
+    _template(path, 'Итого {{total}}', 1_000_000_000)
+    cache = TemplateCache()
+
+    skeleton = cache.get(str(path))
+    assert cache.get(str(path)) is skeleton
+
+    _template(path, 'Сумма {{total}}', 2_000_000_000)
+    reloaded = cache.get(str(path))
+
+    assert reloaded is not skeleton
+    assert _text(reloaded.render({'total': 5})) == ['Сумма 5.00']
+
+
+def test_least_recently_used_template_is_evicted(tmp_path):
+    paths = [tmp_path / f"{index}.docx" for index in range(3)]
+    for index, path in enumerate(paths):
+        _template(path, f"Шаблон {index}", 1_000_000_000)
+    cache = TemplateCache(max_size=2)
+
+    first = cache.get(str(paths[0]))
+    cache.get(str(paths[1]))
+    assert cache.get(str(paths[0])) is first
+    cache.get(str(paths[2]))
+
+    assert cache.get(str(paths[0])) is first
+    assert cache.get(str(paths[1])) is not None
+    assert len(cache._templates) == 2
+
+
+def test_render_does_not_change_cached_template():
+    skeleton = TemplateCache().get(str(TEMPLATE))
+    before = _text(skeleton.document)
+
+    first = skeleton.render({'total_tax': 100})
+    second = skeleton.render({'total_tax': 200})
+
+    assert _text(skeleton.document) == before
+    assert any('100.00' in text for text in _text(first))
+    assert not any('100.00' in text for text in _text(second))
@@ -0,0 +1,82 @@
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from backend.uploads import WORK_DIR_PREFIX, make_work_dir, remove_stale_work_dirs, work_dir
+
+ESTIMATE = Path(__file__).parent / 'Estimation_WMS.xlsx'
+
+
+def test_work_dirs_with_same_name_do_not_collide(tmp_path):
+    first = make_work_dir(tmp_path, 'estimate')
+    second = make_work_dir(tmp_path, 'estimate')
+
+    assert first != second
+    assert first.name.startswith(f"{WORK_DIR_PREFIX}estimate_")
+
+
+def test_work_dir_is_removed_on_error(tmp_path):
+    try:
+        with work_dir(tmp_path) as path:
+            (path / 'estimate.xlsx').write_bytes(b'data')
+            raise RuntimeError
+    except RuntimeError:
+        pass
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_only_stale_work_dirs_are_removed(tmp_path):
+    stale = make_work_dir(tmp_path)
+    fresh = make_work_dir(tmp_path)
+    foreign = tmp_path / 'keep'
+    foreign.mkdir()
+    old = time.time() - 7200
+    os.utime(stale, (old, old))
+    os.utime(foreign, (old, old))
+
+    assert remove_stale_work_dirs(tmp_path, 3600) == 1
+
+    assert not stale.exists()
+    assert fresh.exists() and foreign.exists()
+    assert remove_stale_work_dirs(tmp_path / 'missing', 3600) == 0
+
+
+def _create_and_wait(app, headers):
+    """Отправляет смету из отдельного клиента и ждет завершения задания"""
+    client = app.test_client()
+    response = client.post(
+        '/api/create-proposal',
+        data={'file': (io.BytesIO(ESTIMATE.read_bytes()), 'estimate.xlsx')},
+        headers=headers,
+        content_type='multipart/form-data'
+    )
+    job = response.get_json()
+    status_url = job['status_url']
+    deadline = time.monotonic() + 30
+    while job['status'] not in ('completed', 'error'):
+        assert time.monotonic() < deadline, job
+        time.sleep(0.01)
+        job = client.get(status_url, headers=headers).get_json()
+    return job
+
+
+def test_concurrent_uploads_with_same_name(app, client, make_user, tmp_path):
+    users = [make_user(f"user{index}") for index in range(3)]
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        jobs = list(executor.map(lambda headers: _create_and_wait(app, headers), users * 2))
+    app.extensions['job_queue'].executor.shutdown(wait=True)
+
+    assert [job['status'] for job in jobs] == ['completed'] * len(jobs)
+    file_urls = {job['file_url'] for job in jobs}
+    assert len(file_urls) == len(jobs)
+    for job, headers in zip(jobs, users * 2):
+        response = client.get(job['file_url'], headers=headers)
+        assert response.status_code == 200
+        assert response.data.startswith(b'PK')
+    # Рабочие папки запросов и заданий удалены, загрузки перенесены и убраны
+    assert list((tmp_path / 'work').iterdir()) == []
+    assert list((tmp_path / 'uploads').iterdir()) == []
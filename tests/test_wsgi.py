@@ -0,0 +1,39 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SCRIPT = """
+import sys
+import backend.wsgi as wsgi
+print(hasattr(wsgi, 'celery'), 'celery' in sys.modules)
+"""
+
+
+def _import_wsgi(tmp_path, queue_backend):
+    env = {
+        'DATABASE_URL': f"sqlite:///{tmp_path / 'test.db'}",
+        'JOB_QUEUE_BACKEND': queue_backend,
+        'LOG_FOLDER': str(tmp_path / 'logs'),
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'OUTPUT_FOLDER': str(tmp_path / 'output'),
+        'WORK_FOLDER': str(tmp_path / 'work'),
+        'TEMPLATE_FOLDER': str(tmp_path / 'templates'),
+        'RESULT_CACHE_FOLDER': str(tmp_path / 'cache'),
+        'OUTPUT_SWEEP_INTERVAL': '0',
+    }
+    # Отдельный процесс: проверяем, какие модули грузит сам импорт точки входа
+    result = subprocess.run(
+        [sys.executable, '-c', SCRIPT], cwd=tmp_path, env=dict(env, PYTHONPATH=str(ROOT)),
+        capture_output=True, text=True, check=True
+    )
+    return result.stdout.split()
+
+
+def test_local_queue_does_not_load_celery(tmp_path):
+    assert _import_wsgi(tmp_path, 'local') == ['False', 'False']
+
+
+def test_celery_queue_exposes_worker_app(tmp_path):
+    assert _import_wsgi(tmp_path, 'celery') == ['True', 'True']